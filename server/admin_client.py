@@ -1,7 +1,10 @@
 import argparse
 import asyncio
 import os
+import signal
 import tempfile
+import threading
+import time
 import mimetypes
 from enum import StrEnum
 from urllib.parse import urlparse
@@ -11,6 +14,7 @@ from dependency_injector.wiring import Provide, inject
 
 from configuration import configure
 from containers import Container
+from engines.disk_pressure_engine import DiskPressureLevel
 from engines.extraction_engine import SUPPORTED_DOC_LANGS
 from managers.document_manager import DocumentManager
 from managers.recital_manager import RecitalManager
@@ -28,6 +32,7 @@ class AdminCommands(StrEnum):
     CLEAR_DB = "clear_db"
     APPROVE_SPEAKER = "approve_speaker"
     UPLOAD_DOCUMENT = "upload_document"
+    WORKER = "worker"
 
 
 @inject
@@ -44,6 +49,54 @@ def upload_aggregated_sessions(recital_manager: RecitalManager = Provide(Contain
     print("Done.")
 
 
+@inject
+def run_finalization_worker(
+    parser: argparse.ArgumentParser, recital_manager: RecitalManager = Provide(Container.recital_manager)
+):
+    args = parser.parse_args()
+    if args.concurrency:
+        recital_manager.session_finalization_concurrency = args.concurrency
+    if args.upload_concurrency:
+        recital_manager.session_finalization_upload_concurrency = args.upload_concurrency
+    interval_sec = args.interval or recital_manager.session_finalization_job_interval
+
+    stopping = threading.Event()
+
+    def stop(signum, frame):
+        print(f"Received {signal.Signals(signum).name} - finishing the sessions in progress (repeat to abort)")
+        stopping.set()
+        recital_manager.stop_session_finalization()
+        # A second signal terminates right away
+        signal.signal(signum, signal.SIG_DFL)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    print(
+        f"Session finalization worker {recital_manager.worker_id} started "
+        f"(every {interval_sec}s, concurrency {recital_manager.session_finalization_concurrency}, "
+        f"upload concurrency {recital_manager.session_finalization_upload_concurrency})"
+    )
+    while not stopping.is_set():
+        run_start = time.monotonic()
+        try:
+            recital_manager.run_session_finalization()
+        except Exception as e:
+            print("Error running session finalization - retrying on the next run")
+            print(e)
+        next_run_in_sec = interval_sec
+        try:
+            if recital_manager.relieve_disk_pressure() != DiskPressureLevel.NORMAL:
+                # Finalizing more sessions frees more of the data folder
+                next_run_in_sec = min(interval_sec, recital_manager.disk_pressure_engine.check_interval_sec)
+        except Exception as e:
+            print("Error relieving disk pressure")
+            print(e)
+        stopping.wait(max(next_run_in_sec - (time.monotonic() - run_start), 0))
+
+    print("Session finalization worker stopped.")
+
+
 @inject
 def clear_database(parser: argparse.ArgumentParser, db: Database = Provide(Container.db)):
     # Warn the user - get explicit permission to drop-create the DB
@@ -228,6 +281,8 @@ def run_command(command: str, parser: argparse.ArgumentParser):
         approve_speaker(parser)
     elif command == AdminCommands.UPLOAD_DOCUMENT:
         upload_document(parser)
+    elif command == AdminCommands.WORKER:
+        run_finalization_worker(parser)
     else:
         raise Exception(f"Unknown command: {command}")
 
@@ -252,6 +307,26 @@ if __name__ == "__main__":
     parser.add_argument("--source-lang", type=str, help="Language of the source (he or yi)", default=None)
     parser.add_argument("--title", type=str, help="Title of the document", default=None)
 
+    # Arguments for worker command
+    parser.add_argument(
+        "--interval",
+        type=int,
+        help="Seconds between session finalization runs - If unspecified, JOB_SESSION_FINALIZATION_INTERVAL_SEC",
+        default=None,
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="Sessions finalized in parallel - If unspecified, JOB_SESSION_FINALIZATION_CONCURRENCY",
+        default=None,
+    )
+    parser.add_argument(
+        "--upload-concurrency",
+        type=int,
+        help="Sessions uploaded in parallel - If unspecified, JOB_SESSION_FINALIZATION_UPLOAD_CONCURRENCY",
+        default=None,
+    )
+
     # Validate the command
     command = parser.parse_args().command
     if command not in [cmd for cmd in AdminCommands]:
@@ -0,0 +1,49 @@
+"""unique checksummed audio segments
+
+Revision ID: 4f2d9c1b7a3e
+Revises: 70c680311d9b
+Create Date: 2026-10-18 10:12:41.318207
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4f2d9c1b7a3e"
+down_revision: Union[str, None] = "70c680311d9b"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "recital_audio_segments", sa.Column("content_hash", sqlmodel.sql.sqltypes.AutoString(), nullable=True)
+    )
+    op.add_column("recital_audio_segments", sa.Column("byte_size", sa.Integer(), nullable=True))
+    # Retried uploads left duplicate rows - the file on disk is the latest upload, keep the latest row
+    op.execute(
+        """
+        DELETE FROM recital_audio_segments older
+        USING recital_audio_segments newer
+        WHERE older.recital_session_id = newer.recital_session_id
+          AND older.sequential = newer.sequential
+          AND (older.created_at, older.id) < (newer.created_at, newer.id)
+        """
+    )
+    op.create_index(
+        "ux_recital_audio_segments_session_sequential",
+        "recital_audio_segments",
+        ["recital_session_id", "sequential"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ux_recital_audio_segments_session_sequential", table_name="recital_audio_segments")
+    op.drop_column("recital_audio_segments", "byte_size")
+    op.drop_column("recital_audio_segments", "content_hash")
@@ -7,6 +7,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from configuration import configure
 from containers import Container
+from engines.session_duration_engine import SessionDurationEngine
+from managers.recital_manager import RecitalManager
 from routers.api import api_app
 from routers.web_client import get_web_client_app, get_web_client_env_app
 from utility.scheduler import JobScheduler
@@ -25,12 +27,21 @@ def setup_cors(app: FastAPI, origins: List[str]):
 
 @asynccontextmanager
 @inject
-async def lifespan(app: FastAPI, job_scheduler: JobScheduler = Provide[Container.job_scheduler]):
+async def lifespan(
+    app: FastAPI,
+    job_scheduler: JobScheduler = Provide[Container.job_scheduler],
+    session_duration_engine: SessionDurationEngine = Provide[Container.session_duration_engine],
+    recital_manager: RecitalManager = Provide[Container.recital_manager],
+):
     print("Starting job scheduler")
     job_scheduler.start()
     yield
+    # Let a running finalization finish the sessions it started - without starting new ones
+    recital_manager.stop_session_finalization()
     print("Stopping job scheduler")
     job_scheduler.shutdown()
+    print("Flushing pending session durations")
+    session_duration_engine.flush()
 
 
 def create_app() -> FastAPI:
@@ -38,8 +49,13 @@ def create_app() -> FastAPI:
 
     db = container.db()
     db.create_database()
+    if not container.config.jobs.session_finalization.run_in_api():
+        # Sessions are finalized by dedicated worker processes (admin_client.py worker)
+        container.config.jobs.session_finalization.disabled.from_value(True)
     recital_manager = container.recital_manager()
     recital_manager.schedule_session_finalization_job(defer=True)
+    recital_manager.schedule_disk_pressure_job()
+    container.session_duration_engine().schedule_flush_job()
 
     app = FastAPI(lifespan=lifespan)
 
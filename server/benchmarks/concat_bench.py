@@ -0,0 +1,98 @@
+"""Session audio concatenation benchmark.
+
+Compares concatenating session audio segment files through `shutil.copyfileobj` (the previous
+approach) against the kernel side copy of `concat_files`, with the user space buffered copy fallback
+reported as well. Segment files are sized like MediaRecorder webm/opus chunks.
+
+Usage:
+    python benchmarks/concat_bench.py --segments 100 500 1000 --segment-kb 40 --work-dir /data/bench
+
+Run it on the filesystem holding the server data folder (--work-dir) - results on tmpfs are not
+representative. Reports wall time, throughput and the CPU time (user + sys) of the copying process.
+All approaches sync the output once it is written, so the comparison includes the disk writes.
+"""
+
+import argparse
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import utility.files as files  # noqa: E402
+
+
+def generate_segments(work_dir: Path, count: int, segment_kb: int) -> list[Path]:
+    segments_dir = Path(work_dir, f"segments_{count}x{segment_kb}k")
+    segments_dir.mkdir(exist_ok=True)
+    segments = [Path(segments_dir, f"session.seg.{i}") for i in range(count)]
+    for segment in segments:
+        if not segment.exists():
+            segment.write_bytes(os.urandom(segment_kb * 1024))
+    return segments
+
+
+def concat_copyfileobj(target: Path, segments: list[Path]) -> None:
+    with open(target, "wb") as concat_file:
+        for segment in segments:
+            with open(segment, "rb") as segment_file:
+                shutil.copyfileobj(segment_file, concat_file)
+        concat_file.flush()
+        os.fsync(concat_file.fileno())
+
+
+def concat_kernel(target: Path, segments: list[Path]) -> None:
+    files.concat_files(target, segments)
+
+
+def concat_buffered(target: Path, segments: list[Path]) -> None:
+    copy_file_range_supported, sendfile_supported = files._copy_file_range_supported, files._sendfile_supported
+    files._copy_file_range_supported = files._sendfile_supported = False
+    try:
+        files.concat_files(target, segments)
+    finally:
+        files._copy_file_range_supported, files._sendfile_supported = copy_file_range_supported, sendfile_supported
+
+
+def self_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(run, target: Path, segments: list[Path]) -> tuple[float, float]:
+    target.unlink(missing_ok=True)
+    cpu_start = self_cpu_time()
+    wall_start = time.perf_counter()
+    run(target, segments)
+    return time.perf_counter() - wall_start, self_cpu_time() - cpu_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, nargs="+", default=[100, 500, 1000], help="Segments per session")
+    parser.add_argument("--segment-kb", type=int, default=40, help="Size of each segment file in KiB")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per approach - the best run is reported")
+    parser.add_argument("--work-dir", default=None, help="Folder for generated segments (kept between runs)")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="concat_bench_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    approaches = (("copyfileobj", concat_copyfileobj), ("kernel", concat_kernel), ("buffered", concat_buffered))
+    print(f"{'segments':>8} {'MiB':>8} {'approach':>12} {'wall (s)':>10} {'MiB/s':>10} {'cpu (s)':>10}")
+    for count in args.segments:
+        segments = generate_segments(work_dir, count, args.segment_kb)
+        total_mib = count * args.segment_kb / 1024
+        target = Path(work_dir, "session.concat")
+        for approach, run in approaches:
+            wall, cpu = min(measure(run, target, segments) for _ in range(args.runs))
+            print(f"{count:>8} {total_mib:>8.1f} {approach:>12} {wall:>10.3f} {total_mib / wall:>10.1f} {cpu:>10.3f}")
+        target.unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Ingestion throughput benchmark.
+
+Simulates concurrent speakers against a running server. Each speaker creates a session and then
+uploads text and audio segments back to back - the same request mix the recital web client produces.
+
+Usage:
+    python benchmarks/ingestion_throughput.py --base-url http://localhost:8000 --token <access token>
+
+The access token is a speaker user JWT (the `access_token` cookie value after logging in).
+"""
+
+import argparse
+import json
+import statistics
+import time
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+
+def timed_request(base_url: str, token: str, method: str, path: str, body: bytes, content_type: str):
+    request = urllib.request.Request(
+        f"{base_url}/api{path}",
+        data=body,
+        method=method,
+        headers={"Authorization": f"Bearer {token}", "Content-Type": content_type},
+    )
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response_body = response.read()
+    return time.perf_counter() - start, response_body
+
+
+def run_speaker(args, latencies: dict[str, list[float]]):
+    elapsed, response_body = timed_request(
+        args.base_url, args.token, "PUT", "/sessions", json.dumps({"document_id": None}).encode(), "application/json"
+    )
+    latencies["new session"].append(elapsed)
+    session_id = json.loads(response_body)["session_id"]
+
+    audio_segment = b"\0" * args.audio_size
+    for segment_id in range(args.segments):
+        text_segment = json.dumps({"seek_end": (segment_id + 1) * 10.0, "text": "benchmark text segment"}).encode()
+        elapsed, _ = timed_request(
+            args.base_url,
+            args.token,
+            "POST",
+            f"/sessions/{session_id}/upload-text-segment",
+            text_segment,
+            "application/json",
+        )
+        latencies["text segment"].append(elapsed)
+
+        elapsed, _ = timed_request(
+            args.base_url,
+            args.token,
+            "PUT",
+            f"/sessions/{session_id}/upload-audio-segment/{segment_id}",
+            audio_segment,
+            "audio/webm;codecs=opus",
+        )
+        latencies["audio segment"].append(elapsed)
+
+
+def percentile(values: list[float], pct: int) -> float:
+    return statistics.quantiles(values, n=100)[pct - 1] if len(values) > 1 else values[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent ingestion throughput benchmark")
+    parser.add_argument("--base-url", type=str, default="http://localhost:8000")
+    parser.add_argument("--token", type=str, required=True, help="Speaker access token")
+    parser.add_argument("--speakers", type=int, default=50, help="Concurrent speakers")
+    parser.add_argument("--segments", type=int, default=20, help="Text+audio segment pairs per speaker")
+    parser.add_argument("--audio-size", type=int, default=40 * 1024, help="Bytes per audio segment")
+    args = parser.parse_args()
+
+    latencies = defaultdict(list)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.speakers) as executor:
+        for future in [executor.submit(run_speaker, args, latencies) for _ in range(args.speakers)]:
+            future.result()
+    total_elapsed = time.perf_counter() - start
+
+    total_requests = sum(len(values) for values in latencies.values())
+    print(f"{total_requests} requests in {total_elapsed:.2f}s - {total_requests / total_elapsed:.1f} req/s")
+    for name, values in latencies.items():
+        print(
+            f"{name:>14}: n={len(values)} "
+            f"p50={percentile(values, 50) * 1000:.1f}ms "
+            f"p95={percentile(values, 95) * 1000:.1f}ms "
+            f"p99={percentile(values, 99) * 1000:.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
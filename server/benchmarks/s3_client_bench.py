@@ -0,0 +1,116 @@
+"""Content storage S3 client benchmark.
+
+Compares creating an S3 client per call (the previous approach) against the process wide
+`ContentStorageClient`, on the calls the server makes - presigning preview URLs, uploading session
+text files and uploading session audio files - from concurrent threads like the finalization workers.
+
+Usage:
+    python benchmarks/s3_client_bench.py --endpoint-url http://localhost:9000 --bucket bench
+    python benchmarks/s3_client_bench.py --calls 200 --threads 8 --audio-mb 64
+
+Runs against any S3 compatible endpoint (MinIO, moto_server). Without --endpoint-url an in process
+moto server is started - requires `pip install "moto[server]"`. Credentials are taken from the usual
+AWS environment variables (any value works for moto).
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import boto3
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utility.storage import ContentStorageClient  # noqa: E402
+
+
+def start_moto_server() -> str:
+    from moto.server import ThreadedMotoServer
+
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    return f"http://{host}:{port}"
+
+
+def per_call_client():
+    return boto3.client("s3")
+
+
+def run_calls(get_client, call, calls: int, threads: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(lambda i: call(get_client(), i), range(calls)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint-url", default=None, help="S3 endpoint - an in process moto server by default")
+    parser.add_argument("--bucket", default="recital-bench", help="Bucket to use (created if missing)")
+    parser.add_argument("--calls", type=int, default=200, help="Calls per operation")
+    parser.add_argument("--threads", type=int, default=8, help="Concurrent callers")
+    parser.add_argument("--text-kb", type=int, default=64, help="Size of each uploaded text file in KiB")
+    parser.add_argument("--audio-mb", type=int, default=64, help="Size of the uploaded audio file in MiB")
+    parser.add_argument("--audio-uploads", type=int, default=4, help="Audio file uploads")
+    args = parser.parse_args()
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "bench")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "bench")
+    os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+    # Picked up by every client created - shared or per call alike
+    os.environ["AWS_ENDPOINT_URL"] = args.endpoint_url or start_moto_server()
+
+    shared = ContentStorageClient(
+        max_pool_connections=32,
+        max_attempts=5,
+        retry_mode="standard",
+        multipart_threshold_mb=16,
+        multipart_chunk_size_mb=16,
+        max_concurrency=8,
+    )
+    buckets = [bucket["Name"] for bucket in shared.client.list_buckets()["Buckets"]]
+    if args.bucket not in buckets:
+        shared.client.create_bucket(Bucket=args.bucket)
+
+    work_dir = Path(tempfile.mkdtemp(prefix="s3_bench_"))
+    text_file = Path(work_dir, "session.vtt")
+    text_file.write_bytes(os.urandom(args.text_kb * 1024))
+    audio_file = Path(work_dir, "session.mp3")
+    audio_file.write_bytes(os.urandom(args.audio_mb * 1024 * 1024))
+
+    def presign(s3, i):
+        s3.generate_presigned_url("get_object", Params={"Bucket": args.bucket, "Key": f"s{i}/light.audio.mp3"})
+
+    def upload_text(s3, i):
+        s3.upload_file(str(text_file), args.bucket, f"s{i}/transcript.vtt")
+
+    def upload_audio_default(s3, i):
+        s3.upload_file(str(audio_file), args.bucket, f"s{i}/main.audio.mp3")
+
+    def upload_audio_tuned(s3, i):
+        s3.upload_file(str(audio_file), args.bucket, f"s{i}/main.audio.mp3", Config=shared.transfer_config)
+
+    operations = (
+        ("presign", presign, args.calls, presign),
+        ("text upload", upload_text, args.calls, upload_text),
+        ("audio upload", upload_audio_default, args.audio_uploads, upload_audio_tuned),
+    )
+    print(f"{'operation':>14} {'calls':>6} {'per call (s)':>13} {'shared (s)':>11} {'speedup':>8}")
+    for name, per_call_operation, calls, shared_operation in operations:
+        per_call_elapsed = run_calls(per_call_client, per_call_operation, calls, args.threads)
+        shared_elapsed = run_calls(lambda: shared.client, shared_operation, calls, args.threads)
+        print(
+            f"{name:>14} {calls:>6} {per_call_elapsed:>13.3f} {shared_elapsed:>11.3f} "
+            f"{per_call_elapsed / shared_elapsed:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
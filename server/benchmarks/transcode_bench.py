@@ -0,0 +1,101 @@
+"""Session audio transcode benchmark.
+
+Compares deriving the main and light session audio files with two separate ffmpeg runs
+(the previous approach) against the single pass `derive_audio` run. Synthetic webm/opus
+sources - the format the recital web client records - are generated for each session length.
+
+Usage:
+    python benchmarks/transcode_bench.py --minutes 5 30 90
+
+Reports wall time and the CPU time (user + sys) spent by the ffmpeg/ffprobe child processes.
+"""
+
+import argparse
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from engines.audio_probe import get_audio_properties  # noqa: E402
+from engines.transform_engine import derive_audio  # noqa: E402
+
+
+def generate_source(work_dir: Path, minutes: int) -> Path:
+    source = Path(work_dir, f"source_{minutes}m.webm")
+    if not source.exists():
+        subprocess.check_call(
+            [
+                "ffmpeg",
+                "-y",
+                "-nostdin",
+                "-loglevel",
+                "error",
+                "-f",
+                "lavfi",
+                "-i",
+                f"anoisesrc=d={minutes * 60}:c=pink:a=0.1:r=48000",
+                "-c:a",
+                "libopus",
+                "-b:a",
+                "32k",
+                str(source),
+            ]
+        )
+    return source
+
+
+def derive_audio_two_passes(source: Path, output_folder: str, output_basename: str, target_duration: float):
+    audio_info = get_audio_properties(source)
+    extension = "webm" if audio_info and audio_info["codec_name"] == "vorbis" else "mka"
+    base_cmd = ["ffmpeg", "-y", "-nostdin", "-fflags", "+genpts", "-i", str(source), "-t", str(target_duration)]
+    subprocess.check_call(
+        [*base_cmd, "-acodec", "copy", str(Path(output_folder, f"{output_basename}.{extension}"))],
+        stderr=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+    )
+    subprocess.check_call(
+        [*base_cmd, str(Path(output_folder, f"{output_basename}.mp3"))],
+        stderr=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def children_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(run, *args) -> tuple[float, float]:
+    cpu_start = children_cpu_time()
+    wall_start = time.perf_counter()
+    run(*args)
+    return time.perf_counter() - wall_start, children_cpu_time() - cpu_start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[5, 30, 90], help="Session lengths to benchmark")
+    parser.add_argument("--runs", type=int, default=1, help="Runs per session length - the best run is reported")
+    parser.add_argument("--work-dir", default=None, help="Folder for generated sources (kept between runs)")
+    args = parser.parse_args()
+
+    work_dir = Path(args.work_dir or tempfile.mkdtemp(prefix="transcode_bench_"))
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    print(f"{'minutes':>8} {'approach':>12} {'wall (s)':>10} {'cpu (s)':>10}")
+    for minutes in args.minutes:
+        source = generate_source(work_dir, minutes)
+        target_duration = minutes * 60 - 1  # As a session with its last text segment before the audio end
+        with tempfile.TemporaryDirectory(dir=work_dir) as output_folder:
+            for approach, run in (("two passes", derive_audio_two_passes), ("single pass", derive_audio)):
+                results = [measure(run, source, output_folder, "session", target_duration) for _ in range(args.runs)]
+                wall, cpu = min(results)
+                print(f"{minutes:>8} {approach:>12} {wall:>10.2f} {cpu:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -38,6 +38,35 @@ def configure(container: "Container"):
     container.config.data.root_folder.from_value(env("ROOT_DATA_FOLDER", default="data"))
     container.config.data.content_s3_bucket.from_value(env("CONTENT_STORAGE_S3_BUCKET"))
     container.config.data.content_s3_disabled.from_value(env.bool("CONTENT_DISABLE_S3_UPLOAD", default=False))
+    container.config.data.content_s3.max_pool_connections.from_value(
+        env.int("CONTENT_STORAGE_S3_MAX_POOL_CONNECTIONS", default=32)
+    )
+    container.config.data.content_s3.max_attempts.from_value(env.int("CONTENT_STORAGE_S3_MAX_ATTEMPTS", default=5))
+    container.config.data.content_s3.retry_mode.from_value(env("CONTENT_STORAGE_S3_RETRY_MODE", default="standard"))
+    container.config.data.content_s3.multipart_threshold_mb.from_value(
+        env.int("CONTENT_STORAGE_S3_MULTIPART_THRESHOLD_MB", default=16)
+    )
+    container.config.data.content_s3.multipart_chunk_size_mb.from_value(
+        env.int("CONTENT_STORAGE_S3_MULTIPART_CHUNK_SIZE_MB", default=16)
+    )
+    container.config.data.content_s3.max_concurrency.from_value(
+        env.int("CONTENT_STORAGE_S3_MAX_CONCURRENCY", default=8)
+    )
+    container.config.data.max_audio_segment_size_mb.from_value(env.int("MAX_AUDIO_SEGMENT_SIZE_MB", default=10))
+    container.config.data.audio_segment_spool_enabled.from_value(env.bool("AUDIO_SEGMENT_SPOOL_ENABLED", default=False))
+    container.config.data.disk_pressure.soft_free_mb.from_value(env.int("DISK_PRESSURE_SOFT_FREE_MB", default=4096))
+    container.config.data.disk_pressure.hard_free_mb.from_value(env.int("DISK_PRESSURE_HARD_FREE_MB", default=1024))
+    container.config.data.disk_pressure.retry_after_sec.from_value(env.int("DISK_PRESSURE_RETRY_AFTER_SEC", default=60))
+
+    container.config.cache.session_access.max_size.from_value(env.int("SESSION_ACCESS_CACHE_MAX_SIZE", default=10000))
+    container.config.cache.session_access.ttl_sec.from_value(env.int("SESSION_ACCESS_CACHE_TTL_SEC", default=30))
+    container.config.cache.users.max_size.from_value(env.int("USER_CACHE_MAX_SIZE", default=2000))
+    container.config.cache.users.ttl_sec.from_value(env.int("USER_CACHE_TTL_SEC", default=60))
+    container.config.cache.presigned_urls.max_size.from_value(env.int("PRESIGNED_URL_CACHE_MAX_SIZE", default=20000))
+    container.config.cache.presigned_urls.expires_in_sec.from_value(env.int("PRESIGNED_URL_EXPIRES_SEC", default=1200))
+    container.config.cache.presigned_urls.safety_margin_sec.from_value(
+        env.int("PRESIGNED_URL_CACHE_SAFETY_MARGIN_SEC", default=300)
+    )
 
     container.config.stats.leaderboard_depth.from_value(env.int("LEADERBOARD_DEPTH", default=20))
 
@@ -47,9 +76,51 @@ def configure(container: "Container"):
     container.config.jobs.session_finalization.disabled.from_value(
         env.bool("JOB_SESSION_FINALIZATION_DISABLED", default=False)
     )
+    container.config.jobs.session_finalization.run_in_api.from_value(
+        env.bool("JOB_SESSION_FINALIZATION_RUN_IN_API", default=True)
+    )
     container.config.jobs.session_finalization.interval_sec.from_value(
         env.int("JOB_SESSION_FINALIZATION_INTERVAL_SEC", default=120)
     )
+    container.config.jobs.session_finalization.concurrency.from_value(
+        env.int("JOB_SESSION_FINALIZATION_CONCURRENCY", default=1)
+    )
+    container.config.jobs.session_finalization.upload_concurrency.from_value(
+        env.int("JOB_SESSION_FINALIZATION_UPLOAD_CONCURRENCY", default=4)
+    )
+    container.config.jobs.session_finalization.time_budget_sec.from_value(
+        env.int("JOB_SESSION_FINALIZATION_TIME_BUDGET_SEC", default=0)
+    )
+    container.config.jobs.session_finalization.claim_lease_sec.from_value(
+        env.int("JOB_SESSION_FINALIZATION_CLAIM_LEASE_SEC", default=60 * 60)
+    )
+    container.config.jobs.session_finalization.max_attempts.from_value(
+        env.int("JOB_SESSION_FINALIZATION_MAX_ATTEMPTS", default=8)
+    )
+    container.config.jobs.session_finalization.retry_backoff_sec.from_value(
+        env.int("JOB_SESSION_FINALIZATION_RETRY_BACKOFF_SEC", default=120)
+    )
+    container.config.jobs.session_finalization.retry_backoff_max_sec.from_value(
+        env.int("JOB_SESSION_FINALIZATION_RETRY_BACKOFF_MAX_SEC", default=6 * 60 * 60)
+    )
+    container.config.jobs.session_finalization.incremental_enabled.from_value(
+        env.bool("JOB_SESSION_FINALIZATION_INCREMENTAL_ENABLED", default=False)
+    )
+    container.config.jobs.session_finalization.silence_threshold_db.from_value(
+        env.float("JOB_SESSION_FINALIZATION_SILENCE_THRESHOLD_DB", default=-50.0)
+    )
+    container.config.jobs.session_finalization.silence_disavow_ratio.from_value(
+        env.float("JOB_SESSION_FINALIZATION_SILENCE_DISAVOW_RATIO", default=0)
+    )
+    container.config.jobs.session_finalization.silence_trim_sec.from_value(
+        env.float("JOB_SESSION_FINALIZATION_SILENCE_TRIM_SEC", default=10.0)
+    )
+    container.config.jobs.session_duration_flush.interval_sec.from_value(
+        env.int("JOB_SESSION_DURATION_FLUSH_INTERVAL_SEC", default=5)
+    )
+    container.config.jobs.disk_pressure_check.interval_sec.from_value(
+        env.int("JOB_DISK_PRESSURE_CHECK_INTERVAL_SEC", default=30)
+    )
 
     container.config.analytics.posthog.api_key.from_value(env("PUBLIC_POSTHOG_KEY"))
     container.config.analytics.posthog.host.from_value(env("PUBLIC_POSTHOG_HOST"))
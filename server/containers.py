@@ -1,20 +1,26 @@
 from dependency_injector import containers, providers
 
 from engines.aggregation_engine import AggregationEngine
+from engines.disk_pressure_engine import DiskPressureEngine
 from engines.extraction_engine import ExtractionEngine
 from engines.nlp_pipeline import NlpPipeline
+from engines.session_duration_engine import SessionDurationEngine
 from engines.transform_engine import TransformEngine
 from managers.document_manager import DocumentManager
 from managers.recital_manager import RecitalManager
-from models.database import Database
+from models.database import AsyncDatabase, Database
 from resource_access.documents_ra import DocumentsRA
 from resource_access.recitals_content_ra import RecitalsContentRA
-from resource_access.recitals_ra import RecitalsRA
-from resource_access.stats_ra import StatsRA
-from resource_access.users_ra import UsersRA
+from resource_access.recitals_ra import AsyncRecitalsRA, RecitalsRA
+from resource_access.stats_ra import AsyncStatsRA, StatsRA
+from resource_access.users_ra import AsyncUsersRA, UsersRA
 from utility.analytics.posthog import ConfiguredPosthog
+from utility.cache.presigned_urls import PresignedUrlCache
+from utility.cache.sessions import SessionAccessCache
+from utility.cache.users import UserCache
 from utility.communication.email import Emailer
 from utility.scheduler import JobScheduler
+from utility.storage import ContentStorageClient
 
 
 class Container(containers.DeclarativeContainer):
@@ -34,33 +40,101 @@ class Container(containers.DeclarativeContainer):
     )
 
     db = providers.Singleton(Database, connection_str=config.db.connection_str)
+    async_db = providers.Singleton(AsyncDatabase)
     job_scheduler = providers.Singleton(JobScheduler)
+    content_storage_client = providers.Singleton(
+        ContentStorageClient,
+        max_pool_connections=config.data.content_s3.max_pool_connections,
+        max_attempts=config.data.content_s3.max_attempts,
+        retry_mode=config.data.content_s3.retry_mode,
+        multipart_threshold_mb=config.data.content_s3.multipart_threshold_mb,
+        multipart_chunk_size_mb=config.data.content_s3.multipart_chunk_size_mb,
+        max_concurrency=config.data.content_s3.max_concurrency,
+    )
+
+    session_access_cache = providers.Singleton(
+        SessionAccessCache,
+        max_size=config.cache.session_access.max_size,
+        ttl_sec=config.cache.session_access.ttl_sec,
+    )
+    user_cache = providers.Singleton(
+        UserCache,
+        max_size=config.cache.users.max_size,
+        ttl_sec=config.cache.users.ttl_sec,
+    )
+    presigned_url_cache = providers.Singleton(
+        PresignedUrlCache,
+        max_size=config.cache.presigned_urls.max_size,
+        expires_in_sec=config.cache.presigned_urls.expires_in_sec,
+        safety_margin_sec=config.cache.presigned_urls.safety_margin_sec,
+    )
 
     documents_ra = providers.Factory(
         DocumentsRA,
         session_factory=db.provided.session,
     )
     recitals_ra = providers.Factory(
-        RecitalsRA, session_factory=db.provided.session, data_folder=config.data.root_folder
+        RecitalsRA,
+        session_factory=db.provided.session,
+        session_access_cache=session_access_cache,
     )
     recitals_content_ra = providers.Factory(
-        RecitalsContentRA, data_folder=config.data.root_folder, content_s3_bucket=config.data.content_s3_bucket
+        RecitalsContentRA,
+        data_folder=config.data.root_folder,
+        content_s3_bucket=config.data.content_s3_bucket,
+        content_storage_client=content_storage_client,
+        presigned_url_cache=presigned_url_cache,
     )
     users_ra = providers.Factory(
         UsersRA,
         session_factory=db.provided.session,
+        user_cache=user_cache,
     )
     stats_ra = providers.Factory(
         StatsRA,
         session_factory=db.provided.session,
     )
 
+    # Async resource access - for the latency sensitive request paths
+    async_recitals_ra = providers.Factory(
+        AsyncRecitalsRA,
+        session_factory=async_db.provided.session,
+        session_access_cache=session_access_cache,
+    )
+    async_users_ra = providers.Factory(
+        AsyncUsersRA,
+        session_factory=async_db.provided.session,
+        user_cache=user_cache,
+    )
+    async_stats_ra = providers.Factory(
+        AsyncStatsRA,
+        session_factory=async_db.provided.session,
+    )
+
     nlp_pipeline = providers.Singleton(NlpPipeline)
 
     extraction_engine = providers.Factory(ExtractionEngine, nlp_pipeline=nlp_pipeline)
-    transform_engine = providers.Factory(TransformEngine, recitals_ra=recitals_ra, data_folder=config.data.root_folder)
+    transform_engine = providers.Factory(TransformEngine, data_folder=config.data.root_folder)
     aggregation_engine = providers.Factory(
-        AggregationEngine, recitals_ra=recitals_ra, data_folder=config.data.root_folder
+        AggregationEngine,
+        recitals_content_ra=recitals_content_ra,
+        data_folder=config.data.root_folder,
+    )
+
+    session_duration_engine = providers.Singleton(
+        SessionDurationEngine,
+        flush_interval_sec=config.jobs.session_duration_flush.interval_sec,
+        job_scheduler=job_scheduler,
+        recitals_ra=recitals_ra,
+    )
+
+    disk_pressure_engine = providers.Singleton(
+        DiskPressureEngine,
+        data_folder=config.data.root_folder,
+        soft_free_mb=config.data.disk_pressure.soft_free_mb,
+        hard_free_mb=config.data.disk_pressure.hard_free_mb,
+        retry_after_sec=config.data.disk_pressure.retry_after_sec,
+        check_interval_sec=config.jobs.disk_pressure_check.interval_sec,
     )
 
     document_manager = providers.Singleton(
@@ -73,11 +147,26 @@ class Container(containers.DeclarativeContainer):
         RecitalManager,
         session_finalization_job_disabled=config.jobs.session_finalization.disabled,
         session_finalization_job_interval=config.jobs.session_finalization.interval_sec,
+        session_finalization_concurrency=config.jobs.session_finalization.concurrency,
+        session_finalization_upload_concurrency=config.jobs.session_finalization.upload_concurrency,
+        session_finalization_time_budget_sec=config.jobs.session_finalization.time_budget_sec,
+        session_finalization_claim_lease_sec=config.jobs.session_finalization.claim_lease_sec,
+        session_finalization_max_attempts=config.jobs.session_finalization.max_attempts,
+        session_finalization_retry_backoff_sec=config.jobs.session_finalization.retry_backoff_sec,
+        session_finalization_retry_backoff_max_sec=config.jobs.session_finalization.retry_backoff_max_sec,
+        session_finalization_incremental_enabled=config.jobs.session_finalization.incremental_enabled,
+        session_silence_threshold_db=config.jobs.session_finalization.silence_threshold_db,
+        session_silence_disavow_ratio=config.jobs.session_finalization.silence_disavow_ratio,
+        session_silence_trim_sec=config.jobs.session_finalization.silence_trim_sec,
         disable_s3_upload=config.data.content_s3_disabled,
+        audio_segment_spool_enabled=config.data.audio_segment_spool_enabled,
         posthog=posthog,
         job_scheduler=job_scheduler,
         recitals_ra=recitals_ra,
+        async_recitals_ra=async_recitals_ra,
         recitals_content_ra=recitals_content_ra,
         aggregation_engine=aggregation_engine,
         transform_engine=transform_engine,
+        session_duration_engine=session_duration_engine,
+        disk_pressure_engine=disk_pressure_engine,
     )
@@ -1,115 +1,166 @@
+import itertools
 import json
 import os
 import pathlib
 import re
-import shutil
-import subprocess
-from datetime import datetime, timezone
 from pathlib import Path
-from typing import Tuple
-
-from webvtt import Caption, WebVTT
+from typing import IO, Iterable, NamedTuple, Optional
 
+from models.recital_audio_segment import RecitalAudioSegment
 from models.recital_text_segment import RecitalTextSegment
-from resource_access.recitals_ra import RecitalsRA
-
-
-def normalize_text_as_caption_text(text: str) -> str:
-    return re.sub(r"\s+", " ", text)
+from resource_access.recitals_content_ra import RecitalsContentRA
+from utility.captions import CAPTION_FORMATS, CaptionWriter
+from utility.files import concat_files
 
 
-def get_caption_time_string(seconds: float) -> str:
-    # Format to hh:mm:ss.zzz
-    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime("%H:%M:%S.%f")[:-3]
+class CaptionsProgress(NamedTuple):
+    """Captions written into the partial captions file of a session while it was recording."""
 
+    captions: int
+    last_seek_end: float
+    # Size of the partial captions file up to the last caption - anything beyond is an interrupted write
+    size: int
 
-def create_caption(text: str, start: float, end: float) -> Caption:
-    return Caption(
-        # Format to hh:mm:ss.zzz
-        start=get_caption_time_string(start),
-        end=get_caption_time_string(end),
-        text=normalize_text_as_caption_text(text),
-    )
 
+class AggregationEngine:
+    def __init__(self, recitals_content_ra: RecitalsContentRA, data_folder: str) -> None:
+        self.recitals_content_ra = recitals_content_ra
+        self.data_folder = data_folder
 
-def parse_audio_info(audio_info):
-    if audio_info is not None and "streams" in audio_info:
-        for stream in audio_info["streams"]:
-            if stream["codec_type"] == "audio":
-                codec_name = str(stream["codec_name"])
-                channels = int(stream["channels"])
-                return {"channels": channels, "codec_name": codec_name}
-    return None
+    def _get_partial_captions_path(self, session_id: str, format: str) -> Path:
+        return Path(self.data_folder, f"{session_id}.{format}.partial")
 
+    def _get_captions_progress_path(self, session_id: str, format: str) -> Path:
+        return Path(self.data_folder, f"{session_id}.{format}.partial.idx")
 
-def get_audio_properties(input_file):
-    # Check if the file exists
-    if not os.path.isfile(input_file):
-        print("Warning - Input audio file does not exist...", input_file)
-        return None
+    def get_session_captions_progress(self, session_id: str, format: str = "vtt") -> Optional[CaptionsProgress]:
+        progress_path = self._get_captions_progress_path(session_id, format)
+        if not progress_path.exists() or not self._get_partial_captions_path(session_id, format).exists():
+            return None
 
-    # Run ffprobe to get audio properties in JSON format
-    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-select_streams", "a", input_file]
-    result = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
-    output = result.stdout
+        return CaptionsProgress(**json.loads(progress_path.read_text()))
+
+    def _store_captions_progress(self, session_id: str, format: str, progress: CaptionsProgress) -> None:
+        progress_path = self._get_captions_progress_path(session_id, format)
+        temp_progress_path = progress_path.with_suffix(".tmp")
+        temp_progress_path.write_text(json.dumps(progress._asdict()))
+        os.replace(temp_progress_path, progress_path)
+
+    def _remove_partial_captions(self, session_id: str, format: str) -> None:
+        self._get_partial_captions_path(session_id, format).unlink(missing_ok=True)
+        self._get_captions_progress_path(session_id, format).unlink(missing_ok=True)
+
+    @staticmethod
+    def _write_captions(
+        captions_file: IO,
+        session_id: str,
+        text_segments: Iterable[RecitalTextSegment],
+        format: str,
+        progress: Optional[CaptionsProgress],
+        until: Optional[float] = None,
+    ) -> CaptionsProgress:
+        if progress:
+            # Continue right after the captions written so far
+            captions_file.truncate(progress.size)
+            captions_file.seek(progress.size)
+            writer = CaptionWriter(captions_file, format, progress.captions)
+            prev_seek = progress.last_seek_end
+        else:
+            writer = CaptionWriter(captions_file, format)
+            writer.write_header("IVRIT.AI Recital Session Captions", f"Session ID: {session_id}")
+            prev_seek = 0
+
+        for text_segment in text_segments:
+            if until is not None and prev_seek >= until:
+                # Captions start where the previous one ended - all the rest start past the audio too
+                break
+            seek_end = text_segment.seek_end if until is None else min(text_segment.seek_end, until)
+            writer.write_caption(text_segment.text, prev_seek, seek_end)
+            prev_seek = seek_end
+
+        captions_file.flush()
+        return CaptionsProgress(writer.captions_count, prev_seek, captions_file.tell())
+
+    def append_session_captions(
+        self, session_id: str, text_segments: Iterable[RecitalTextSegment], format: str = "vtt"
+    ) -> Optional[CaptionsProgress]:
+        """Appends captions of newly recorded text onto the partial captions of a session which is still recording.
 
-    # Parse the JSON output
-    info = None
-    try:
-        raw_info = json.loads(output)
-        info = parse_audio_info(raw_info)
-    except:
-        print("Warning - Unable to probe input audio source properties...")
-        pass
+        Args:
+            session_id (str): The session to process
+            text_segments (Iterable[RecitalTextSegment]): Text recorded since the last append - ordered by seek end
+            format (str, optional): Captions format - "vtt", "srt" or "jsonl". Defaults to "vtt".
 
-    return info
+        Returns:
+            Optional[CaptionsProgress]: The captions written so far - None while the session has no text
+        """
+        progress = self.get_session_captions_progress(session_id, format)
+        text_segments = iter(text_segments)
+        first_text_segment = next(text_segments, None)
+        if first_text_segment is None:
+            return progress
+
+        with open(
+            self._get_partial_captions_path(session_id, format), "r+" if progress else "w", encoding="utf-8"
+        ) as captions_file:
+            progress = self._write_captions(
+                captions_file, session_id, itertools.chain([first_text_segment], text_segments), format, progress
+            )
 
+        self._store_captions_progress(session_id, format, progress)
+        return progress
 
-class AggregationEngine:
-    def __init__(self, recitals_ra: RecitalsRA, data_folder: str) -> None:
-        self.recitals_ra = recitals_ra
-        self.data_folder = data_folder
+    def aggregate_session_captions(
+        self,
+        session_id: str,
+        text_segments: Iterable[RecitalTextSegment],
+        format: str = "vtt",
+        progress: Optional[CaptionsProgress] = None,
+        until: Optional[float] = None,
+    ) -> Optional[str]:
+        """Writes the text of a session as captions in the requested format into the data folder.
 
-    def aggregate_session_captions(self, session_id: str, format: str = "vtt") -> str:
-        """Aggregates text of a session onto the requested captions format.
+        Captions are written while the text segments are consumed - a streamed iterable is never held in memory.
+        Given the progress of captions written while recording, only the remaining text segments are expected
+        and the partial captions become the captions file.
 
         Args:
             session_id (str): The session to process
-            format (str, optional): Captions format. Currently only supports "vtt".
+            text_segments (Iterable[RecitalTextSegment]): The session text segments - ordered by seek end
+            format (str, optional): Captions format - "vtt", "srt" or "jsonl". Defaults to "vtt".
+            progress (CaptionsProgress, optional): Progress of the partial captions to complete
+            until (float, optional): End of the session audio - later captions are dropped and
+                the caption spanning it is clipped. Defaults to the end of the text.
 
         Raises:
             ValueError: Format not supported
 
         Returns:
-            str: The captions content in the requested format
+            Optional[str]: The captions file name - None if the session has no timed text
         """
-        if not format == "vtt":
-            raise ValueError("Only `vtt` format is supported")
-
-        vtt = WebVTT()
-
-        vtt.header_comments.append("IVRIT.AI Recital Session Captions")
-        vtt.header_comments.append(f"Session ID: {session_id}")
-
-        prev_seek = 0
-        for text_segment in self.recitals_ra.get_session_text_segments(session_id):
-            text_segment: RecitalTextSegment = text_segment
-            vtt.captions.append(
-                create_caption(
-                    text_segment.text,
-                    prev_seek,
-                    text_segment.seek_end,
-                )
-            )
-            prev_seek = text_segment.seek_end
-
-        if prev_seek == 0:
+        if format not in CAPTION_FORMATS:
+            raise ValueError(f"Unsupported captions format `{format}` - supported: {', '.join(CAPTION_FORMATS)}")
+
+        captions_filename = f"{session_id}.{format}"
+        captions_path = Path(self.data_folder, captions_filename)
+        if progress:
+            partial_captions_path = self._get_partial_captions_path(session_id, format)
+            with open(partial_captions_path, "r+", encoding="utf-8") as captions_file:
+                progress = self._write_captions(captions_file, session_id, text_segments, format, progress, until)
+            os.replace(partial_captions_path, captions_path)
+        else:
+            with open(captions_path, "w", encoding="utf-8") as captions_file:
+                progress = self._write_captions(captions_file, session_id, text_segments, format, None, until)
+        # Partial captions which could not be resumed are superseded
+        self._remove_partial_captions(session_id, format)
+
+        if progress.last_seek_end == 0:
+            captions_path.unlink()
             return None
 
-        return vtt.content
+        return captions_filename
 
-    def _get_audio_segment_file_names(self, session_id: str) -> list[str]:
-        audio_segments = self.recitals_ra.get_audio_segments(session_id)
+    def _get_audio_segment_file_names(self, audio_segments: list[RecitalAudioSegment]) -> list[str]:
         maybe_audio_segments_filenames = [segment.filename for segment in audio_segments]
 
         # Check the existence of the segment file names.
@@ -120,10 +171,11 @@ class AggregationEngine:
         for seg_filename in file_names:
             os.remove(Path(self.data_folder, seg_filename))
 
-    def delete_audio_segment_files(self, session_id: str) -> None:
-        audio_segments_filenames = self._get_audio_segment_file_names(session_id)
+    def delete_audio_segment_files(self, session_id: str, audio_segments: list[RecitalAudioSegment]) -> None:
+        audio_segments_filenames = self._get_audio_segment_file_names(audio_segments)
         if len(audio_segments_filenames) > 0:
             self._delete_audio_segment_file_names(audio_segments_filenames)
+        self.recitals_content_ra.remove_audio_spool_index(session_id)
 
     def delete_session_audio(self, session_id: str) -> None:
         # Find all files that start with the session_id and end with .seg.*
@@ -132,9 +184,19 @@ class AggregationEngine:
         # from the local storage as possible for this session
         for file_to_del in pathlib.Path(self.data_folder).glob(f"{session_id}*.seg.*"):
             os.remove(file_to_del)
+        for file_to_del in pathlib.Path(self.data_folder).glob(f"{session_id}*.spool*"):
+            os.remove(file_to_del)
+        for file_to_del in pathlib.Path(self.data_folder).glob(f"{session_id}.*.partial*"):
+            os.remove(file_to_del)
+
+    def aggregate_session_audio(self, session_id: str, audio_segments: list[RecitalAudioSegment]) -> str:
+        # Segments which were not appended into the spool remain as segment files
+        audio_segments_filenames = self._get_audio_segment_file_names(audio_segments)
 
-    def aggregate_session_audio(self, session_id: str) -> str:
-        audio_segments_filenames = self._get_audio_segment_file_names(session_id)
+        # Spooled sessions are already concatenated on ingest
+        spooled_audio_filename = self.recitals_content_ra.finalize_audio_spool(session_id, audio_segments_filenames)
+        if spooled_audio_filename:
+            return spooled_audio_filename
 
         if len(audio_segments_filenames) == 0:
             return None
@@ -145,9 +207,9 @@ class AggregationEngine:
         concatenated_filename = re.sub(r"\.seg\..*", "", first_audio_segment_filename)
 
         # Concat all segments into a single file
-        with open(Path(self.data_folder, concatenated_filename), "wb") as concat_file:
-            for seg_filename in audio_segments_filenames:
-                with open(Path(self.data_folder, seg_filename), "rb") as seg_file:
-                    shutil.copyfileobj(seg_file, concat_file)
+        concat_files(
+            Path(self.data_folder, concatenated_filename),
+            [Path(self.data_folder, seg_filename) for seg_filename in audio_segments_filenames],
+        )
 
         return concatenated_filename
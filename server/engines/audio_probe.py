@@ -0,0 +1,128 @@
+import json
+import os
+import subprocess
+from typing import NamedTuple, Optional
+
+
+class AudioMetadata(NamedTuple):
+    codec_name: str
+    channels: int
+    sample_rate: Optional[int]
+    bit_rate: Optional[int]
+    byte_size: int
+    # Real duration of the audio in the container - None if it could not be determined
+    duration: Optional[float]
+
+
+def _optional_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _optional_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_audio_info(audio_info):
+    if audio_info is not None and "streams" in audio_info:
+        for stream in audio_info["streams"]:
+            if stream["codec_type"] == "audio":
+                codec_name = str(stream["codec_name"])
+                channels = int(stream["channels"])
+                return {"channels": channels, "codec_name": codec_name}
+    return None
+
+
+def parse_ffmpeg_progress_duration(progress_output: str) -> Optional[float]:
+    # The last reported output time is the processed duration
+    duration = None
+    for line in progress_output.splitlines():
+        key, _, value = line.strip().partition("=")
+        if key == "out_time_us" and value.isdigit():
+            duration = int(value) / 1_000_000
+    return duration
+
+
+def run_ffprobe(input_file, show_format: bool = False) -> Optional[dict]:
+    # Check if the file exists
+    if not os.path.isfile(input_file):
+        print("Warning - Input audio file does not exist...", input_file)
+        return None
+
+    # Run ffprobe to get audio properties in JSON format
+    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-select_streams", "a"]
+    if show_format:
+        cmd.append("-show_format")
+    cmd.append(str(input_file))
+    result = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+
+    # Parse the JSON output
+    try:
+        return json.loads(result.stdout)
+    except ValueError:
+        print("Warning - Unable to probe input audio source properties...")
+        return None
+
+
+def get_audio_properties(input_file):
+    return parse_audio_info(run_ffprobe(input_file))
+
+
+def measure_audio_duration(input_file) -> Optional[float]:
+    """Measures the audio duration by demuxing the whole file - no decoding.
+
+    Needed for recorded streams (e.g. MediaRecorder webm) whose container does not state a duration.
+    """
+    cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-nostats",
+        "-progress",
+        "pipe:1",
+        "-i",
+        str(input_file),
+        "-map",
+        "0:a:0",
+        "-c",
+        "copy",
+        "-f",
+        "null",
+        "-",
+    ]
+    try:
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print("Warning - Unable to measure audio duration...", input_file)
+        print(e)
+        return None
+
+    return parse_ffmpeg_progress_duration(result.stdout)
+
+
+def probe_audio_metadata(input_file) -> Optional[AudioMetadata]:
+    probe_info = run_ffprobe(input_file, show_format=True)
+    if not probe_info:
+        return None
+
+    audio_stream = next((s for s in probe_info.get("streams", []) if s.get("codec_type") == "audio"), None)
+    if not audio_stream:
+        return None
+
+    container_format = probe_info.get("format", {})
+    duration = _optional_float(container_format.get("duration")) or _optional_float(audio_stream.get("duration"))
+    if duration is None:
+        duration = measure_audio_duration(input_file)
+
+    return AudioMetadata(
+        codec_name=str(audio_stream["codec_name"]),
+        channels=int(audio_stream["channels"]),
+        sample_rate=_optional_int(audio_stream.get("sample_rate")),
+        bit_rate=_optional_int(audio_stream.get("bit_rate")) or _optional_int(container_format.get("bit_rate")),
+        byte_size=os.path.getsize(input_file),
+        duration=duration,
+    )
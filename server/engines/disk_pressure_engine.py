@@ -0,0 +1,121 @@
+import os
+import threading
+from contextlib import contextmanager
+from enum import StrEnum
+from typing import Iterator, NamedTuple
+
+from errors import StorageFullError
+
+
+class DiskPressureLevel(StrEnum):
+    NORMAL = "normal"
+    # Finalized sessions should be cleared off the data folder
+    SOFT = "soft"
+    # New recordings are turned away
+    HARD = "hard"
+
+
+class DiskUsage(NamedTuple):
+    free_bytes: int
+    total_bytes: int
+
+
+class DiskPressureEngine:
+    """Watches the free space of the data folder against a soft and a hard watermark.
+
+    Uploads reserve their largest possible size before writing, so concurrent uploads cannot
+    overrun the hard watermark together before their files show on the disk.
+    Reservations are tracked per process.
+    """
+
+    def __init__(
+        self,
+        data_folder: str,
+        soft_free_mb: int,
+        hard_free_mb: int,
+        retry_after_sec: int,
+        check_interval_sec: int,
+    ) -> None:
+        self.data_folder = data_folder
+        self.soft_free_bytes = soft_free_mb * 1024 * 1024
+        self.hard_free_bytes = hard_free_mb * 1024 * 1024
+        self.retry_after_sec = retry_after_sec
+        self.check_interval_sec = check_interval_sec
+
+        self._lock = threading.Lock()
+        self._reserved_bytes = 0
+
+        self.rejected_requests = 0
+        self.reliefs = 0
+        self.relieved_bytes = 0
+
+    def get_disk_usage(self) -> DiskUsage:
+        usage = os.statvfs(self.data_folder)
+        # Blocks reserved for root are not ours to fill
+        return DiskUsage(free_bytes=usage.f_bavail * usage.f_frsize, total_bytes=usage.f_blocks * usage.f_frsize)
+
+    def get_available_bytes(self) -> int:
+        free_bytes = self.get_disk_usage().free_bytes
+        with self._lock:
+            return free_bytes - self._reserved_bytes
+
+    def _get_pressure_level(self, available_bytes: int) -> DiskPressureLevel:
+        if available_bytes < self.hard_free_bytes:
+            return DiskPressureLevel.HARD
+        if available_bytes < self.soft_free_bytes:
+            return DiskPressureLevel.SOFT
+        return DiskPressureLevel.NORMAL
+
+    def get_pressure_level(self) -> DiskPressureLevel:
+        return self._get_pressure_level(self.get_available_bytes())
+
+    def _reject(self) -> StorageFullError:
+        # Called holding the lock
+        self.rejected_requests += 1
+        return StorageFullError(self.retry_after_sec)
+
+    def ensure_capacity(self) -> None:
+        """Raises StorageFullError when the data folder is past the hard watermark."""
+        free_bytes = self.get_disk_usage().free_bytes
+        with self._lock:
+            if free_bytes - self._reserved_bytes < self.hard_free_bytes:
+                raise self._reject()
+
+    @contextmanager
+    def reserve(self, size_bytes: int) -> Iterator[None]:
+        """Holds size_bytes of the data folder free space for a write in progress.
+
+        Raises:
+            StorageFullError: Writing size_bytes more would cross the hard watermark
+        """
+        free_bytes = self.get_disk_usage().free_bytes
+        with self._lock:
+            if free_bytes - self._reserved_bytes - size_bytes < self.hard_free_bytes:
+                raise self._reject()
+            self._reserved_bytes += size_bytes
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved_bytes -= size_bytes
+
+    def report_relief(self, freed_bytes: int) -> None:
+        with self._lock:
+            self.reliefs += 1
+            self.relieved_bytes += freed_bytes
+
+    def stats(self) -> dict:
+        usage = self.get_disk_usage()
+        with self._lock:
+            reserved_bytes = self._reserved_bytes
+        return {
+            "level": self._get_pressure_level(usage.free_bytes - reserved_bytes),
+            "free_bytes": usage.free_bytes,
+            "total_bytes": usage.total_bytes,
+            "reserved_bytes": reserved_bytes,
+            "soft_free_bytes": self.soft_free_bytes,
+            "hard_free_bytes": self.hard_free_bytes,
+            "rejected_requests": self.rejected_requests,
+            "reliefs": self.reliefs,
+            "relieved_bytes": self.relieved_bytes,
+        }
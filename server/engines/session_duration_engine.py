@@ -0,0 +1,83 @@
+import threading
+import time
+
+from resource_access.recitals_ra import RecitalsRA
+from utility.scheduler import JobScheduler
+
+
+class SessionDurationEngine:
+    """Coalesces session duration updates reported by incoming text segments.
+
+    Keeps the max seek end seen per session in memory and periodically
+    writes all the dirty sessions in a single set-based update.
+    """
+
+    def __init__(self, flush_interval_sec: int, job_scheduler: JobScheduler, recitals_ra: RecitalsRA) -> None:
+        self.flush_interval_sec = flush_interval_sec
+        self.job_scheduler = job_scheduler
+        self.recitals_ra = recitals_ra
+        self.flush_job_id = "session_duration_flush_job"
+
+        self._lock = threading.Lock()
+        # Serializes flushes - the scheduled job and the shutdown flush may overlap
+        self._flush_lock = threading.Lock()
+        self._pending: dict[str, float] = {}
+
+        self.flushes = 0
+        self.flush_failures = 0
+        self.flushed_sessions = 0
+        self.last_flush_duration_ms = 0.0
+        self.max_flush_duration_ms = 0.0
+
+    def report_duration(self, session_id: str, duration: float) -> None:
+        with self._lock:
+            if duration > self._pending.get(session_id, float("-inf")):
+                self._pending[session_id] = duration
+
+    def schedule_flush_job(self) -> None:
+        self.job_scheduler.add_job(
+            self.flush,
+            id=self.flush_job_id,
+            replace_existing=True,
+            trigger="interval",
+            seconds=self.flush_interval_sec,
+            # Never stack flushes - the next one picks up whatever is pending
+            max_instances=1,
+            coalesce=True,
+        )
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                pending, self._pending = self._pending, {}
+
+            start = time.perf_counter()
+            try:
+                self.recitals_ra.update_session_durations(pending)
+            except Exception as e:
+                print(f"Error flushing {len(pending)} session durations: {e}")
+                self.flush_failures += 1
+                # Put the values back - keeping any newer reports
+                for session_id, duration in pending.items():
+                    self.report_duration(session_id, duration)
+                return
+
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.flushes += 1
+            self.flushed_sessions += len(pending)
+            self.last_flush_duration_ms = elapsed_ms
+            self.max_flush_duration_ms = max(self.max_flush_duration_ms, elapsed_ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            pending = len(self._pending)
+        return {
+            "pending": pending,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "flushed_sessions": self.flushed_sessions,
+            "last_flush_duration_ms": round(self.last_flush_duration_ms, 3),
+            "max_flush_duration_ms": round(self.max_flush_duration_ms, 3),
+        }
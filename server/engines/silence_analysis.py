@@ -0,0 +1,98 @@
+import subprocess
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+# Audio is analyzed as 16 kHz mono 16 bit PCM - plenty for telling speech from silence
+ANALYSIS_SAMPLE_RATE = 16000
+# Energy is measured over 20 ms frames
+FRAME_SAMPLES = ANALYSIS_SAMPLE_RATE // 50
+FRAME_BYTES = FRAME_SAMPLES * 2
+# PCM read from ffmpeg and analyzed at once - 10 seconds of audio
+BLOCK_BYTES = FRAME_BYTES * 500
+
+
+class SilenceAnalysis(NamedTuple):
+    # Length of the analyzed audio (seconds)
+    duration: float
+    # Part of the analyzed audio (0 - 1) which is silent
+    silence_ratio: float
+    # Silence after the last sound (seconds). Leading silence is not measured - trimming it would require
+    # shifting every caption timestamp along with the audio, so only the trailing silence is ever trimmed.
+    trailing_silence: float
+
+
+def analyze_silence(
+    source_audio_file: Path, silence_threshold_db: float, duration: Optional[float] = None
+) -> Optional[SilenceAnalysis]:
+    """Measures the silent parts of an audio file by the energy of its frames.
+
+    The audio is decoded by ffmpeg into a PCM pipe and analyzed block by block - never held in memory.
+    A frame is silent when its RMS level is below the threshold (dBFS).
+
+    Args:
+        source_audio_file (Path): Audio file to analyze
+        silence_threshold_db (float): Frames quieter than this level are silent (e.g. -50)
+        duration (float, optional): Analyze only the beginning of the audio up to this duration (seconds)
+
+    Returns:
+        Optional[SilenceAnalysis]: The silence measures - None if the audio could not be decoded
+    """
+    duration_ffmpeg_options = ["-t", str(duration)] if duration else []
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-nostdin",
+        "-v",
+        "error",
+        "-i",
+        str(source_audio_file),
+        *duration_ffmpeg_options,
+        "-ac",
+        "1",
+        "-ar",
+        str(ANALYSIS_SAMPLE_RATE),
+        "-f",
+        "s16le",
+        "pipe:1",
+    ]
+    # Compare mean squares rather than levels - spares a log and a square root per frame
+    silence_mean_square = (10 ** (silence_threshold_db / 20) * 32768) ** 2
+
+    frames_count = 0
+    silent_frames_count = 0
+    trailing_silent_frames = 0
+    try:
+        with subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL) as process:
+            pending = b""
+            while block := process.stdout.read(BLOCK_BYTES):
+                block = pending + block
+                whole_frames_size = len(block) - len(block) % FRAME_BYTES
+                # A trailing partial frame is completed by the next block (or dropped at the end)
+                pending = block[whole_frames_size:]
+                samples = np.frombuffer(block[:whole_frames_size], dtype="<i2").reshape(-1, FRAME_SAMPLES)
+                silent_frames = np.mean(np.square(samples, dtype=np.float64), axis=1) < silence_mean_square
+
+                frames_count += len(silent_frames)
+                silent_frames_count += int(np.count_nonzero(silent_frames))
+                sound_frame_indices = np.flatnonzero(~silent_frames)
+                if len(sound_frame_indices) == 0:
+                    trailing_silent_frames += len(silent_frames)
+                    continue
+
+                trailing_silent_frames = len(silent_frames) - 1 - int(sound_frame_indices[-1])
+    except OSError as e:
+        print("Warning - Error while decoding audio for silence analysis. Skipping.")
+        print(e)
+        return None
+
+    if process.returncode != 0 or frames_count == 0:
+        print("Warning - Unable to decode audio for silence analysis...", source_audio_file)
+        return None
+
+    frame_duration = FRAME_SAMPLES / ANALYSIS_SAMPLE_RATE
+    return SilenceAnalysis(
+        duration=frames_count * frame_duration,
+        silence_ratio=silent_frames_count / frames_count,
+        trailing_silence=trailing_silent_frames * frame_duration,
+    )
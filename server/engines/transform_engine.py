@@ -1,99 +1,138 @@
-import json
 import os
 import subprocess
 from pathlib import Path
+from typing import NamedTuple, Optional
+
+from engines.audio_probe import (
+    AudioMetadata,
+    get_audio_properties,
+    parse_ffmpeg_progress_duration,
+    probe_audio_metadata,
+)
+from engines.silence_analysis import SilenceAnalysis, analyze_silence
+from models.recital_session import RecitalSession
+
+
+class DerivedAudio(NamedTuple):
+    main_audio_filename: str
+    light_audio_filename: str
+    # Duration of the derived audio as processed by ffmpeg - None if it was not reported
+    duration: Optional[float]
+
+
+def derive_audio(
+    source_audio_file: Path,
+    output_folder: str,
+    output_basename: str,
+    target_duration: float = None,
+    codec_name: str = None,
+) -> Optional[DerivedAudio]:
+    """Derives the main (stream copy) and light (mp3) audio files from a source audio file.
+
+    Both outputs are produced by a single ffmpeg run - the source is demuxed and decoded once.
+
+    Args:
+        source_audio_file (Path): Source audio file
+        output_folder (str): Folder to write the derived files into
+        output_basename (str): File name (without extension) of the derived files
+        target_duration (float, optional): Cut the derived audio at this duration (seconds)
+        codec_name (str, optional): Codec of the source audio when already known - saves probing it
+
+    Returns:
+        Optional[DerivedAudio]: The derived files - None if transcoding failed
+    """
+    if not codec_name:
+        # Stream headers only - cheap compared to the transcode itself
+        audio_info = get_audio_properties(source_audio_file)
+        codec_name = audio_info["codec_name"] if audio_info else None
+
+    output_audio_file_extension = "mka"  # Very generic - can take almost any encoding
+    if codec_name == "vorbis":  # Place in a webm container
+        output_audio_file_extension = "webm"
+
+    main_output_audio_file = f"{output_basename}.{output_audio_file_extension}"
+    abs_main_output_audio_file = Path(output_folder, main_output_audio_file)
+    light_output_audio_file = f"{output_basename}.mp3"
+    abs_light_output_audio_file = Path(output_folder, light_output_audio_file)
+
+    # Output options apply to the output following them
+    # Append the target duration if it's specified (non-zero or non-None)
+    target_duration_ffmpeg_options = ["-t", str(target_duration)] if target_duration else []
+
+    ffmpeg_cmd = [
+        "ffmpeg",
+        "-y",
+        "-nostdin",
+        "-nostats",
+        "-progress",
+        "pipe:1",
+        "-fflags",
+        "+genpts",
+        "-i",
+        str(source_audio_file),
+        # Main output - stream copy
+        "-acodec",
+        "copy",
+        *target_duration_ffmpeg_options,
+        str(abs_main_output_audio_file),
+        # Light output - mp3 encoded
+        *target_duration_ffmpeg_options,
+        str(abs_light_output_audio_file),
+    ]
 
-from resource_access.recitals_ra import RecitalsRA
-
-
-def parse_audio_info(audio_info):
-    if audio_info is not None and "streams" in audio_info:
-        for stream in audio_info["streams"]:
-            if stream["codec_type"] == "audio":
-                codec_name = str(stream["codec_name"])
-                channels = int(stream["channels"])
-                return {"channels": channels, "codec_name": codec_name}
-    return None
-
-
-def get_audio_properties(input_file):
-    # Check if the file exists
-    if not os.path.isfile(input_file):
-        print("Warning - Input audio file does not exist...", input_file)
-        return None
-
-    # Run ffprobe to get audio properties in JSON format
-    cmd = ["ffprobe", "-v", "error", "-print_format", "json", "-show_streams", "-select_streams", "a", input_file]
-    result = subprocess.run(cmd, stderr=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
-    output = result.stdout
-
-    # Parse the JSON output
-    info = None
     try:
-        raw_info = json.loads(output)
-        info = parse_audio_info(raw_info)
-    except:
-        print("Warning - Unable to probe input audio source properties...")
-        pass
+        result = subprocess.run(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError) as e:
+        print("Warning - Error while transcoding audio input. Skipping.")
+        print(e)
+        # Do not leave partial outputs behind
+        abs_main_output_audio_file.unlink(missing_ok=True)
+        abs_light_output_audio_file.unlink(missing_ok=True)
+        return None
 
-    return info
+    return DerivedAudio(main_output_audio_file, light_output_audio_file, parse_ffmpeg_progress_duration(result.stdout))
 
 
 class TransformEngine:
-    def __init__(self, recitals_ra: RecitalsRA, data_folder: str) -> None:
-        self.recitals_ra = recitals_ra
+    def __init__(self, data_folder: str) -> None:
         self.data_folder = data_folder
 
-    def derive_session_audio(self, session_id: str, target_duration: float) -> str:
-        recital_session = self.recitals_ra.get_by_id(session_id)
+    def _get_session_source_audio_file(self, recital_session: RecitalSession) -> Optional[Path]:
         source_audio_filename = Path(self.data_folder, recital_session.source_audio_filename)
 
         if not source_audio_filename or not os.path.isfile(source_audio_filename):
             print("Warning - Source audio file does not exist...", source_audio_filename)
             return None
 
-        audio_info = get_audio_properties(source_audio_filename)
-
-        output_audio_file_extension = "mka"  # Very generic - can take almost any encoding
-        if audio_info is not None:
-            if audio_info["codec_name"] == "vorbis":  # Place in a webm container
-                output_audio_file_extension = "webm"
-
-        main_output_audio_file = f"{session_id}.{output_audio_file_extension}"
-        abs_main_output_audio_file = Path(self.data_folder, main_output_audio_file)
-
-        base_ffmpeg_cmd = ["ffmpeg", "-y", "-fflags", "+genpts", "-i", str(source_audio_filename)]
-        target_duration_ffmpeg_options = ["-t", str(target_duration)]
+        return source_audio_filename
 
-        main_ffmpeg_cmd = [
-            *base_ffmpeg_cmd,
-            "-acodec",
-            "copy",
-        ]
-
-        # Append the target duration if it's specified (non-zero or non-None)
-        if target_duration:
-            main_ffmpeg_cmd.extend(target_duration_ffmpeg_options)
+    def extract_session_audio_metadata(self, recital_session: RecitalSession) -> Optional[AudioMetadata]:
+        source_audio_filename = self._get_session_source_audio_file(recital_session)
+        if not source_audio_filename:
+            return None
 
-        # Output always at the end
-        main_ffmpeg_cmd.append(str(abs_main_output_audio_file))
+        return probe_audio_metadata(source_audio_filename)
 
-        light_output_audio_file = f"{session_id}.mp3"
-        abs_light_output_audio_file = Path(self.data_folder, light_output_audio_file)
-        light_ffmpeg_cmd = list(base_ffmpeg_cmd)
+    def analyze_session_silence(
+        self, recital_session: RecitalSession, silence_threshold_db: float, target_duration: float
+    ) -> Optional[SilenceAnalysis]:
+        source_audio_filename = self._get_session_source_audio_file(recital_session)
+        if not source_audio_filename:
+            return None
 
-        # Append the target duration if it's specified (non-zero or non-None)
-        if target_duration:
-            light_ffmpeg_cmd.extend(target_duration_ffmpeg_options)
-        # Output always at the end
-        light_ffmpeg_cmd.append(str(abs_light_output_audio_file))
+        # Only the audio which makes it into the derivatives
+        return analyze_silence(source_audio_filename, silence_threshold_db, target_duration)
 
-        try:
-            subprocess.check_call(main_ffmpeg_cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL, text=True)
-            subprocess.check_call(light_ffmpeg_cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL, text=True)
-        except OSError as e:
-            print("Warning - Error while transcoding audio input. Skipping.")
-            print(e)
+    def derive_session_audio(self, recital_session: RecitalSession, target_duration: float) -> Optional[DerivedAudio]:
+        source_audio_filename = self._get_session_source_audio_file(recital_session)
+        if not source_audio_filename:
             return None
 
-        return main_output_audio_file, light_output_audio_file
+        # A known source codec (extracted metadata) spares probing the source again
+        return derive_audio(
+            source_audio_filename,
+            self.data_folder,
+            recital_session.id,
+            target_duration,
+            recital_session.audio_codec,
+        )
@@ -1,2 +1,28 @@
 class MissingSessionError(ValueError):
     pass
+
+
+class AudioSegmentTooLargeError(ValueError):
+    pass
+
+
+class AudioSegmentConflictError(ValueError):
+    pass
+
+
+class AudioSegmentChecksumMismatchError(ValueError):
+    pass
+
+
+class SessionNotActiveError(ValueError):
+    pass
+
+
+class SessionFinalizationError(Exception):
+    pass
+
+
+class StorageFullError(Exception):
+    def __init__(self, retry_after_sec: int) -> None:
+        super().__init__("Not enough free space in the data folder")
+        self.retry_after_sec = retry_after_sec
@@ -1,18 +1,36 @@
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
+from functools import partial
+from mimetypes import guess_extension
+from typing import Any, AsyncIterator, Callable, NamedTuple, Optional
+from uuid import uuid4
 
 from apscheduler.triggers.combining import OrTrigger
 from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
+from sqlalchemy.exc import IntegrityError
 
 from engines.aggregation_engine import AggregationEngine
+from engines.disk_pressure_engine import DiskPressureEngine, DiskPressureLevel
+from engines.session_duration_engine import SessionDurationEngine
 from engines.transform_engine import TransformEngine
-from errors import MissingSessionError
-from models.recital_session import SessionStatus
+from errors import (
+    AudioSegmentChecksumMismatchError,
+    AudioSegmentConflictError,
+    MissingSessionError,
+    SessionFinalizationError,
+)
+from models.recital_audio_segment import RecitalAudioSegment
+from models.recital_session import RecitalSession, SessionStatus
 from models.recital_text_segment import RecitalTextSegment
 from models.user import User
-from resource_access.recitals_content_ra import RecitalsContentRA
-from resource_access.recitals_ra import RecitalsRA
+from resource_access.recitals_content_ra import AudioSpoolAppender, RecitalsContentRA
+from resource_access.recitals_ra import AsyncRecitalsRA, RecitalsRA, SessionQueueEntry
 from utility.analytics.posthog import ConfiguredPosthog
 from utility.scheduler import JobScheduler
 from utility.cache import stats as stats_cache
@@ -23,29 +41,135 @@ class TextSegmentRequestBody(BaseModel):
     text: str
 
 
+max_text_segments_per_batch = 200
+
+
+class TextSegmentsBatchRequestBody(BaseModel):
+    segments: list[TextSegmentRequestBody] = Field(min_length=1, max_length=max_text_segments_per_batch)
+
+    @field_validator("segments")
+    @classmethod
+    def segments_ordered(cls, v: list[TextSegmentRequestBody]):
+        if any(later.seek_end < earlier.seek_end for earlier, later in zip(v, v[1:])):
+            raise ValueError("Text segments must be ordered by seek_end")
+        return v
+
+
+# Sessions read from a finalization queue at a time
+session_finalization_queue_page_size = 50
+# Source audio is uploaded while recording in parts of this size - S3 takes parts of 5 MiB and up
+incremental_audio_upload_part_size = 8 * 1024 * 1024
+# Audio kept after the last sound when trimming trailing silence
+silence_trim_margin_sec = 1.0
+
+
+class SessionArtifact(NamedTuple):
+    name: str
+    # Session field holding the local file name of the artifact
+    filename_field: str
+    # Session field recording when the artifact was confirmed in the content storage
+    uploaded_at_field: str
+    # Content RA method uploading the artifact - (session_id, filename) -> bool
+    upload_method: str
+
+
+session_artifacts = (
+    SessionArtifact("text", "text_filename", "text_uploaded_at", "upload_text_to_storage"),
+    SessionArtifact("audio", "main_audio_filename", "main_audio_uploaded_at", "upload_main_audio_to_storage"),
+    SessionArtifact(
+        "source audio", "source_audio_filename", "source_audio_uploaded_at", "upload_source_audio_to_storage"
+    ),
+    SessionArtifact("light audio", "light_audio_filename", "light_audio_uploaded_at", "upload_light_audio_to_storage"),
+)
+
+# Longest finalization error message kept on the session
+max_finalization_error_length = 2000
+
+# Done with a step - the next one starts with a fresh retry budget
+cleared_finalization_failures = dict(
+    finalization_attempts=0,
+    finalization_last_error=None,
+    finalization_next_attempt_at=None,
+)
+
+# Audio and text coverage lengths further apart than this are flagged as mismatching
+audio_text_coverage_tolerance_sec = 5.0
+
+
+class SessionContent(NamedTuple):
+    recital_session: RecitalSession
+    # Seek end of the last not discarded text segment - 0 when there is no text
+    last_seek_time: float
+    audio_segments: list[RecitalAudioSegment]
+
+
+class AudioSegmentStoreResult(NamedTuple):
+    # False when the segment was already stored with the same content
+    stored: bool
+    byte_size: Optional[int]
+
+
 class RecitalManager:
     def __init__(
         self,
         session_finalization_job_disabled: bool,
         session_finalization_job_interval: int,
+        session_finalization_concurrency: int,
+        session_finalization_upload_concurrency: int,
+        session_finalization_time_budget_sec: int,
+        session_finalization_claim_lease_sec: int,
+        session_finalization_max_attempts: int,
+        session_finalization_retry_backoff_sec: int,
+        session_finalization_retry_backoff_max_sec: int,
+        session_finalization_incremental_enabled: bool,
+        session_silence_threshold_db: float,
+        session_silence_disavow_ratio: float,
+        session_silence_trim_sec: float,
         disable_s3_upload: bool,
+        audio_segment_spool_enabled: bool,
         posthog: ConfiguredPosthog,
         job_scheduler: JobScheduler,
         recitals_ra: RecitalsRA,
+        async_recitals_ra: AsyncRecitalsRA,
         recitals_content_ra: RecitalsContentRA,
         aggregation_engine: AggregationEngine,
         transform_engine: TransformEngine,
+        session_duration_engine: SessionDurationEngine,
+        disk_pressure_engine: DiskPressureEngine,
     ) -> None:
         self.session_finalization_job_disabled = session_finalization_job_disabled
         self.session_finalization_job_interval = session_finalization_job_interval
+        self.session_finalization_concurrency = session_finalization_concurrency
+        self.session_finalization_upload_concurrency = session_finalization_upload_concurrency
+        self.session_finalization_time_budget_sec = session_finalization_time_budget_sec
+        self.session_finalization_claim_lease_sec = session_finalization_claim_lease_sec
+        # Identifies the sessions claimed by this process - unique across hosts and restarts
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid4().hex[:8]}"
+        self.session_finalization_max_attempts = session_finalization_max_attempts
+        self.session_finalization_retry_backoff_sec = session_finalization_retry_backoff_sec
+        self.session_finalization_retry_backoff_max_sec = session_finalization_retry_backoff_max_sec
+        self.session_finalization_incremental_enabled = session_finalization_incremental_enabled
+        self.session_silence_threshold_db = session_silence_threshold_db
+        self.session_silence_disavow_ratio = session_silence_disavow_ratio
+        self.session_silence_trim_sec = session_silence_trim_sec
+        # Sessions currently held by a finalization step - one step per session at a time
+        self._finalizing_sessions: set[str] = set()
+        self._finalizing_sessions_lock = threading.Lock()
+        # Set on shutdown - sessions in progress are finished, no new ones are started
+        self._session_finalization_stopping = threading.Event()
         self.disable_s3_upload = disable_s3_upload
+        self.audio_segment_spool_enabled = audio_segment_spool_enabled
         self.posthog = posthog
         self.job_scheduler = job_scheduler
         self.session_finalization_job_id = "session_finalization_job"
         self.recitals_ra = recitals_ra
+        self.async_recitals_ra = async_recitals_ra
         self.recitals_content_ra = recitals_content_ra
         self.aggregation_engine = aggregation_engine
         self.transform_engine = transform_engine
+        self.session_duration_engine = session_duration_engine
+        self.disk_pressure_engine = disk_pressure_engine
+        self.disk_pressure_job_id = "disk_pressure_job"
 
     def end_session(self, user: User, session_id: str, discard_last_n_text_segments: int = 0) -> None:
         """Ends a session and marks the last n text segments as discarded.
@@ -74,8 +198,12 @@ class RecitalManager:
                     text_segment.discarded = True
                     self.recitals_ra.upsert_session_text_segment(text_segment)
 
-            recital_session.status = SessionStatus.ENDED
-            self.recitals_ra.upsert(recital_session)
+            # Finalization may pick up an abandoned session at the same time - only one of them moves it on
+            if not self.recitals_ra.transition_session(
+                session_id, SessionStatus.ACTIVE, status=SessionStatus.ENDED, ended_at=datetime.now(timezone.utc)
+            ):
+                return False
+
             self.schedule_session_finalization_job()
             return True
 
@@ -92,234 +220,672 @@ class RecitalManager:
         now_and_onward = OrTrigger([run_soon_at, run_every])
         trigger = run_every if defer else now_and_onward
         self.job_scheduler.add_job(
-            self._session_finalization_task,
+            self.run_session_finalization,
             id=self.session_finalization_job_id,
             replace_existing=True,
             trigger=trigger,
         )
 
-    def schedule_session_duration_update_job(self, session_id: str, duration: float) -> None:
+    def trigger_session_finalization(self, step: Optional[Callable[[], None]] = None) -> bool:
+        """Starts a session finalization run in the background of this process.
+
+        Args:
+            step (Callable, optional): A single finalization step to run (e.g. aggregate_ended_sessions)
+                instead of the whole run
+
+        Returns:
+            bool: False if session finalization does not run in this process
+        """
+        if self.session_finalization_job_disabled:
+            return False
+
+        job_id = f"{self.session_finalization_job_id}_triggered"
+        if step:
+            job_id = f"{job_id}_{step.__name__}"
+        self.job_scheduler.add_job(step or self.run_session_finalization, id=job_id, replace_existing=True)
+        return True
+
+    def schedule_disk_pressure_job(self) -> None:
         self.job_scheduler.add_job(
-            self._session_duration_update_task,
-            trigger=None,
-            kwargs=dict(session_id=session_id, duration=duration),
-            id=f"session_duration_update_{session_id}",  # Runs serially per each session id,
-            replace_existing=False,
-            # Up to N seconds is ok to run this job as soon as the prev one is done
-            misfire_grace_time=15,
+            self._disk_pressure_task,
+            id=self.disk_pressure_job_id,
+            replace_existing=True,
+            trigger="interval",
+            seconds=self.disk_pressure_engine.check_interval_sec,
+            max_instances=1,
+            coalesce=True,
         )
 
-    def _session_finalization_task(self) -> None:
-        self.aggregate_ended_sessions()
-        self.upload_aggregated_sessions()
-        self.discard_disavowed_sessions()
+    def _disk_pressure_task(self) -> None:
+        if self.relieve_disk_pressure() != DiskPressureLevel.NORMAL:
+            # Finalized sessions no longer need their local files - finalize now rather than on schedule
+            self.trigger_session_finalization()
 
-    def _derive_session_duration_from_text_segments(self, session_id: str) -> float:
-        # Get the top text segment present seek end and use that
-        text_segments = list(self.recitals_ra.get_session_text_segments(session_id, exclude_discarded=True))
-        return text_segments[-1].seek_end if text_segments else 0
+    def relieve_disk_pressure(self) -> DiskPressureLevel:
+        """Frees the data folder once its free space drops below the soft watermark.
 
-    def _session_duration_update_task(self, session_id: str, duration: float) -> None:
+        Removes the local files of sessions which are done with (uploaded or discarded).
+
+        Returns:
+            DiskPressureLevel: The pressure level found before relieving
+        """
+        pressure_level = self.disk_pressure_engine.get_pressure_level()
+        if pressure_level == DiskPressureLevel.NORMAL:
+            return pressure_level
+
+        print(f"Data folder is under {pressure_level} disk pressure - removing local files of finalized sessions")
+        freed_bytes = self.remove_finalized_sessions_local_files()
+        self.disk_pressure_engine.report_relief(freed_bytes)
+        print(f"Removed {freed_bytes / (1024 * 1024):.1f} MiB of finalized sessions files")
+        return pressure_level
+
+    def remove_finalized_sessions_local_files(self) -> int:
+        """Removes local files left behind by sessions which no longer need them.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        session_filenames = self.recitals_content_ra.get_local_data_files_by_session()
+        if not session_filenames:
+            return 0
+
+        # Without the content storage the local files are the only copy of uploaded sessions
+        finalized_statuses = [SessionStatus.DISCARDED]
+        if not self.disable_s3_upload:
+            finalized_statuses.append(SessionStatus.UPLOADED)
+
+        freed_bytes = 0
+        sessions_status = self.recitals_ra.get_sessions_status(list(session_filenames))
+        for session_id, status in sessions_status.items():
+            if status in finalized_statuses:
+                freed_bytes += self.recitals_content_ra.remove_local_data_files(session_filenames[session_id])
+        return freed_bytes
+
+    def stop_session_finalization(self) -> None:
+        """Stops starting sessions in finalization runs - sessions already started are finished."""
+        self._session_finalization_stopping.set()
+
+    def run_session_finalization(self) -> None:
+        """Aggregates, uploads and discards the queued sessions - within the time budget of a single run."""
+        # All steps share the budget - the run should be done before the next one is due
+        deadline = self._get_session_finalization_deadline()
+        self.aggregate_ended_sessions(deadline)
+        self.upload_aggregated_sessions(deadline)
+        self.discard_disavowed_sessions(deadline)
+        # Ended sessions come first - their speakers are waiting on the preview
+        if self.session_finalization_incremental_enabled:
+            self.preaggregate_active_sessions(deadline)
+
+    def _get_session_finalization_deadline(self) -> float:
+        time_budget_sec = self.session_finalization_time_budget_sec or self.session_finalization_job_interval
+        return time.monotonic() + time_budget_sec
+
+    def _is_session_finalization_over(self, deadline: float) -> bool:
+        return self._session_finalization_stopping.is_set() or time.monotonic() >= deadline
+
+    def _run_session_finalization_step_exclusively(
+        self, step_name: str, step: Callable[[str], bool], deadline: float, session_id: str
+    ) -> bool:
+        if self._is_session_finalization_over(deadline):
+            return False  # Left in the queue for the next run
+
+        with self._finalizing_sessions_lock:
+            if session_id in self._finalizing_sessions:
+                print(f"Session {session_id} is already being finalized - skipping")
+                return False
+            self._finalizing_sessions.add(session_id)
+
+        try:
+            return bool(step(session_id))
+        except Exception as e:
+            print(f"Error {step_name} session {session_id} - skipping")
+            print(e)
+            self._record_session_finalization_failure(step_name, session_id, e)
+            return False
+        finally:
+            with self._finalizing_sessions_lock:
+                self._finalizing_sessions.discard(session_id)
+
+    def _get_session_finalization_retry_delay(self, attempts: int) -> timedelta:
+        # Exponential backoff - the first retry waits the base delay
+        delay_sec = self.session_finalization_retry_backoff_sec * 2 ** min(attempts - 1, 32)
+        return timedelta(seconds=min(delay_sec, self.session_finalization_retry_backoff_max_sec))
+
+    def _record_session_finalization_failure(self, step_name: str, session_id: str, error: Exception) -> None:
+        try:
+            recital_session = self.recitals_ra.get_by_id(session_id)
+            if not recital_session:
+                return
+
+            attempts = recital_session.finalization_attempts + 1
+            error_message = f"Error {step_name}: {type(error).__name__}: {error}"[:max_finalization_error_length]
+            # Failed sessions leave every queue but the discard one - which keeps retrying them at the backoff
+            retry_delay = self._get_session_finalization_retry_delay(attempts)
+            failure = dict(
+                finalization_attempts=attempts,
+                finalization_last_error=error_message,
+                finalization_next_attempt_at=datetime.now(timezone.utc) + retry_delay,
+            )
+            if attempts >= self.session_finalization_max_attempts and recital_session.status != SessionStatus.FAILED:
+                print(f"Session {session_id} failed finalization {attempts} times - marking as failed")
+                if not self.recitals_ra.transition_session(
+                    session_id,
+                    recital_session.status,
+                    self.worker_id,
+                    status=SessionStatus.FAILED,
+                    **failure,
+                ):
+                    return
+
+                self.posthog.capture(
+                    "server",
+                    "Session Finalization Failed",
+                    {
+                        "session_id": session_id,
+                        "attempts": attempts,
+                        "step": step_name,
+                    },
+                )
+            else:
+                self.recitals_ra.transition_session(session_id, recital_session.status, self.worker_id, **failure)
+        except Exception as e:
+            print(f"Error recording finalization failure of session {session_id}")
+            print(e)
+
+    def requeue_failed_session(self, session_id: str) -> bool:
+        """Moves a failed session back into the finalization queue with a fresh retry budget.
+
+        Finalization resumes from the last step the session completed.
+
+        Raises:
+            MissingSessionError: Session does not exist
+
+        Returns:
+            bool: True if the session was requeued, False if it was not in a failed state
+        """
         recital_session = self.recitals_ra.get_by_id(session_id)
         if not recital_session:
-            return
+            raise MissingSessionError()
 
-        # Update duration
-        recital_session.duration = max(recital_session.duration or 0, duration)
+        if recital_session.status != SessionStatus.FAILED:
+            return False
 
-        self.recitals_ra.upsert(recital_session)
+        if not self.recitals_ra.transition_session(
+            session_id,
+            SessionStatus.FAILED,
+            status=SessionStatus.AGGREGATED if recital_session.main_audio_filename else SessionStatus.ENDED,
+            **cleared_finalization_failures,
+        ):
+            return False
 
-    def aggregate_ended_sessions(self) -> None:
-        ended_sessions = self.recitals_ra.get_ended_sessions()
+        self.schedule_session_finalization_job()
+        return True
 
-        if len(ended_sessions) == 0:
-            return
+    def _run_session_finalization_step(
+        self,
+        step_name: str,
+        session_ids: list[str],
+        step: Callable[[str], bool],
+        deadline: float,
+        concurrency: Optional[int] = None,
+    ) -> int:
+        """Runs a finalization step over the sessions - concurrently when configured.
+
+        Each session is handled under an exclusive lock and a failing session never affects the others.
+        Sessions mostly wait on ffmpeg subprocesses and S3 - threads are enough to run them in parallel.
+        Sessions not started by the deadline (or before finalization was stopped) are skipped.
+        The session finalization concurrency applies unless a step specific concurrency is given.
 
-        for ended_session in ended_sessions:
-            session_id = ended_session.id
-            try:
-                recital_session = self.recitals_ra.get_by_id(session_id)
-                if not recital_session:
-                    raise MissingSessionError()
-
-                text_segments = list(self.recitals_ra.get_session_text_segments(session_id))
-                last_seek_time = text_segments[-1].seek_end if text_segments else 0
-
-                if not last_seek_time:  # No text content
-                    print(f"No textual content found for session {session_id} - disavowing")
-                    recital_session.disavowed = True
-                    self.recitals_ra.upsert(recital_session)
-                    continue
-
-                # Aggregate text
-                if not recital_session.text_filename:
-                    vtt_file_content = self.aggregation_engine.aggregate_session_captions(recital_session.id)
-                    if vtt_file_content:
-                        text_filename = f"{session_id}.vtt"
-                        self.recitals_ra.store_session_text(vtt_file_content, text_filename)
-                        recital_session.text_filename = text_filename
-                        self.recitals_ra.upsert(recital_session)
-
-                # Aggregate audio segments into a single file if not done yet
-                if not recital_session.source_audio_filename:
-                    source_audio_filename = self.aggregation_engine.aggregate_session_audio(recital_session.id)
-                    if not source_audio_filename:
-                        print(f"No audio found for session {session_id} - disavowing")
-                        recital_session.disavowed = True
-                        self.recitals_ra.upsert(recital_session)
-                        continue
-
-                    recital_session.source_audio_filename = source_audio_filename
-                    self.recitals_ra.upsert(recital_session)
-
-                # Transcode the audio into the target formats if not done yet
-                if not recital_session.main_audio_filename:
-                    # The audio should match the text segments coverage.
-                    # It might be longer (if some text segments were discarded from the end)
-                    # So we specify the target audio duration to get the destination audio file and derivatives
-                    # using that duration
-                    main_audio_filename, light_audio_filename = self.transform_engine.derive_session_audio(
-                        recital_session.id, last_seek_time
-                    )
+        Returns:
+            int: Number of sessions the step succeeded on
+        """
+        start = time.perf_counter()
+        run_step = partial(self._run_session_finalization_step_exclusively, step_name, step, deadline)
+        concurrency = min(concurrency or self.session_finalization_concurrency, len(session_ids))
+        if concurrency > 1:
+            with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="session_finalization") as executor:
+                results = list(executor.map(run_step, session_ids))
+        else:
+            results = [run_step(session_id) for session_id in session_ids]
+
+        elapsed = time.perf_counter() - start
+        succeeded = sum(results)
+        print(
+            f"Done {step_name} {succeeded}/{len(session_ids)} sessions in {elapsed:.1f}s "
+            f"({len(session_ids) / elapsed:.2f} sessions/s, concurrency {max(concurrency, 1)})"
+        )
+        return succeeded
 
-                    if main_audio_filename:
-                        recital_session.light_audio_filename = light_audio_filename
-                        recital_session.main_audio_filename = main_audio_filename
-                        recital_session.status = SessionStatus.AGGREGATED  # done aggregating
-
-                        # Now that the audio is transcoded we know the aggregated binary audio file is valid
-                        # and we can delete the individual audio segment files
-                        self.aggregation_engine.delete_audio_segment_files(session_id)
-                    else:
-                        print(f"Could not transcode audio for session {session_id} - skipping")
-                        self.posthog.capture(
-                            "server",
-                            "Session Aggregation Transcode Failed",
-                            {
-                                "session_id": session_id,
-                            },
-                        )
-                        continue
-
-                    # Lets the duration be found from actual non discarded text segments
-                    # Durations before that a rough estimate based on sent text segments disregarding
-                    # discarded ones
-                    recital_session.duration = self._derive_session_duration_from_text_segments(session_id)
-                    self.recitals_ra.upsert(recital_session)
+    def _drain_session_finalization_queue(
+        self,
+        step_name: str,
+        get_queue_page: Callable[..., list[SessionQueueEntry]],
+        step: Callable[..., bool],
+        deadline: Optional[float],
+        get_page_content: Optional[Callable[[list[str]], dict[str, Any]]] = None,
+        concurrency: Optional[int] = None,
+    ) -> int:
+        """Runs a finalization step over a whole session queue - page by page in queue order.
+
+        Each page is claimed for this worker - other workers (replicas) draining the same queue get
+        other sessions - and released once handled.
+        When get_page_content is given, the content of each page is read with a few set based queries
+        up front and the step gets the content of its session as well (None when the session is gone).
+        Stops once the deadline passes or finalization is stopped - the remaining sessions wait for the next run.
 
-                    self.posthog.capture(
-                        "server",
-                        "Session Aggregation Done",
-                        {
-                            "source": "server",
-                            "session_id": session_id,
-                            "duration": recital_session.duration,
-                        },
-                    )
+        Returns:
+            int: Number of sessions the step succeeded on
+        """
+        deadline = deadline or self._get_session_finalization_deadline()
+        succeeded = 0
+        after = None
+        while True:
+            if self._session_finalization_stopping.is_set():
+                print(f"Session finalization stopping while {step_name} - continuing on the next run")
+                break
+            if time.monotonic() >= deadline:
+                print(f"Session finalization time budget exhausted while {step_name} - continuing on the next run")
+                break
+
+            queue_page = get_queue_page(
+                self.worker_id,
+                self.session_finalization_claim_lease_sec,
+                limit=session_finalization_queue_page_size,
+                after=after,
+            )
+            if not queue_page:
+                break
 
-            except Exception as e:
-                print(f"Error aggregating session {session_id} - skipping")
-                print(e)
-                continue
+            session_ids = [entry.id for entry in queue_page]
+            try:
+                page_step = step
+                if get_page_content:
+                    page_content = get_page_content(session_ids)
+                    page_step = lambda session_id: step(session_id, page_content.get(session_id))
+                succeeded += self._run_session_finalization_step(
+                    step_name, session_ids, page_step, deadline, concurrency
+                )
+            finally:
+                self.recitals_ra.release_session_claims(session_ids, self.worker_id)
+            if len(queue_page) < session_finalization_queue_page_size:
+                break
+            after = queue_page[-1].key
+
+        return succeeded
+
+    def _get_sessions_content(self, session_ids: list[str]) -> dict[str, SessionContent]:
+        recital_sessions = self.recitals_ra.get_by_ids(session_ids)
+        # Text segments are streamed when captions are written - only their extent is read up front
+        last_seek_times = self.recitals_ra.get_sessions_last_seek_end(session_ids)
+        audio_segments = self.recitals_ra.get_sessions_audio_segments(session_ids)
+        return {
+            session_id: SessionContent(
+                recital_session, last_seek_times.get(session_id, 0), audio_segments.get(session_id, [])
+            )
+            for session_id, recital_session in recital_sessions.items()
+        }
+
+    def aggregate_ended_sessions(self, deadline: Optional[float] = None) -> None:
+        # Aggregation derives the final duration - pending estimates must not land after it
+        self.session_duration_engine.flush()
+        self._drain_session_finalization_queue(
+            "aggregating",
+            self.recitals_ra.claim_ended_sessions,
+            self._aggregate_ended_session,
+            deadline,
+            self._get_sessions_content,
+        )
 
-    def upload_aggregated_sessions(self) -> None:
-        aggregated_sessions = self.recitals_ra.get_aggregated_sessions()
+    def _update_claimed_session(self, recital_session: RecitalSession, step_name: str, **updates) -> bool:
+        """Writes columns of a session being finalized - as long as it is still in the status it was claimed in
+        and still claimed by this worker. Never writes back a stale copy of the whole session.
 
-        if len(aggregated_sessions) == 0:
-            return
+        Returns:
+            bool: False if the session changed (or its claim was lost) meanwhile and nothing was written
+        """
+        if self.recitals_ra.transition_session(recital_session.id, recital_session.status, self.worker_id, **updates):
+            return True
 
-        uploaded_sessions_mutated = False
+        print(f"Session {recital_session.id} changed while {step_name} - skipping")
+        return False
 
-        for aggregated_session in aggregated_sessions:
-            session_id = aggregated_session.id
-            try:
-                recital_session = self.recitals_ra.get_by_id(session_id)
-                if not recital_session:
-                    raise MissingSessionError()
+    def _aggregate_ended_session(self, session_id: str, session_content: Optional[SessionContent]) -> bool:
+        if not session_content:
+            raise MissingSessionError()
 
-                text_filename = recital_session.text_filename
-                source_audio_filename = recital_session.source_audio_filename
-                audio_filename = recital_session.main_audio_filename
-                light_audio_filename = recital_session.light_audio_filename
+        recital_session, last_seek_time, audio_segments = session_content
 
-                if not self.disable_s3_upload:
-                    # Upload the files to the content storage
-                    if not self.recitals_content_ra.upload_text_to_storage(session_id, text_filename):
-                        raise Exception("Error uploading session text to storage")
-                    if not self.recitals_content_ra.upload_main_audio_to_storage(session_id, audio_filename):
-                        raise Exception("Error uploading session audio to storage")
-                    if not self.recitals_content_ra.upload_source_audio_to_storage(session_id, source_audio_filename):
-                        raise Exception("Error uploading session source audio to storage")
-                    if not self.recitals_content_ra.upload_light_audio_to_storage(session_id, light_audio_filename):
-                        raise Exception("Error uploading session source audio to storage")
-
-                    # Delete the source files after they were uploaded
-                    self.recitals_content_ra.remove_local_data_file(text_filename)
-                    self.recitals_content_ra.remove_local_data_file(audio_filename)
-                    self.recitals_content_ra.remove_local_data_file(source_audio_filename)
-                    self.recitals_content_ra.remove_local_data_file(light_audio_filename)
+        if not last_seek_time:  # No text content
+            print(f"No textual content found for session {session_id} - disavowing")
+            self._update_claimed_session(recital_session, "aggregating", disavowed=True)
+            return False
+
+        # Progress of the cheap steps is stored once - right before the expensive transcoding
+        progress = {}
+
+        # Aggregate audio segments into a single file if not done yet
+        if not recital_session.source_audio_filename:
+            source_audio_filename = self.aggregation_engine.aggregate_session_audio(recital_session.id, audio_segments)
+            if not source_audio_filename:
+                print(f"No audio found for session {session_id} - disavowing")
+                self._update_claimed_session(recital_session, "aggregating", disavowed=True, **progress)
+                return False
 
-                # Mark the session as published
-                self.recitals_ra.set_session_status(recital_session.id, SessionStatus.UPLOADED)
-                uploaded_sessions_mutated = True
+            recital_session.source_audio_filename = source_audio_filename
+            progress.update(source_audio_filename=source_audio_filename)
+
+        # Extract the source audio metadata once - later stages reuse the stored values
+        if not recital_session.audio_codec:
+            audio_metadata = self.transform_engine.extract_session_audio_metadata(recital_session)
+            if audio_metadata:
+                progress.update(
+                    audio_codec=audio_metadata.codec_name,
+                    audio_channels=audio_metadata.channels,
+                    audio_sample_rate=audio_metadata.sample_rate,
+                    audio_bit_rate=audio_metadata.bit_rate,
+                    audio_byte_size=audio_metadata.byte_size,
+                    audio_duration=audio_metadata.duration,
+                )
+                recital_session.audio_duration = audio_metadata.duration
 
-                # Invalidate the stats cache for this user
-                stats_cache.invalidate_stats_by_user_id(recital_session.user_id)
+        # Analyze the silence once - decides whether (and how much of) the audio is worth transcoding
+        if recital_session.silence_ratio is None:
+            silence_analysis = self.transform_engine.analyze_session_silence(
+                recital_session, self.session_silence_threshold_db, last_seek_time
+            )
+            if silence_analysis:
+                recital_session.silence_ratio = silence_analysis.silence_ratio
+                recital_session.trailing_silence = silence_analysis.trailing_silence
+                progress.update(
+                    silence_ratio=silence_analysis.silence_ratio,
+                    trailing_silence=silence_analysis.trailing_silence,
+                )
 
+        # The audio should match the text segments coverage - less any trimmed trailing silence
+        target_duration = self._get_session_target_duration(recital_session, last_seek_time)
+
+        # Aggregate text - captions past the end of the audio have nothing recorded behind them
+        if not recital_session.text_filename:
+            text_filename = self._aggregate_session_captions(session_id, target_duration)
+            if text_filename:
+                progress.update(text_filename=text_filename)
+
+        if progress and not self._update_claimed_session(recital_session, "aggregating", **progress):
+            return False
+
+        if (
+            self.session_silence_disavow_ratio
+            and recital_session.silence_ratio is not None
+            and recital_session.silence_ratio >= self.session_silence_disavow_ratio
+        ):
+            print(f"Session {session_id} audio is {recital_session.silence_ratio:.0%} silent - disavowing")
+            self._update_claimed_session(recital_session, "aggregating", disavowed=True)
+            return False
+
+        # Transcode the audio into the target formats if not done yet
+        if not recital_session.main_audio_filename:
+            if target_duration < last_seek_time:
+                print(f"Session {session_id} trailing silence of {recital_session.trailing_silence:.1f}s is trimmed")
+            derived_audio = self.transform_engine.derive_session_audio(recital_session, target_duration)
+
+            if not derived_audio:
                 self.posthog.capture(
                     "server",
-                    "Session Upload Done",
+                    "Session Aggregation Transcode Failed",
                     {
-                        "source": "server",
                         "session_id": session_id,
-                        "duration": recital_session.duration,
                     },
                 )
+                raise SessionFinalizationError(f"Could not transcode audio for session {session_id}")
+
+            recital_session.light_audio_filename = derived_audio.light_audio_filename
+            recital_session.main_audio_filename = derived_audio.main_audio_filename
+
+            # Lets the duration be found from actual non discarded text segments
+            # Durations before that a rough estimate based on sent text segments disregarding
+            # discarded ones - less any trimmed trailing silence
+            recital_session.duration = target_duration
+            audio_duration = recital_session.audio_duration
+            if (
+                derived_audio.duration is not None
+                and derived_audio.duration < target_duration - audio_text_coverage_tolerance_sec
+            ):
+                # The source decoded shorter than probed (e.g. a truncated recording) - what was derived is what we have
+                print(
+                    f"Session {session_id} derived audio of {derived_audio.duration:.1f}s "
+                    f"falls short of the target {target_duration:.1f}s"
+                )
+                audio_duration = derived_audio.duration
+            if audio_duration is not None:
+                recital_session.audio_duration_mismatch = (
+                    abs(audio_duration - last_seek_time) > audio_text_coverage_tolerance_sec
+                )
+                if recital_session.audio_duration_mismatch:
+                    print(
+                        f"Session {session_id} audio duration {audio_duration:.1f}s "
+                        f"does not match its text coverage {last_seek_time:.1f}s"
+                    )
+                # Text beyond the end of the audio has nothing recorded behind it
+                recital_session.duration = min(recital_session.duration, audio_duration)
+
+            # Done aggregating - unless the session was ended, discarded or claimed by another worker meanwhile
+            if not self.recitals_ra.transition_session(
+                session_id,
+                recital_session.status,
+                self.worker_id,
+                status=SessionStatus.AGGREGATED,
+                light_audio_filename=recital_session.light_audio_filename,
+                main_audio_filename=recital_session.main_audio_filename,
+                duration=recital_session.duration,
+                audio_duration_mismatch=recital_session.audio_duration_mismatch,
+                **cleared_finalization_failures,
+            ):
+                print(f"Session {session_id} changed while aggregating - skipping")
+                return False
 
-            except Exception as e:
-                print(f"Error uploading session {session_id} - skipping")
-                print(e)
-                continue
+            # Now that the audio is transcoded we know the aggregated binary audio file is valid
+            # and we can delete the individual audio segment files
+            self.aggregation_engine.delete_audio_segment_files(session_id, audio_segments)
 
-        if uploaded_sessions_mutated:
-            stats_cache.invalidate_cross_user_stats()
+            self.posthog.capture(
+                "server",
+                "Session Aggregation Done",
+                {
+                    "source": "server",
+                    "session_id": session_id,
+                    "duration": recital_session.duration,
+                    "audio_duration": recital_session.audio_duration,
+                    "audio_duration_mismatch": recital_session.audio_duration_mismatch,
+                    "silence_ratio": recital_session.silence_ratio,
+                },
+            )
 
-    def discard_disavowed_sessions(self) -> None:
-        disavowed_sessions = self.recitals_ra.get_disavowed_pending_sessions()
+        return True
 
-        if len(disavowed_sessions) == 0:
-            return
+    def _get_session_target_duration(self, recital_session: RecitalSession, last_seek_time: float) -> float:
+        # The audio should match the text segments coverage.
+        # It might be longer (if some text segments were discarded from the end)
+        # So we specify the target audio duration to get the destination audio file and derivatives
+        # using that duration
+        trailing_silence = recital_session.trailing_silence or 0
+        if not self.session_silence_trim_sec or trailing_silence <= self.session_silence_trim_sec:
+            return last_seek_time
+
+        # The speaker stopped long before the recording did - keep a short tail after the last sound.
+        # Only the tail is trimmed - cutting the head would shift the audio away from the caption timestamps
+        audio_end = min(last_seek_time, recital_session.audio_duration or last_seek_time)
+        return min(audio_end - trailing_silence + silence_trim_margin_sec, last_seek_time)
+
+    def _aggregate_session_captions(self, session_id: str, until: float) -> Optional[str]:
+        # Captions written while recording are completed with the rest of the text - unless the text
+        # they were written from changed since (e.g. segments discarded when the session ended)
+        # or they already run past the end of the audio
+        progress = self.aggregation_engine.get_session_captions_progress(session_id)
+        if progress:
+            captioned_text_segments = self.recitals_ra.count_session_text_segments(session_id, progress.last_seek_end)
+            if captioned_text_segments != progress.captions:
+                print(f"Session {session_id} text changed since captions were written while recording - rewriting")
+                progress = None
+            elif progress.last_seek_end > until:
+                print(f"Session {session_id} captions written while recording run past its audio - rewriting")
+                progress = None
+
+        text_segments = self.recitals_ra.stream_session_text_segments(
+            session_id, after_seek_end=progress.last_seek_end if progress else None
+        )
+        return self.aggregation_engine.aggregate_session_captions(
+            session_id, text_segments, progress=progress, until=until
+        )
 
-        discarded_sessions_mutated = False
-        for disavowed_session in disavowed_sessions:
-            session_id = disavowed_session.id
+    def preaggregate_active_sessions(self, deadline: Optional[float] = None) -> None:
+        self._drain_session_finalization_queue(
+            "pre-aggregating", self.recitals_ra.claim_active_sessions, self._preaggregate_active_session, deadline
+        )
 
-            if self.discard_session(session_id):
-                discarded_sessions_mutated = True
+    def _preaggregate_active_session(self, session_id: str) -> bool:
+        """Aggregates what a session recorded so far - so ending it only needs to finish the tail.
 
-        if discarded_sessions_mutated:
+        Captions of the new text are appended onto the partial captions of the session,
+        and whole parts of the spooled audio are uploaded as parts of the source audio.
+        Best effort - a failure leaves the work to the next run (or to the aggregation once ended).
+        """
+        try:
+            progress = self.aggregation_engine.get_session_captions_progress(session_id)
+            self.aggregation_engine.append_session_captions(
+                session_id,
+                self.recitals_ra.stream_session_text_segments(
+                    session_id, after_seek_end=progress.last_seek_end if progress else None
+                ),
+            )
+
+            if self.audio_segment_spool_enabled and not self.disable_s3_upload:
+                self.recitals_content_ra.upload_audio_spool_parts(session_id, incremental_audio_upload_part_size)
+        except Exception as e:
+            print(f"Error pre-aggregating session {session_id} - continuing on the next run")
+            print(e)
+            return False
+        finally:
+            # A session ending meanwhile should not wait on the rest of the page to be aggregated
+            self.recitals_ra.release_session_claims([session_id], self.worker_id)
+
+        return True
+
+    def upload_aggregated_sessions(self, deadline: Optional[float] = None) -> None:
+        uploaded_sessions_count = self._drain_session_finalization_queue(
+            "uploading",
+            self.recitals_ra.claim_aggregated_sessions,
+            self._upload_aggregated_session,
+            deadline,
+            self.recitals_ra.get_by_ids,
+            # Uploads mostly wait on the network - more sessions can go up at once than be transcoded
+            self.session_finalization_upload_concurrency,
+        )
+
+        if uploaded_sessions_count > 0:
             stats_cache.invalidate_cross_user_stats()
 
-    def discard_session(self, session_id: str) -> bool:
-        try:
-            recital_session = self.recitals_ra.get_by_id(session_id)
-            if not recital_session:
-                raise MissingSessionError()
+    def _upload_aggregated_session(self, session_id: str, recital_session: Optional[RecitalSession]) -> bool:
+        if not recital_session:
+            raise MissingSessionError()
 
-            # If already discarded - nothing to do
-            if recital_session.status == SessionStatus.DISCARDED:
+        if not self.disable_s3_upload:
+            # Artifacts confirmed by an earlier attempt are not sent again
+            pending_artifacts = [
+                artifact for artifact in session_artifacts if not getattr(recital_session, artifact.uploaded_at_field)
+            ]
+            upload_artifact = partial(self._upload_session_artifact, session_id, recital_session)
+            if len(pending_artifacts) > 1:
+                with ThreadPoolExecutor(
+                    max_workers=len(pending_artifacts), thread_name_prefix="session_artifact_upload"
+                ) as executor:
+                    confirmed = list(executor.map(upload_artifact, pending_artifacts))
+            else:
+                confirmed = [upload_artifact(artifact) for artifact in pending_artifacts]
+
+            if not all(confirmed):
+                print(f"Session {session_id} changed while uploading - skipping")
                 return False
 
-            original_status = recital_session.status
-            recital_session.status = SessionStatus.DISCARDED
-            recital_session.duration = 0
-            # This will try to ensure no new content is added for this session moving forward
-            self.recitals_ra.upsert(recital_session)
+        # Mark the session as published - unless it was discarded or claimed by another worker meanwhile
+        if not self.recitals_ra.transition_session(
+            session_id,
+            SessionStatus.AGGREGATED,
+            self.worker_id,
+            status=SessionStatus.UPLOADED,
+            **cleared_finalization_failures,
+        ):
+            print(f"Session {session_id} changed while uploading - skipping")
+            return False
+
+        # Invalidate the stats cache for this user
+        stats_cache.invalidate_stats_by_user_id(recital_session.user_id)
+
+        self.posthog.capture(
+            "server",
+            "Session Upload Done",
+            {
+                "source": "server",
+                "session_id": session_id,
+                "duration": recital_session.duration,
+            },
+        )
+
+        return True
 
-            # Invalidate the stats cache for this user
-            stats_cache.invalidate_stats_by_user_id(recital_session.user_id)
+    def _upload_session_artifact(
+        self, session_id: str, recital_session: RecitalSession, artifact: SessionArtifact
+    ) -> bool:
+        """Uploads a session artifact, confirms it on the session and removes its local file.
 
-            if original_status in [SessionStatus.ACTIVE, SessionStatus.ENDED]:
+        Raises:
+            SessionFinalizationError: The upload failed
+
+        Returns:
+            bool: False if the session changed (or its claim was lost) before the upload was confirmed
+        """
+        filename = getattr(recital_session, artifact.filename_field)
+        upload = getattr(self.recitals_content_ra, artifact.upload_method)
+        if not upload(session_id, filename):
+            raise SessionFinalizationError(f"Error uploading session {artifact.name} to storage")
+
+        if not self.recitals_ra.transition_session(
+            session_id,
+            SessionStatus.AGGREGATED,
+            self.worker_id,
+            **{artifact.uploaded_at_field: datetime.now(timezone.utc)},
+        ):
+            return False
+
+        # Confirmed - the local copy is no longer needed
+        self.recitals_content_ra.remove_local_data_file(filename)
+        return True
+
+    def discard_disavowed_sessions(self, deadline: Optional[float] = None) -> None:
+        discarded_sessions_count = self._drain_session_finalization_queue(
+            "discarding", self.recitals_ra.claim_disavowed_pending_sessions, self.discard_session, deadline
+        )
+
+        if discarded_sessions_count > 0:
+            stats_cache.invalidate_cross_user_stats()
+
+    def discard_session(self, session_id: str) -> bool:
+        recital_session = self.recitals_ra.get_by_id(session_id)
+        if not recital_session:
+            raise MissingSessionError()
+
+        # If already discarded - nothing to do
+        if recital_session.status == SessionStatus.DISCARDED:
+            return False
+
+        # No new content is accepted for a disavowed session - so its content is cleared before it is marked
+        # as discarded. A failure leaves it in the discard queue to be retried like any other finalization step.
+        original_status = recital_session.status
+        try:
+            # Source audio parts uploaded while the session was recording
+            self.recitals_content_ra.abort_audio_spool_upload(session_id)
+
+            # A failed session may hold files of any step it got through
+            if original_status in [SessionStatus.ACTIVE, SessionStatus.ENDED, SessionStatus.FAILED]:
                 # delete audio segment files which may have been uploaded (but not yet aggregated)
                 self.aggregation_engine.delete_session_audio(session_id)
                 # Check if the aggregated audio file was created - and remove it
@@ -330,7 +896,7 @@ class RecitalManager:
                 if recital_session.text_filename:
                     self.recitals_content_ra.remove_local_data_file(recital_session.text_filename)
 
-            if original_status in [SessionStatus.AGGREGATED, SessionStatus.UPLOADED]:
+            if original_status in [SessionStatus.AGGREGATED, SessionStatus.UPLOADED, SessionStatus.FAILED]:
                 # Delete local files which may have already been deleted after upload
                 text_filename = recital_session.text_filename
                 source_audio_filename = recital_session.source_audio_filename
@@ -360,8 +926,8 @@ class RecitalManager:
                             "session_id": session_id,
                         },
                     )
-
-        except:
+                    raise SessionFinalizationError(f"Could not delete session {session_id} content from storage")
+        except Exception:
             print(f"Error deleting session {session_id} content")
             self.posthog.capture(
                 "server",
@@ -370,15 +936,212 @@ class RecitalManager:
                     "session_id": session_id,
                 },
             )
+            raise
+
+        if not self.recitals_ra.transition_session(
+            session_id,
+            original_status,
+            self.worker_id,
+            status=SessionStatus.DISCARDED,
+            duration=0,
+            **cleared_finalization_failures,
+        ):
+            print(f"Session {session_id} changed while discarding - skipping")
+            return False  # Moved on meanwhile - the next run sees its new status
+
+        # Invalidate the stats cache for this user
+        stats_cache.invalidate_stats_by_user_id(recital_session.user_id)
 
         return True
 
-    def add_text_segment(self, session_id: str, user: User, segment: TextSegmentRequestBody) -> None:
-        recital_session = self.recitals_ra.get_by_id_and_user_id(session_id, user.id)
-        if not recital_session or recital_session.disavowed:
+    async def add_text_segment(self, session_id: str, user: User, segment: TextSegmentRequestBody) -> None:
+        session_access = await self.async_recitals_ra.get_session_access(session_id, user.id)
+        if not session_access or session_access.disavowed:
+            raise MissingSessionError()
+
+        text_segment = RecitalTextSegment(recital_session_id=session_id, seek_end=segment.seek_end, text=segment.text)
+        await self.async_recitals_ra.add_text_segment(text_segment)
+
+        self.session_duration_engine.report_duration(session_id, segment.seek_end)
+
+    async def add_text_segments(self, session_id: str, user: User, segments: list[TextSegmentRequestBody]) -> None:
+        session_access = await self.async_recitals_ra.get_session_access(session_id, user.id)
+        if not session_access or session_access.disavowed:
+            raise MissingSessionError()
+
+        text_segments = [
+            RecitalTextSegment(recital_session_id=session_id, seek_end=segment.seek_end, text=segment.text)
+            for segment in segments
+        ]
+        await self.async_recitals_ra.add_text_segments(text_segments)
+
+        # Segments are ordered - the last one covers the whole batch
+        self.session_duration_engine.report_duration(session_id, segments[-1].seek_end)
+
+    def _verify_audio_segment_retry(self, existing_segment: RecitalAudioSegment, content_hash: str) -> None:
+        # Segments stored before hashing was introduced cannot be compared - first upload wins
+        if existing_segment.content_hash and existing_segment.content_hash != content_hash:
+            raise AudioSegmentConflictError()
+
+    async def store_audio_segment(
+        self,
+        session_id: str,
+        user: User,
+        segment_id: int,
+        mime_type: str,
+        chunks: AsyncIterator[bytes],
+        max_segment_size_bytes: int,
+        declared_content_hash: Optional[str] = None,
+    ) -> AudioSegmentStoreResult:
+        """Stores an uploaded audio segment - retries of an already stored segment are a no-op.
+
+        Args:
+            session_id (str): Session of the segment
+            user (User): Owner user - must match the session
+            segment_id (int): Sequential number of the segment within the session
+            mime_type (str): Mime type of the segment content
+            chunks (AsyncIterator[bytes]): The segment content
+            max_segment_size_bytes (int): Largest allowed segment size
+            declared_content_hash (Optional[str]): Hex SHA-256 of the content when provided by the client.
+                Lets retries be resolved without reading the content at all.
+
+        Raises:
+            MissingSessionError: Session does not exist for this user
+            AudioSegmentTooLargeError: The segment is larger than max_segment_size_bytes
+            AudioSegmentConflictError: The segment was already stored with different content
+            AudioSegmentChecksumMismatchError: The content does not match the declared hash
+            SessionNotActiveError: The session audio was already aggregated
+            StorageFullError: The data folder is running out of free space
+
+        Returns:
+            AudioSegmentStoreResult: Whether the segment was stored by this call
+        """
+        session_access = await self.async_recitals_ra.get_session_access(session_id, user.id)
+        if not session_access or session_access.disavowed:
             raise MissingSessionError()
 
-        text_segment = RecitalTextSegment(recital_session=recital_session, seek_end=segment.seek_end, text=segment.text)
-        self.recitals_ra.add_text_segment(text_segment)
+        if declared_content_hash:
+            declared_content_hash = declared_content_hash.lower()
+
+        existing_segment = await self.async_recitals_ra.get_audio_segment(session_id, segment_id)
+        if existing_segment:
+            if declared_content_hash:
+                self._verify_audio_segment_retry(existing_segment, declared_content_hash)
+            else:
+                # Only hash the retried content - nothing touches the disk
+                _, content_hash = await self.recitals_content_ra.hash_audio_segment_stream(
+                    chunks, max_segment_size_bytes
+                )
+                self._verify_audio_segment_retry(existing_segment, content_hash)
+            return AudioSegmentStoreResult(stored=False, byte_size=existing_segment.byte_size)
+
+        # Room for the largest allowed segment is held while it is written
+        with self.disk_pressure_engine.reserve(max_segment_size_bytes):
+            return await self._store_new_audio_segment(
+                session_id, segment_id, mime_type, chunks, max_segment_size_bytes, declared_content_hash
+            )
+
+    async def _store_new_audio_segment(
+        self,
+        session_id: str,
+        segment_id: int,
+        mime_type: str,
+        chunks: AsyncIterator[bytes],
+        max_segment_size_bytes: int,
+        declared_content_hash: Optional[str],
+    ) -> AudioSegmentStoreResult:
+        file_extension = guess_extension(mime_type.split(";")[0]) or ".bin"
+        file_name = f"{session_id}{file_extension}.seg.{segment_id}"
+
+        if self.audio_segment_spool_enabled:
+            appender = await self.recitals_content_ra.open_audio_spool_appender(session_id, file_name, segment_id)
+            if appender:
+                return await self._store_audio_segment_into_spool(
+                    appender, session_id, segment_id, file_name, chunks, max_segment_size_bytes, declared_content_hash
+                )
 
-        self.schedule_session_duration_update_job(session_id, segment.seek_end)
+        # Not next in sequence (or no spooling) - buffered as a segment file
+        received_segment = await self.recitals_content_ra.receive_audio_segment_stream(
+            file_name, chunks, max_segment_size_bytes
+        )
+        try:
+            if declared_content_hash and declared_content_hash != received_segment.content_hash:
+                raise AudioSegmentChecksumMismatchError()
+
+            # The unique (session, sequential) row claims the segment before its file is put in place
+            try:
+                await self.async_recitals_ra.add_audio_segment(
+                    RecitalAudioSegment(
+                        filename=file_name,
+                        recital_session_id=session_id,
+                        sequential=segment_id,
+                        content_hash=received_segment.content_hash,
+                        byte_size=received_segment.byte_size,
+                    )
+                )
+            except IntegrityError:
+                # A concurrent upload of the same segment won the race
+                existing_segment = await self.async_recitals_ra.get_audio_segment(session_id, segment_id)
+                if not existing_segment:
+                    raise
+                self._verify_audio_segment_retry(existing_segment, received_segment.content_hash)
+                return AudioSegmentStoreResult(stored=False, byte_size=existing_segment.byte_size)
+
+            await self.recitals_content_ra.commit_received_audio_segment(received_segment, file_name)
+        finally:
+            await self.recitals_content_ra.discard_received_audio_segment(received_segment)
+
+        if self.audio_segment_spool_enabled:
+            # May fill a gap in the spool sequence
+            await self.recitals_content_ra.drain_audio_spool(session_id, file_name)
+
+        return AudioSegmentStoreResult(stored=True, byte_size=received_segment.byte_size)
+
+    async def _store_audio_segment_into_spool(
+        self,
+        appender: AudioSpoolAppender,
+        session_id: str,
+        segment_id: int,
+        file_name: str,
+        chunks: AsyncIterator[bytes],
+        max_segment_size_bytes: int,
+        declared_content_hash: Optional[str],
+    ) -> AudioSegmentStoreResult:
+        committed = False
+        try:
+            byte_size, content_hash = await self.recitals_content_ra.receive_audio_segment_into_spool(
+                appender, chunks, max_segment_size_bytes
+            )
+            if declared_content_hash and declared_content_hash != content_hash:
+                raise AudioSegmentChecksumMismatchError()
+
+            try:
+                await self.async_recitals_ra.add_audio_segment(
+                    RecitalAudioSegment(
+                        filename=file_name,
+                        recital_session_id=session_id,
+                        sequential=segment_id,
+                        content_hash=content_hash,
+                        byte_size=byte_size,
+                    )
+                )
+            except IntegrityError:
+                existing_segment = await self.async_recitals_ra.get_audio_segment(session_id, segment_id)
+                if not existing_segment:
+                    raise
+                self._verify_audio_segment_retry(existing_segment, content_hash)
+                return AudioSegmentStoreResult(stored=False, byte_size=existing_segment.byte_size)
+
+            # Committing the appender either indexes the segment or rolls it back - never both
+            committed = True
+            try:
+                await self.recitals_content_ra.commit_audio_spool_appender(appender, byte_size)
+            except Exception:
+                # No audio behind the row - a retry of the segment has to store it again
+                await self.async_recitals_ra.delete_audio_segment(session_id, segment_id)
+                raise
+        finally:
+            if not committed:
+                await self.recitals_content_ra.rollback_audio_spool_appender(appender)
+
+        return AudioSegmentStoreResult(stored=True, byte_size=byte_size)
@@ -62,3 +62,25 @@ async_session = orm.sessionmaker(async_engine, class_=AsyncSession, expire_on_co
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
     async with async_session() as session:
         yield session
+
+
+class AsyncDatabase:
+    """Async counterpart of Database for the resource access classes.
+
+    Shares the async engine (and its connection pool) with the CRUD api stack.
+    """
+
+    def __init__(self) -> None:
+        self._session_factory = async_session
+
+    @asynccontextmanager
+    async def session(self) -> AsyncGenerator[AsyncSession, None]:
+        session: AsyncSession = self._session_factory()
+        try:
+            yield session
+        except Exception:
+            logger.exception("Session rollback because of exception")
+            await session.rollback()
+            raise
+        finally:
+            await session.close()
@@ -1,5 +1,7 @@
 import uuid
+from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 
 from .mixins.date_fields import DateFieldsMixin
@@ -14,5 +16,16 @@ class RecitalAudioSegment(SQLModel, DateFieldsMixin, table=True):
     recital_session_id: str = Field(index=True, foreign_key="recital_sessions.id")
     sequential: int
     filename: str
+    # Hex SHA-256 of the segment content - lets retried uploads be detected
+    content_hash: Optional[str] = Field(default=None, nullable=True)
+    byte_size: Optional[int] = Field(default=None, nullable=True)
 
     recital_session: "RecitalSession" = Relationship(back_populates="audio_segments")
+
+
+Index(
+    "ux_recital_audio_segments_session_sequential",
+    RecitalAudioSegment.recital_session_id,
+    RecitalAudioSegment.sequential,
+    unique=True,
+)
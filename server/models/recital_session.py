@@ -1,10 +1,11 @@
+from datetime import datetime
 from enum import Enum
 from typing import Optional
 from uuid import UUID
 
 from pydantic import BaseModel
 from sqlalchemy import Index
-from sqlmodel import Field, Relationship, SQLModel
+from sqlmodel import TIMESTAMP, Field, Relationship, SQLModel
 
 from .mixins.date_fields import DateFieldsMixin
 from .text_document import TextDocument
@@ -17,6 +18,8 @@ class SessionStatus(str, Enum):
     AGGREGATED = "aggregated"
     UPLOADED = "uploaded"
     DISCARDED = "discarded"
+    # Finalization kept failing - waits for an admin to requeue it
+    FAILED = "failed"
 
 
 class RecitalSessionBase(SQLModel, DateFieldsMixin):
@@ -24,6 +27,12 @@ class RecitalSessionBase(SQLModel, DateFieldsMixin):
     status: str = Field(index=True, default=SessionStatus.ACTIVE)
     duration: Optional[float] = Field(default=None, nullable=True)
     disavowed: Optional[bool] = Field(default=False, nullable=False)
+    # Real duration of the recorded audio - as opposed to the text coverage based duration
+    audio_duration: Optional[float] = Field(default=None, nullable=True)
+    # Audio length and text coverage disagree - some text may have no audio behind it (or vice versa)
+    audio_duration_mismatch: Optional[bool] = Field(default=None, nullable=True)
+    # Part of the aggregated audio (0 - 1) which is silent
+    silence_ratio: Optional[float] = Field(default=None, nullable=True)
 
 
 class RecitalSession(RecitalSessionBase, SQLModel, table=True):
@@ -37,6 +46,36 @@ class RecitalSession(RecitalSessionBase, SQLModel, table=True):
     light_audio_filename: str = Field(nullable=True)
     text_filename: str = Field(nullable=True)
 
+    # When the speaker ended the session - abandoned sessions are never explicitly ended
+    ended_at: Optional[datetime] = Field(default=None, nullable=True, sa_type=TIMESTAMP(timezone=True))
+
+    # Source audio metadata - extracted once after aggregation
+    audio_codec: Optional[str] = Field(default=None, nullable=True)
+    audio_channels: Optional[int] = Field(default=None, nullable=True)
+    audio_sample_rate: Optional[int] = Field(default=None, nullable=True)
+    audio_bit_rate: Optional[int] = Field(default=None, nullable=True)
+    audio_byte_size: Optional[int] = Field(default=None, nullable=True)
+    # Silence after the last sound of the aggregated audio (seconds)
+    trailing_silence: Optional[float] = Field(default=None, nullable=True)
+
+    # When each artifact was confirmed in the content storage - retried uploads skip the confirmed ones
+    text_uploaded_at: Optional[datetime] = Field(default=None, nullable=True, sa_type=TIMESTAMP(timezone=True))
+    main_audio_uploaded_at: Optional[datetime] = Field(default=None, nullable=True, sa_type=TIMESTAMP(timezone=True))
+    source_audio_uploaded_at: Optional[datetime] = Field(default=None, nullable=True, sa_type=TIMESTAMP(timezone=True))
+    light_audio_uploaded_at: Optional[datetime] = Field(default=None, nullable=True, sa_type=TIMESTAMP(timezone=True))
+
+    # Failed finalization attempts of the current step - retried with a backoff until exhausted
+    finalization_attempts: int = Field(default=0, nullable=False, sa_column_kwargs={"server_default": "0"})
+    finalization_last_error: Optional[str] = Field(default=None, nullable=True)
+    finalization_next_attempt_at: Optional[datetime] = Field(
+        default=None, nullable=True, sa_type=TIMESTAMP(timezone=True)
+    )
+    # Worker currently finalizing the session - other workers skip it until the lease expires
+    finalization_claimed_by: Optional[str] = Field(default=None, nullable=True)
+    finalization_claimed_until: Optional[datetime] = Field(
+        default=None, nullable=True, sa_type=TIMESTAMP(timezone=True)
+    )
+
     user: Optional["User"] = Relationship(back_populates="recital_sessions")
     text_segments: list["RecitalTextSegment"] = Relationship(back_populates="recital_session")
     audio_segments: list["RecitalAudioSegment"] = Relationship(back_populates="recital_session")
@@ -1,8 +1,71 @@
+import fcntl
+import hashlib
+import json
 import os
+import re
+from dataclasses import dataclass
 from pathlib import Path
+from typing import IO, AsyncIterator, NamedTuple, Optional
+from uuid import uuid4
 
-import boto3
 from botocore.exceptions import ClientError
+from starlette.concurrency import run_in_threadpool
+
+from errors import AudioSegmentTooLargeError, SessionNotActiveError
+from utility.cache.presigned_urls import PresignedUrlCache
+from utility.files import append_files
+from utility.storage import ContentStorageClient
+
+# Received chunks are coalesced up to this size before hitting the disk
+STREAM_WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+class ReceivedAudioSegment(NamedTuple):
+    temp_filename: str
+    byte_size: int
+    content_hash: str
+
+
+class AudioSpoolEntry(NamedTuple):
+    sequential: int
+    offset: int
+    size: int
+
+
+@dataclass
+class AudioSpoolAppender:
+    """An exclusive append position at the end of a session audio spool."""
+
+    index_file: IO
+    spool_file: IO
+    spool_filename: str
+    sequential: int
+    start_offset: int
+
+
+def _write_and_hash(temp_file, content_hash, buffer: bytearray) -> None:
+    content_hash.update(buffer)
+    temp_file.write(buffer)
+
+
+async def _receive_stream(target_file, chunks: AsyncIterator[bytes], max_size_bytes: int) -> tuple[int, str]:
+    size = 0
+    buffer = bytearray()
+    content_hash = hashlib.sha256()
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_size_bytes:
+            raise AudioSegmentTooLargeError()
+
+        buffer.extend(chunk)
+        if len(buffer) >= STREAM_WRITE_BUFFER_SIZE:
+            await run_in_threadpool(_write_and_hash, target_file, content_hash, buffer)
+            buffer = bytearray()
+
+    if buffer:
+        await run_in_threadpool(_write_and_hash, target_file, content_hash, buffer)
+
+    return size, content_hash.hexdigest()
 
 
 class RecitalsContentRA:
@@ -11,9 +74,13 @@ class RecitalsContentRA:
         self,
         data_folder: str,
         content_s3_bucket: str,
+        content_storage_client: ContentStorageClient,
+        presigned_url_cache: PresignedUrlCache,
     ) -> None:
         self.data_folder = data_folder
         self.content_s3_bucket = content_s3_bucket
+        self.content_storage_client = content_storage_client
+        self.presigned_url_cache = presigned_url_cache
 
         # Create the data folder if it does not exist
         Path(self.data_folder).mkdir(parents=True, exist_ok=True)
@@ -27,6 +94,447 @@ class RecitalsContentRA:
     def get_data_folder(self) -> str:
         return self.data_folder
 
+    async def receive_audio_segment_stream(
+        self, filename: str, chunks: AsyncIterator[bytes], max_size_bytes: int
+    ) -> ReceivedAudioSegment:
+        """Receives a streamed audio segment onto a temporary file with bounded memory use.
+
+        Disk writes and hashing run off the event loop. The temporary file only becomes
+        the segment file once committed with commit_received_audio_segment.
+
+        Args:
+            filename (str): Target file name within the data folder
+            chunks (AsyncIterator[bytes]): The segment content
+            max_size_bytes (int): Abort once the segment grows beyond this size
+
+        Raises:
+            AudioSegmentTooLargeError: The segment is larger than max_size_bytes
+
+        Returns:
+            ReceivedAudioSegment: The temporary file name, byte size and content hash
+        """
+        # Dot prefixed - never matched by the session segment file globs
+        temp_filename = f".{filename}.{uuid4().hex}.tmp"
+        temp_path = Path(self.data_folder, temp_filename)
+
+        temp_file = await run_in_threadpool(open, temp_path, "wb")
+        try:
+            try:
+                size, content_hash = await _receive_stream(temp_file, chunks, max_size_bytes)
+            finally:
+                await run_in_threadpool(temp_file.close)
+        except BaseException:
+            await run_in_threadpool(temp_path.unlink, missing_ok=True)
+            raise
+
+        return ReceivedAudioSegment(temp_filename, size, content_hash)
+
+    async def commit_received_audio_segment(self, received_segment: ReceivedAudioSegment, filename: str) -> None:
+        await run_in_threadpool(
+            os.replace, Path(self.data_folder, received_segment.temp_filename), Path(self.data_folder, filename)
+        )
+
+    async def discard_received_audio_segment(self, received_segment: ReceivedAudioSegment) -> None:
+        await run_in_threadpool(Path(self.data_folder, received_segment.temp_filename).unlink, missing_ok=True)
+
+    async def hash_audio_segment_stream(self, chunks: AsyncIterator[bytes], max_size_bytes: int) -> tuple[int, str]:
+        """Hashes a streamed audio segment without storing it.
+
+        Used to compare a retried upload against the stored segment without any disk writes.
+
+        Raises:
+            AudioSegmentTooLargeError: The segment is larger than max_size_bytes
+
+        Returns:
+            tuple[int, str]: Byte size and content hash of the segment
+        """
+        size = 0
+        buffer = bytearray()
+        content_hash = hashlib.sha256()
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size_bytes:
+                raise AudioSegmentTooLargeError()
+
+            buffer.extend(chunk)
+            if len(buffer) >= STREAM_WRITE_BUFFER_SIZE:
+                await run_in_threadpool(content_hash.update, buffer)
+                buffer = bytearray()
+
+        if buffer:
+            await run_in_threadpool(content_hash.update, buffer)
+
+        return size, content_hash.hexdigest()
+
+    def _get_audio_spool_index_path(self, session_id: str) -> Path:
+        return Path(self.data_folder, f"{session_id}.spool.idx")
+
+    @staticmethod
+    def _read_audio_spool_index(index_file: IO) -> tuple[Optional[str], list[AudioSpoolEntry]]:
+        index_file.seek(0)
+        spool_filename = None
+        entries = []
+        for line in index_file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            spool_filename = record["spool"]
+            entries.append(AudioSpoolEntry(record["sequential"], record["offset"], record["size"]))
+        return spool_filename, entries
+
+    @staticmethod
+    def _append_audio_spool_index(index_file: IO, spool_filename: str, entry: AudioSpoolEntry) -> None:
+        index_file.write(json.dumps({"spool": spool_filename, **entry._asdict()}) + "\n")
+        index_file.flush()
+
+    def get_audio_spool(self, session_id: str) -> tuple[Optional[str], list[AudioSpoolEntry]]:
+        """Reads the spool of a session.
+
+        Returns:
+            tuple[Optional[str], list[AudioSpoolEntry]]: The spool file name (None without a spool)
+                and the segments it holds - in sequence order.
+        """
+        index_path = self._get_audio_spool_index_path(session_id)
+        if not index_path.exists():
+            return None, []
+
+        with open(index_path, "r") as index_file:
+            return self._read_audio_spool_index(index_file)
+
+    def _is_audio_spool_finalized(self, spool_filename: Optional[str]) -> bool:
+        # Finalizing renames the spool once it is complete - the index still names it
+        return spool_filename is not None and not Path(self.data_folder, spool_filename).exists()
+
+    def _lock_audio_spool(self, session_id: str) -> Optional[IO]:
+        index_file = open(self._get_audio_spool_index_path(session_id), "a+")
+        try:
+            # Never wait on the lock - a segment that cannot be appended now is buffered instead
+            fcntl.flock(index_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            index_file.close()
+            return None
+        return index_file
+
+    def _open_audio_spool_appender(
+        self, session_id: str, segment_filename: str, sequential: int
+    ) -> Optional[AudioSpoolAppender]:
+        index_file = self._lock_audio_spool(session_id)
+        if not index_file:
+            return None
+
+        try:
+            spool_filename, entries = self._read_audio_spool_index(index_file)
+            if self._is_audio_spool_finalized(spool_filename):
+                # The session audio is already aggregated - a late segment must not recreate the spool
+                raise SessionNotActiveError()
+
+            expected_sequential = entries[-1].sequential + 1 if entries else 0
+            if sequential != expected_sequential:
+                index_file.close()
+                return None
+
+            spool_filename = spool_filename or self.get_audio_spool_filename(segment_filename)
+            spool_path = Path(self.data_folder, spool_filename)
+            spool_file = open(spool_path, "r+b" if spool_path.exists() else "wb")
+            # Drops bytes of an append that never made it into the index
+            end_offset = entries[-1].offset + entries[-1].size if entries else 0
+            spool_file.truncate(end_offset)
+            spool_file.seek(end_offset)
+        except BaseException:
+            index_file.close()
+            raise
+
+        return AudioSpoolAppender(index_file, spool_file, spool_filename, sequential, end_offset)
+
+    def _drain_buffered_audio_segments(self, index_file: IO, spool_file: IO, spool_filename: str) -> None:
+        _, entries = self._read_audio_spool_index(index_file)
+        next_sequential = entries[-1].sequential + 1 if entries else 0
+        offset = entries[-1].offset + entries[-1].size if entries else 0
+        segments_filename_prefix = spool_filename.removesuffix(".spool")
+
+        spool_file.seek(offset)
+        while (segment_path := Path(self.data_folder, f"{segments_filename_prefix}.seg.{next_sequential}")).exists():
+            size = append_files(spool_file, [segment_path])
+            self._append_audio_spool_index(index_file, spool_filename, AudioSpoolEntry(next_sequential, offset, size))
+            segment_path.unlink()
+            offset += size
+            next_sequential += 1
+
+    def _close_audio_spool_appender(self, appender: AudioSpoolAppender) -> None:
+        appender.spool_file.close()
+        # Closing the index file releases the lock
+        appender.index_file.close()
+
+    def _commit_audio_spool_appender(self, appender: AudioSpoolAppender, size: int) -> None:
+        try:
+            appender.spool_file.flush()
+            self._append_audio_spool_index(
+                appender.index_file,
+                appender.spool_filename,
+                AudioSpoolEntry(appender.sequential, appender.start_offset, size),
+            )
+        except BaseException:
+            # Not in the index - the appended bytes are dropped
+            self._rollback_audio_spool_appender(appender)
+            raise
+
+        try:
+            # Buffered segments waiting on this one follow it into the spool
+            self._drain_buffered_audio_segments(appender.index_file, appender.spool_file, appender.spool_filename)
+        except Exception as e:
+            # The segment itself is committed - buffered segments are drained by a later append or on finalize
+            print(f"Error draining buffered segments into spool {appender.spool_filename}")
+            print(e)
+        finally:
+            self._close_audio_spool_appender(appender)
+
+    def _rollback_audio_spool_appender(self, appender: AudioSpoolAppender) -> None:
+        try:
+            appender.spool_file.truncate(appender.start_offset)
+        finally:
+            self._close_audio_spool_appender(appender)
+
+    def _drain_audio_spool(self, session_id: str, segment_filename: str) -> None:
+        index_file = self._lock_audio_spool(session_id)
+        if not index_file:
+            return  # The lock holder drains once it is done appending
+
+        try:
+            spool_filename, entries = self._read_audio_spool_index(index_file)
+            if self._is_audio_spool_finalized(spool_filename):
+                return
+
+            spool_filename = spool_filename or self.get_audio_spool_filename(segment_filename)
+            next_sequential = entries[-1].sequential + 1 if entries else 0
+            segments_filename_prefix = spool_filename.removesuffix(".spool")
+            if not Path(self.data_folder, f"{segments_filename_prefix}.seg.{next_sequential}").exists():
+                return  # Still waiting on a gap in the sequence
+
+            spool_path = Path(self.data_folder, spool_filename)
+            with open(spool_path, "r+b" if spool_path.exists() else "wb") as spool_file:
+                self._drain_buffered_audio_segments(index_file, spool_file, spool_filename)
+        finally:
+            index_file.close()
+
+    @staticmethod
+    def get_audio_spool_filename(segment_filename: str) -> str:
+        return re.sub(r"\.seg\..*", "", segment_filename) + ".spool"
+
+    async def open_audio_spool_appender(
+        self, session_id: str, segment_filename: str, sequential: int
+    ) -> Optional[AudioSpoolAppender]:
+        """Claims the end of the session spool for the given segment.
+
+        Raises:
+            SessionNotActiveError: The spool was already finalized
+
+        Returns:
+            Optional[AudioSpoolAppender]: None when the segment is not next in sequence
+                or the spool is busy - the segment should be buffered as a segment file instead.
+        """
+        return await run_in_threadpool(self._open_audio_spool_appender, session_id, segment_filename, sequential)
+
+    async def receive_audio_segment_into_spool(
+        self, appender: AudioSpoolAppender, chunks: AsyncIterator[bytes], max_size_bytes: int
+    ) -> tuple[int, str]:
+        """Streams an audio segment onto the end of the session spool.
+
+        Raises:
+            AudioSegmentTooLargeError: The segment is larger than max_size_bytes
+
+        Returns:
+            tuple[int, str]: Byte size and content hash of the segment
+        """
+        return await _receive_stream(appender.spool_file, chunks, max_size_bytes)
+
+    async def commit_audio_spool_appender(self, appender: AudioSpoolAppender, size: int) -> None:
+        """Indexes the appended segment and releases the spool - the appender is closed either way.
+
+        Raises:
+            Exception: The segment could not be indexed - it was rolled back out of the spool
+        """
+        await run_in_threadpool(self._commit_audio_spool_appender, appender, size)
+
+    async def rollback_audio_spool_appender(self, appender: AudioSpoolAppender) -> None:
+        await run_in_threadpool(self._rollback_audio_spool_appender, appender)
+
+    async def drain_audio_spool(self, session_id: str, segment_filename: str) -> None:
+        """Moves buffered segment files which are next in sequence into the session spool."""
+        await run_in_threadpool(self._drain_audio_spool, session_id, segment_filename)
+
+    def finalize_audio_spool(self, session_id: str, leftover_segment_filenames: list[str]) -> Optional[str]:
+        """Turns the session spool into the concatenated session audio file.
+
+        Segments which never made it into the spool (a gap in the sequence) are appended at its end.
+
+        Returns:
+            Optional[str]: The concatenated audio file name - None when the session has no spool
+        """
+        index_path = self._get_audio_spool_index_path(session_id)
+        if not index_path.exists():
+            return None
+
+        with open(index_path, "a+") as index_file:
+            fcntl.flock(index_file, fcntl.LOCK_EX)
+            spool_filename, entries = self._read_audio_spool_index(index_file)
+            if not spool_filename:
+                return None
+
+            concatenated_filename = spool_filename.removesuffix(".spool")
+            spool_path = Path(self.data_folder, spool_filename)
+            if not spool_path.exists():
+                # Already finalized by a previous attempt
+                return concatenated_filename if Path(self.data_folder, concatenated_filename).exists() else None
+
+            end_offset = entries[-1].offset + entries[-1].size if entries else 0
+            with open(spool_path, "r+b") as spool_file:
+                spool_file.truncate(end_offset)
+                spool_file.seek(end_offset)
+                append_files(spool_file, [Path(self.data_folder, f) for f in leftover_segment_filenames])
+                # The spool is not synced while ingesting - sync it once it is complete
+                os.fsync(spool_file.fileno())
+
+            os.replace(spool_path, Path(self.data_folder, concatenated_filename))
+            return concatenated_filename
+
+    def remove_audio_spool_index(self, session_id: str) -> None:
+        self._get_audio_spool_index_path(session_id).unlink(missing_ok=True)
+
+    def _get_audio_spool_upload_path(self, session_id: str) -> Path:
+        return Path(self.data_folder, f"{session_id}.spool.upload")
+
+    def _read_audio_spool_upload(self, session_id: str) -> Optional[dict]:
+        upload_path = self._get_audio_spool_upload_path(session_id)
+        if not upload_path.exists():
+            return None
+        return json.loads(upload_path.read_text())
+
+    def _store_audio_spool_upload(self, session_id: str, upload: dict) -> None:
+        upload_path = self._get_audio_spool_upload_path(session_id)
+        temp_upload_path = upload_path.with_suffix(".tmp")
+        temp_upload_path.write_text(json.dumps(upload))
+        os.replace(temp_upload_path, upload_path)
+
+    def _get_committed_audio_spool(self, session_id: str) -> tuple[Optional[str], int]:
+        index_path = self._get_audio_spool_index_path(session_id)
+        if not index_path.exists():
+            return None, 0
+
+        with open(index_path, "r") as index_file:
+            # Waits out an append in progress - its index line may not be complete yet
+            fcntl.flock(index_file, fcntl.LOCK_SH)
+            spool_filename, entries = self._read_audio_spool_index(index_file)
+        return spool_filename, entries[-1].offset + entries[-1].size if entries else 0
+
+    def upload_audio_spool_parts(self, session_id: str, part_size: int) -> int:
+        """Uploads the audio recorded so far as parts of the session source audio - while the session is recording.
+
+        Only whole parts of spooled (committed) audio are uploaded - these bytes never change once spooled.
+        The upload is completed with the rest of the audio by upload_source_audio_to_storage.
+
+        Args:
+            session_id (str): The recording session
+            part_size (int): Size of each uploaded part - at least 5 MiB (the S3 multipart minimum)
+
+        Returns:
+            int: Number of source audio bytes uploaded so far
+        """
+        spool_filename, committed_size = self._get_committed_audio_spool(session_id)
+        upload = self._read_audio_spool_upload(session_id)
+        uploaded_size = sum(part["Size"] for part in upload["Parts"]) if upload else 0
+        if not spool_filename or committed_size - uploaded_size < part_size:
+            return uploaded_size
+
+        if not self._storage_s3_configured():
+            return uploaded_size
+
+        s3 = self.content_storage_client.client
+        if not upload:
+            extension_of_file = os.path.splitext(spool_filename.removesuffix(".spool"))[1]
+            target_object_name = f"{session_id}/source.audio{extension_of_file}"
+            response = s3.create_multipart_upload(
+                Bucket=self.content_s3_bucket, Key=target_object_name, Metadata={"session": session_id}
+            )
+            upload = {"Key": target_object_name, "UploadId": response["UploadId"], "Parts": []}
+            self._store_audio_spool_upload(session_id, upload)
+
+        with open(Path(self.data_folder, spool_filename), "rb") as spool_file:
+            spool_file.seek(uploaded_size)
+            while committed_size - uploaded_size >= part_size:
+                part_number = len(upload["Parts"]) + 1
+                response = s3.upload_part(
+                    Bucket=self.content_s3_bucket,
+                    Key=upload["Key"],
+                    UploadId=upload["UploadId"],
+                    PartNumber=part_number,
+                    Body=spool_file.read(part_size),
+                )
+                upload["Parts"].append({"PartNumber": part_number, "ETag": response["ETag"], "Size": part_size})
+                self._store_audio_spool_upload(session_id, upload)
+                uploaded_size += part_size
+
+        return uploaded_size
+
+    def _complete_audio_spool_upload(self, session_id: str, filename: str, target_object_name: str) -> bool:
+        upload = self._read_audio_spool_upload(session_id)
+        if not upload:
+            return False
+
+        source_path = Path(self.data_folder, filename)
+        uploaded_size = sum(part["Size"] for part in upload["Parts"])
+        if (
+            upload["Key"] != target_object_name
+            or not source_path.exists()
+            or source_path.stat().st_size < uploaded_size
+        ):
+            self.abort_audio_spool_upload(session_id)
+            return False
+
+        s3 = self.content_storage_client.client
+        try:
+            parts = [{"PartNumber": part["PartNumber"], "ETag": part["ETag"]} for part in upload["Parts"]]
+            with open(source_path, "rb") as source_file:
+                source_file.seek(uploaded_size)
+                # The last part may be of any size
+                if tail := source_file.read():
+                    part_number = len(parts) + 1
+                    response = s3.upload_part(
+                        Bucket=self.content_s3_bucket,
+                        Key=upload["Key"],
+                        UploadId=upload["UploadId"],
+                        PartNumber=part_number,
+                        Body=tail,
+                    )
+                    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+            s3.complete_multipart_upload(
+                Bucket=self.content_s3_bucket,
+                Key=upload["Key"],
+                UploadId=upload["UploadId"],
+                MultipartUpload={"Parts": parts},
+            )
+        except ClientError as e:
+            print(e)
+            self.abort_audio_spool_upload(session_id)
+            return False
+
+        self._get_audio_spool_upload_path(session_id).unlink(missing_ok=True)
+        return True
+
+    def abort_audio_spool_upload(self, session_id: str) -> None:
+        """Drops the source audio parts uploaded while the session was recording."""
+        upload = self._read_audio_spool_upload(session_id)
+        if not upload:
+            return
+
+        if self._storage_s3_configured():
+            s3 = self.content_storage_client.client
+            try:
+                s3.abort_multipart_upload(Bucket=self.content_s3_bucket, Key=upload["Key"], UploadId=upload["UploadId"])
+            except ClientError as e:
+                print(e)
+        self._get_audio_spool_upload_path(session_id).unlink(missing_ok=True)
+
     def upload_to_storage(self, source: str, target: str, metadata: dict[str, str], content_type: str = None) -> bool:
         if not self._storage_s3_configured():
             return False
@@ -36,8 +544,8 @@ class RecitalsContentRA:
             print(f"Warning file {source} does not exist. Aborting.")
             return False
 
-        # upload to S3
-        s3 = boto3.client("s3")
+        # upload to S3 - large files go up in concurrent parts
+        s3 = self.content_storage_client.client
 
         # ContentType - Should we include?
         try:
@@ -45,29 +553,44 @@ class RecitalsContentRA:
             if content_type:
                 extra_args["ContentType"] = content_type
 
-            s3.upload_file(source, self.content_s3_bucket, target, ExtraArgs=extra_args)
+            # Waits for a turn when other transfers hold the connection pool
+            with self.content_storage_client.transfer_slots:
+                s3.upload_file(
+                    source,
+                    self.content_s3_bucket,
+                    target,
+                    ExtraArgs=extra_args,
+                    Config=self.content_storage_client.transfer_config,
+                )
         except ClientError as e:
             print(e)
             return False
         return True
 
+    def _delete_objects(self, keys: list[str]) -> None:
+        s3 = self.content_storage_client.client
+        # A delete request takes up to 1000 keys
+        for start in range(0, len(keys), 1000):
+            response = s3.delete_objects(
+                Bucket=self.content_s3_bucket,
+                Delete={
+                    "Objects": [{"Key": key} for key in keys[start : start + 1000]],
+                    "Quiet": True,
+                },
+            )
+            if errors := response.get("Errors"):
+                raise ClientError({"Error": errors[0]}, "DeleteObjects")
+
     def delete_from_storage(self, targets: list[str]) -> bool:
         if not self._storage_s3_configured():
             return False
 
-        # remove from S3
-        s3 = boto3.client("s3")
+        for target in targets:
+            self.presigned_url_cache.delete(target)
 
+        # remove from S3
         try:
-            s3.delete_object(
-                Bucket=self.content_s3_bucket,
-                Delete={
-                    "Objects": [
-                        {"Key": target for target in targets},
-                    ],
-                    "Quiet": True,
-                },
-            )
+            self._delete_objects(targets)
         except ClientError as e:
             print(e)
             return False
@@ -81,21 +604,29 @@ class RecitalsContentRA:
             print("Warning prefix is not provided. Not deleting anything.")
             return False
 
-        s3 = boto3.resource("s3")
+        s3 = self.content_storage_client.client
 
         try:
             # remove from S3 by the object prefix
-            bucket = s3.Bucket(self.content_s3_bucket)
-            bucket.objects.filter(Prefix=prefix).delete()
+            paginator = s3.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.content_s3_bucket, Prefix=prefix):
+                if keys := [s3_object["Key"] for s3_object in page.get("Contents", [])]:
+                    self._delete_objects(keys)
 
         except Exception as e:
             print(e)
             return False
         return True
 
+    @staticmethod
+    def _get_transcript_object_name(session_id: str, text_filename: str) -> str:
+        # The transcript keeps the extension of its captions format
+        extension_of_file = os.path.splitext(text_filename)[1]
+        return f"{session_id}/transcript{extension_of_file}"
+
     def upload_text_to_storage(self, session_id: str, filename: str) -> bool:
         filename_in_data_folder = os.path.join(self.data_folder, filename)
-        target_object_name = f"{session_id}/transcript.vtt"
+        target_object_name = self._get_transcript_object_name(session_id, filename)
         return self.upload_to_storage(filename_in_data_folder, target_object_name, metadata={"session": session_id})
 
     def _upload_audio_to_storage(
@@ -112,6 +643,10 @@ class RecitalsContentRA:
         return self._upload_audio_to_storage(session_id, filename, "main.audio", {})
 
     def upload_source_audio_to_storage(self, session_id: str, filename: str) -> bool:
+        # Parts uploaded while recording only need the rest of the audio
+        extension_of_file = os.path.splitext(filename)[1]
+        if self._complete_audio_spool_upload(session_id, filename, f"{session_id}/source.audio{extension_of_file}"):
+            return True
         return self._upload_audio_to_storage(session_id, filename, "source.audio", {})
 
     def upload_light_audio_to_storage(self, session_id: str, filename: str) -> bool:
@@ -122,17 +657,60 @@ class RecitalsContentRA:
         if filename_in_data_folder.exists():
             filename_in_data_folder.unlink()
 
+    def get_local_data_files_by_session(self) -> dict[str, list[str]]:
+        """Lists the session files in the data folder by the session they belong to.
+
+        Files being received (hidden temp files) are left out.
+        """
+        session_filenames: dict[str, list[str]] = {}
+        with os.scandir(self.data_folder) as entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file():
+                    continue
+                # Session files are named {session_id}.{kind}
+                session_id = entry.name.split(".", 1)[0]
+                session_filenames.setdefault(session_id, []).append(entry.name)
+        return session_filenames
+
+    def remove_local_data_files(self, filenames: list[str]) -> int:
+        """Removes files from the data folder - files already gone are skipped.
+
+        Returns:
+            int: Number of bytes freed
+        """
+        freed_bytes = 0
+        for filename in filenames:
+            filename_in_data_folder = Path(self.data_folder, filename)
+            try:
+                size = filename_in_data_folder.stat().st_size
+                filename_in_data_folder.unlink()
+            except FileNotFoundError:
+                continue
+            freed_bytes += size
+        return freed_bytes
+
     def delete_session_content_from_storage(self, session_id: str) -> bool:
         session_content_folder_name = session_id
+        self.presigned_url_cache.invalidate_prefix(f"{session_content_folder_name}/")
         return self.delete_from_storage_prefix(prefix=session_content_folder_name)
 
-    def get_url_to_storage_object(self, target: str, expires_in: int = 1200) -> str:
+    def get_url_to_storage_object(self, target: str, expires_in: Optional[int] = None) -> str:
+        """Presigns a URL to a content storage object.
+
+        URLs of the default expiry are reused from the cache while they are still fresh enough.
+        """
         if not self._storage_s3_configured():
             print("Warning S3 target bucket is not configured. Aborting.")
             return ""
 
+        cacheable = expires_in is None
+        if cacheable:
+            if url := self.presigned_url_cache.get_url(target):
+                return url
+            expires_in = self.presigned_url_cache.expires_in_sec
+
         # Get presigned URL
-        s3 = boto3.client("s3")
+        s3 = self.content_storage_client.client
         try:
             response = s3.generate_presigned_url(
                 "get_object",
@@ -142,12 +720,16 @@ class RecitalsContentRA:
         except ClientError as e:
             print(e)
             return ""
+
+        if cacheable:
+            self.presigned_url_cache.set_url(target, response)
         return response
 
     def get_url_to_light_audio(self, session_id: str, **kwargs) -> str:
         target_object_name = f"{session_id}/light.audio.mp3"
         return self.get_url_to_storage_object(target_object_name, **kwargs)
 
-    def get_url_to_transcript(self, session_id: str, **kwargs) -> str:
-        target_object_name = f"{session_id}/transcript.vtt"
+    def get_url_to_transcript(self, session_id: str, text_filename: Optional[str], **kwargs) -> str:
+        # Sessions without a recorded text file predate the captions formats - they were all uploaded as vtt
+        target_object_name = self._get_transcript_object_name(session_id, text_filename or f"{session_id}.vtt")
         return self.get_url_to_storage_object(target_object_name, **kwargs)
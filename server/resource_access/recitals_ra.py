@@ -1,12 +1,33 @@
-from contextlib import AbstractContextManager
+from collections import defaultdict
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
 from datetime import datetime, timedelta, timezone
-from typing import Callable, Iterator
+from typing import Callable, Iterator, NamedTuple
 
-from sqlmodel import Session, and_, or_, select
+from sqlalchemy import Float, String, case, column, tuple_, values
+from sqlmodel import Session, and_, delete, func, insert, or_, select, update
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.recital_audio_segment import RecitalAudioSegment
 from models.recital_session import RecitalSession, SessionStatus
 from models.recital_text_segment import RecitalTextSegment
+from utility.cache.sessions import SessionAccess, SessionAccessCache
+
+
+# Text segments fetched per round trip when streaming the text of a session
+text_segments_stream_batch_size = 1000
+
+# Position of a session within a finalization queue - (priority, queued at, id)
+SessionQueueKey = tuple[int, datetime, str]
+
+
+class SessionQueueEntry(NamedTuple):
+    id: str
+    priority: int
+    queued_at: datetime
+
+    @property
+    def key(self) -> SessionQueueKey:
+        return (self.priority, self.queued_at, self.id)
 
 
 class RecitalsRA:
@@ -14,16 +35,28 @@ class RecitalsRA:
     def __init__(
         self,
         session_factory: Callable[..., AbstractContextManager[Session]],
-        data_folder: str,
+        session_access_cache: SessionAccessCache,
     ) -> None:
         self.session_factory = session_factory
-        self.data_folder = data_folder
+        self.session_access_cache = session_access_cache
 
     def get_by_id(self, recital_session_id: str) -> RecitalSession | None:
         with self.session_factory() as session:
             results = session.exec(select(RecitalSession).filter(RecitalSession.id == recital_session_id))
             return results.first()
 
+    def get_by_ids(self, recital_session_ids: list[str]) -> dict[str, RecitalSession]:
+        with self.session_factory() as session:
+            results = session.exec(select(RecitalSession).filter(RecitalSession.id.in_(recital_session_ids)))
+            return {recital_session.id: recital_session for recital_session in results.all()}
+
+    def get_sessions_status(self, recital_session_ids: list[str]) -> dict[str, str]:
+        with self.session_factory() as session:
+            results = session.exec(
+                select(RecitalSession.id, RecitalSession.status).filter(RecitalSession.id.in_(recital_session_ids))
+            )
+            return {recital_session_id: status for recital_session_id, status in results.all()}
+
     # More secure - to be used for authenticated API calls
     def get_by_id_and_user_id(self, recital_session_id: str, user_id: str) -> RecitalSession | None:
         with self.session_factory() as session:
@@ -34,58 +67,143 @@ class RecitalsRA:
             )
             return results.first()
 
-    def get_ended_sessions(self, limit: int = 100, consider_abandoned_after_hours: int = 2) -> Iterator[RecitalSession]:
-        with self.session_factory() as session:
-            cutoff_consider_active_as_ended = datetime.now(timezone.utc) - timedelta(
-                hours=consider_abandoned_after_hours
-            )
-            results = session.exec(
-                select(RecitalSession)
-                .filter(
-                    and_(
-                        or_(
-                            # Either it was marked as ended
-                            RecitalSession.status == SessionStatus.ENDED,
-                            # Or seemingly abandoned - but may have some content to use
-                            and_(
-                                RecitalSession.status == SessionStatus.ACTIVE,
-                                RecitalSession.created_at < cutoff_consider_active_as_ended,
-                            ),
-                        ),
-                        RecitalSession.disavowed != True,
-                    )
-                )
-                .limit(limit)
+    @staticmethod
+    def _finalization_due(now: datetime):
+        return or_(
+            RecitalSession.finalization_next_attempt_at == None,
+            RecitalSession.finalization_next_attempt_at <= now,
+        )
+
+    def _claim_session_queue_page(
+        self,
+        queue_filter,
+        priority,
+        claimed_by: str,
+        lease_sec: int,
+        limit: int,
+        after: SessionQueueKey | None,
+    ) -> list[SessionQueueEntry]:
+        """Claims a page of a finalization queue - ordered by (priority, queued at, id).
+
+        Keyset pagination - the page continues right after the given key, so draining a queue
+        never rescans the sessions handled so far and is not thrown off by sessions leaving the queue.
+
+        Claimed sessions are leased to the claimer - other workers skip them until the claim is
+        released or the lease expires (a crashed worker). Rows being claimed concurrently are skipped
+        rather than waited on, so workers draining the same queue split it between them.
+        """
+        queued_at = func.coalesce(RecitalSession.ended_at, RecitalSession.created_at)
+        claimable = (
+            select(RecitalSession.id)
+            .filter(
+                queue_filter,
+                or_(
+                    RecitalSession.finalization_claimed_until == None,
+                    RecitalSession.finalization_claimed_until < func.now(),
+                ),
             )
-            return results.all()
+            .order_by(priority, queued_at, RecitalSession.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        if after:
+            claimable = claimable.filter(tuple_(priority, queued_at, RecitalSession.id) > tuple_(*after))
 
-    def get_aggregated_sessions(self, limit: int = 100) -> Iterator[RecitalSession]:
         with self.session_factory() as session:
             results = session.exec(
-                select(RecitalSession)
-                .filter(
-                    and_(
-                        RecitalSession.status == SessionStatus.AGGREGATED,
-                        RecitalSession.disavowed != True,
-                    )
+                update(RecitalSession)
+                .where(RecitalSession.id.in_(claimable.scalar_subquery()))
+                .values(
+                    finalization_claimed_by=claimed_by,
+                    finalization_claimed_until=func.now() + timedelta(seconds=lease_sec),
                 )
-                .limit(limit)
+                .returning(RecitalSession.id, priority, queued_at)
             )
-            return results.all()
+            claimed_entries = [SessionQueueEntry(*row) for row in results.all()]
+            session.commit()
+
+        # Returned rows are not ordered
+        return sorted(claimed_entries, key=lambda entry: entry.key)
 
-    def get_disavowed_pending_sessions(self, limit: int = 100) -> Iterator[RecitalSession]:
+    def release_session_claims(self, recital_session_ids: list[str], claimed_by: str) -> None:
         with self.session_factory() as session:
-            results = session.exec(
-                select(RecitalSession)
-                .filter(
-                    and_(
-                        RecitalSession.status != SessionStatus.DISCARDED,
-                        RecitalSession.disavowed == True,
-                    )
-                )
-                .limit(limit)
+            session.exec(
+                update(RecitalSession)
+                .where(RecitalSession.id.in_(recital_session_ids), RecitalSession.finalization_claimed_by == claimed_by)
+                .values(finalization_claimed_by=None, finalization_claimed_until=None)
             )
-            return results.all()
+            session.commit()
+
+    def claim_ended_sessions(
+        self,
+        claimed_by: str,
+        lease_sec: int,
+        limit: int = 100,
+        after: SessionQueueKey | None = None,
+        consider_abandoned_after_hours: int = 2,
+    ) -> list[SessionQueueEntry]:
+        now = datetime.now(timezone.utc)
+        cutoff_consider_active_as_ended = now - timedelta(hours=consider_abandoned_after_hours)
+        queue_filter = and_(
+            or_(
+                # Either it was marked as ended
+                RecitalSession.status == SessionStatus.ENDED,
+                # Or seemingly abandoned - but may have some content to use
+                and_(
+                    RecitalSession.status == SessionStatus.ACTIVE,
+                    RecitalSession.created_at < cutoff_consider_active_as_ended,
+                ),
+            ),
+            RecitalSession.disavowed != True,
+            self._finalization_due(now),
+        )
+        # Sessions ended by their speaker first, then abandoned ones - retried sessions cannot starve either
+        priority = case(
+            (RecitalSession.finalization_attempts > 0, 2),
+            (RecitalSession.status == SessionStatus.ENDED, 0),
+            else_=1,
+        )
+        return self._claim_session_queue_page(queue_filter, priority, claimed_by, lease_sec, limit, after)
+
+    def claim_aggregated_sessions(
+        self, claimed_by: str, lease_sec: int, limit: int = 100, after: SessionQueueKey | None = None
+    ) -> list[SessionQueueEntry]:
+        queue_filter = and_(
+            RecitalSession.status == SessionStatus.AGGREGATED,
+            RecitalSession.disavowed != True,
+            self._finalization_due(datetime.now(timezone.utc)),
+        )
+        priority = case((RecitalSession.finalization_attempts > 0, 1), else_=0)
+        return self._claim_session_queue_page(queue_filter, priority, claimed_by, lease_sec, limit, after)
+
+    def claim_disavowed_pending_sessions(
+        self, claimed_by: str, lease_sec: int, limit: int = 100, after: SessionQueueKey | None = None
+    ) -> list[SessionQueueEntry]:
+        queue_filter = and_(
+            RecitalSession.status != SessionStatus.DISCARDED,
+            RecitalSession.disavowed == True,
+            self._finalization_due(datetime.now(timezone.utc)),
+        )
+        priority = case((RecitalSession.finalization_attempts > 0, 1), else_=0)
+        return self._claim_session_queue_page(queue_filter, priority, claimed_by, lease_sec, limit, after)
+
+    def claim_active_sessions(
+        self,
+        claimed_by: str,
+        lease_sec: int,
+        limit: int = 100,
+        after: SessionQueueKey | None = None,
+        consider_abandoned_after_hours: int = 2,
+    ) -> list[SessionQueueEntry]:
+        """Claims sessions which are still recording - seemingly abandoned ones are left to the ended queue."""
+        cutoff_consider_active_as_ended = datetime.now(timezone.utc) - timedelta(hours=consider_abandoned_after_hours)
+        queue_filter = and_(
+            RecitalSession.status == SessionStatus.ACTIVE,
+            RecitalSession.created_at >= cutoff_consider_active_as_ended,
+            RecitalSession.disavowed != True,
+        )
+        priority = case((RecitalSession.finalization_attempts > 0, 1), else_=0)
+        return self._claim_session_queue_page(queue_filter, priority, claimed_by, lease_sec, limit, after)
 
     def add_text_segment(self, recital_text_segment: RecitalTextSegment):
         with self.session_factory() as session:
@@ -107,6 +225,56 @@ class RecitalsRA:
             )
             return results.all()
 
+    def stream_session_text_segments(
+        self, recital_session_id: str, exclude_discarded=True, after_seek_end: float | None = None
+    ) -> Iterator[RecitalTextSegment]:
+        """Yields the text segments of a session ordered by seek end - only those past after_seek_end if given.
+
+        Rows are fetched in batches through a server side cursor - long sessions are never loaded at once.
+        The DB session stays open until the iteration is done.
+        """
+        with self.session_factory() as session:
+            seg_filter = RecitalTextSegment.recital_session_id == recital_session_id
+            if exclude_discarded:
+                seg_filter = and_(seg_filter, RecitalTextSegment.discarded != True)
+            if after_seek_end is not None:
+                seg_filter = and_(seg_filter, RecitalTextSegment.seek_end > after_seek_end)
+            results = session.exec(
+                select(RecitalTextSegment)
+                .filter(seg_filter)
+                .order_by(RecitalTextSegment.seek_end)
+                .execution_options(yield_per=text_segments_stream_batch_size)
+            )
+            yield from results
+
+    def count_session_text_segments(self, recital_session_id: str, until_seek_end: float) -> int:
+        """Counts the not discarded text segments of a session up to (including) the given seek end."""
+        with self.session_factory() as session:
+            results = session.exec(
+                select(func.count()).filter(
+                    RecitalTextSegment.recital_session_id == recital_session_id,
+                    RecitalTextSegment.discarded != True,
+                    RecitalTextSegment.seek_end <= until_seek_end,
+                )
+            )
+            return results.one()
+
+    def get_sessions_last_seek_end(self, recital_session_ids: list[str]) -> dict[str, float]:
+        """Reads the seek end of the last (not discarded) text segment of many sessions at once.
+
+        Sessions without text segments are left out.
+        """
+        with self.session_factory() as session:
+            results = session.exec(
+                select(RecitalTextSegment.recital_session_id, func.max(RecitalTextSegment.seek_end))
+                .filter(
+                    RecitalTextSegment.recital_session_id.in_(recital_session_ids),
+                    RecitalTextSegment.discarded != True,
+                )
+                .group_by(RecitalTextSegment.recital_session_id)
+            )
+            return {recital_session_id: last_seek_end for recital_session_id, last_seek_end in results.all()}
+
     def upsert_session_text_segment(self, recital_text_segment: RecitalTextSegment) -> None:
         with self.session_factory() as session:
             session.merge(recital_text_segment)
@@ -119,32 +287,167 @@ class RecitalsRA:
             session.commit()
             session.refresh(recital_audio_segment)
 
-    def get_audio_segments(self, recital_session_id: str) -> Iterator[RecitalAudioSegment]:
+    def get_sessions_audio_segments(self, recital_session_ids: list[str]) -> dict[str, list[RecitalAudioSegment]]:
+        """Reads the audio segments of many sessions at once - grouped by session and ordered by sequence."""
         with self.session_factory() as session:
             results = session.exec(
-                select(RecitalAudioSegment).filter(RecitalAudioSegment.recital_session_id == recital_session_id)
-                # Sort results by the sequential column ascending
-                .order_by(RecitalAudioSegment.sequential)
+                select(RecitalAudioSegment)
+                .filter(RecitalAudioSegment.recital_session_id.in_(recital_session_ids))
+                .order_by(RecitalAudioSegment.recital_session_id, RecitalAudioSegment.sequential)
             )
-            return results.all()
+            audio_segments_by_session = defaultdict(list)
+            for audio_segment in results.all():
+                audio_segments_by_session[audio_segment.recital_session_id].append(audio_segment)
+            return dict(audio_segments_by_session)
 
     def upsert(self, recital_session: RecitalSession) -> None:
         with self.session_factory() as session:
             session.merge(recital_session)
             session.commit()
+            self.session_access_cache.invalidate(recital_session.id)
             return recital_session
 
-    def set_session_status(self, recital_session_id: str, status: SessionStatus) -> None:
+    def update_session_durations(self, durations: dict[str, float]) -> None:
+        """Raises the duration of many sessions in a single set-based UPDATE.
+
+        Durations only ever grow - a stale value never shrinks a session duration.
+        Sessions past aggregation keep their final duration - estimates flushed late (e.g. by another
+        process than the one finalizing) are ignored.
+        Only touches the duration - keeps cached session access valid.
+        """
+        if not durations:
+            return
+
+        new_durations = values(column("id", String), column("duration", Float), name="new_durations").data(
+            list(durations.items())
+        )
         with self.session_factory() as session:
-            results = session.exec(select(RecitalSession).filter(RecitalSession.id == recital_session_id))
-            recital_session = results.first()
-            if recital_session:
-                recital_session.status = status
-                session.add(recital_session)
-                session.commit()
-            else:
-                raise ValueError(f"No session found with id: {recital_session_id}")
-
-    def store_session_text(self, text_content: str, filename: str) -> str:
-        with open(f"{self.data_folder}/{filename}", "w") as f:
-            f.write(text_content)
+            session.exec(
+                update(RecitalSession)
+                .where(RecitalSession.id == new_durations.c.id)
+                .where(RecitalSession.status.in_([SessionStatus.ACTIVE, SessionStatus.ENDED]))
+                .values(duration=func.greatest(func.coalesce(RecitalSession.duration, 0), new_durations.c.duration))
+            )
+            session.commit()
+
+    def transition_session(
+        self,
+        recital_session_id: str,
+        expected_status: SessionStatus,
+        claimed_by: str | None = None,
+        **updates,
+    ) -> bool:
+        """Updates a session only if it is still in the expected status (compare and set).
+
+        Args:
+            recital_session_id (str): Session to update
+            expected_status (SessionStatus): Status the session must still be in
+            claimed_by (str, optional): When given - the session must also still be claimed by this claimer
+            updates: Columns to set - including the new status if it changes
+
+        Returns:
+            bool: False when the session moved on (or its claim was lost) and nothing was updated
+        """
+        conditions = [RecitalSession.id == recital_session_id, RecitalSession.status == expected_status]
+        if claimed_by:
+            conditions.append(RecitalSession.finalization_claimed_by == claimed_by)
+
+        with self.session_factory() as session:
+            result = session.exec(update(RecitalSession).where(*conditions).values(**updates))
+            session.commit()
+
+        if result.rowcount != 1:
+            return False
+
+        # Both are part of the cached session access
+        if "status" in updates or "disavowed" in updates:
+            self.session_access_cache.invalidate(recital_session_id)
+        return True
+
+
+class AsyncRecitalsRA:
+    """Async access to recital sessions - for use on the ingestion request paths."""
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]],
+        session_access_cache: SessionAccessCache,
+    ) -> None:
+        self.session_factory = session_factory
+        self.session_access_cache = session_access_cache
+
+    # More secure - to be used for authenticated API calls
+    async def get_by_id_and_user_id(self, recital_session_id: str, user_id: str) -> RecitalSession | None:
+        async with self.session_factory() as session:
+            results = await session.exec(
+                select(RecitalSession).filter(
+                    RecitalSession.id == recital_session_id, RecitalSession.user_id == user_id
+                )
+            )
+            return results.first()
+
+    # Cached ownership and status - for authorizing each ingested segment
+    async def get_session_access(self, recital_session_id: str, user_id: str) -> SessionAccess | None:
+        session_access = self.session_access_cache.get_access(recital_session_id, user_id)
+        if session_access is not None:
+            return session_access
+
+        async with self.session_factory() as session:
+            results = await session.exec(
+                select(
+                    RecitalSession.id, RecitalSession.user_id, RecitalSession.status, RecitalSession.disavowed
+                ).filter(RecitalSession.id == recital_session_id, RecitalSession.user_id == user_id)
+            )
+            row = results.first()
+
+        if row is None:
+            return None
+
+        session_access = SessionAccess(id=row.id, user_id=row.user_id, status=row.status, disavowed=row.disavowed)
+        self.session_access_cache.set_access(session_access)
+        return session_access
+
+    async def upsert(self, recital_session: RecitalSession) -> RecitalSession:
+        async with self.session_factory() as session:
+            await session.merge(recital_session)
+            await session.commit()
+            self.session_access_cache.invalidate(recital_session.id)
+            return recital_session
+
+    async def add_text_segment(self, recital_text_segment: RecitalTextSegment):
+        async with self.session_factory() as session:
+            session.add(recital_text_segment)
+            await session.commit()
+            await session.refresh(recital_text_segment)
+
+    async def add_text_segments(self, recital_text_segments: list[RecitalTextSegment]):
+        # A single multi-row INSERT in a single transaction
+        async with self.session_factory() as session:
+            await session.exec(insert(RecitalTextSegment).values([seg.model_dump() for seg in recital_text_segments]))
+            await session.commit()
+
+    async def get_audio_segment(self, recital_session_id: str, sequential: int) -> RecitalAudioSegment | None:
+        async with self.session_factory() as session:
+            results = await session.exec(
+                select(RecitalAudioSegment).filter(
+                    RecitalAudioSegment.recital_session_id == recital_session_id,
+                    RecitalAudioSegment.sequential == sequential,
+                )
+            )
+            return results.first()
+
+    async def add_audio_segment(self, recital_audio_segment: RecitalAudioSegment):
+        async with self.session_factory() as session:
+            session.add(recital_audio_segment)
+            await session.commit()
+            await session.refresh(recital_audio_segment)
+
+    async def delete_audio_segment(self, recital_session_id: str, sequential: int) -> None:
+        async with self.session_factory() as session:
+            await session.exec(
+                delete(RecitalAudioSegment).filter(
+                    RecitalAudioSegment.recital_session_id == recital_session_id,
+                    RecitalAudioSegment.sequential == sequential,
+                )
+            )
+            await session.commit()
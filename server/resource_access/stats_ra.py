@@ -1,14 +1,14 @@
-from contextlib import AbstractContextManager
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
 from datetime import datetime
 from typing import Callable
 
-from dependency_injector.wiring import Provide
 from pydantic import BaseModel
-from sqlmodel import Numeric, Session, cast, desc, func, select
+from sqlmodel import Numeric, Session, cast, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.recital_session import RecitalSession, SessionStatus
 from models.user import User
-from utility.cache.stats import CacheKeys, region
+from utility.cache.stats import CacheKeys, async_cache_on_arguments, region
 
 
 class UserLeaderBoard(BaseModel):
@@ -30,6 +30,88 @@ class TotalStats(BaseModel):
     total_recordings: int
 
 
+def _user_session_totals_cte():
+    return (
+        select(
+            RecitalSession.user_id,
+            cast(func.sum(RecitalSession.duration).label("total_duration"), Numeric),
+            func.count(RecitalSession.id).label("total_recordings"),
+        )
+        .filter(RecitalSession.status == SessionStatus.UPLOADED)
+        .group_by(RecitalSession.user_id)
+        .cte(name="user_session_totals")
+    )
+
+
+def _user_stats_query(user_id: str):
+    user_session_totals = _user_session_totals_cte()
+
+    user_session_totals_with_ranks = (
+        select(
+            user_session_totals.c.user_id,
+            user_session_totals.c.total_duration,
+            user_session_totals.c.total_recordings,
+            func.dense_rank().over(order_by=user_session_totals.c.total_duration.desc()).label("global_rank"),
+            func.lag(user_session_totals.c.total_duration)
+            .over(order_by=user_session_totals.c.total_duration.desc())
+            .label("next_higher_duration"),
+        )
+        .select_from(user_session_totals)
+        .cte(name="user_session_totals_with_ranks")
+    )
+
+    return select(
+        user_session_totals_with_ranks.c.global_rank,
+        user_session_totals_with_ranks.c.total_duration,
+        user_session_totals_with_ranks.c.total_recordings,
+        user_session_totals_with_ranks.c.next_higher_duration,
+    ).filter(user_session_totals_with_ranks.c.user_id == user_id)
+
+
+def _user_stats_from_row(user_stats) -> UserStats:
+    if not user_stats:
+        return UserStats(global_rank=0, total_duration=0, total_recordings=0, next_higher_duration=0)
+
+    return UserStats(
+        global_rank=user_stats.global_rank,
+        total_duration=user_stats.total_duration,
+        total_recordings=user_stats.total_recordings,
+        next_higher_duration=user_stats.next_higher_duration,
+    )
+
+
+def _leader_board_query(top: int):
+    user_session_totals = _user_session_totals_cte()
+    return (
+        select(
+            User.name,
+            User.created_at,
+            user_session_totals.c.total_duration,
+            user_session_totals.c.total_recordings,
+        )
+        .join(User)
+        .order_by(user_session_totals.c.total_duration.desc())
+        .limit(top)
+    )
+
+
+def _totals_query():
+    return select(
+        cast(func.sum(RecitalSession.duration).label("total_duration"), Numeric),
+        func.count(RecitalSession.id).label("total_recordings"),
+    ).filter(RecitalSession.status == SessionStatus.UPLOADED)
+
+
+def _total_stats_from_row(totals) -> TotalStats:
+    if totals is not None:
+        return TotalStats(
+            total_duration=totals.total_duration,
+            total_recordings=totals.total_recordings,
+        )
+    else:
+        return TotalStats(total_duration=0, total_recordings=0)
+
+
 class StatsRA:
     def __init__(
         self,
@@ -40,98 +122,45 @@ class StatsRA:
     @region.cache_on_arguments(namespace={"key_range": CacheKeys.user_stats}, expiration_time=60 * 1)
     def user_stats(self, user_id: str):
         with self.session_factory() as session:
-
-            user_session_totals = (
-                select(
-                    RecitalSession.user_id,
-                    cast(func.sum(RecitalSession.duration).label("total_duration"), Numeric),
-                    func.count(RecitalSession.id).label("total_recordings"),
-                )
-                .filter(RecitalSession.status == SessionStatus.UPLOADED)
-                .group_by(RecitalSession.user_id)
-                .cte(name="user_session_totals")
-            )
-
-            user_session_totals_with_ranks = (
-                select(
-                    user_session_totals.c.user_id,
-                    user_session_totals.c.total_duration,
-                    user_session_totals.c.total_recordings,
-                    func.dense_rank().over(order_by=user_session_totals.c.total_duration.desc()).label("global_rank"),
-                    func.lag(user_session_totals.c.total_duration)
-                    .over(order_by=user_session_totals.c.total_duration.desc())
-                    .label("next_higher_duration"),
-                )
-                .select_from(user_session_totals)
-                .cte(name="user_session_totals_with_ranks")
-            )
-
-            this_user_total = select(
-                user_session_totals_with_ranks.c.global_rank,
-                user_session_totals_with_ranks.c.total_duration,
-                user_session_totals_with_ranks.c.total_recordings,
-                user_session_totals_with_ranks.c.next_higher_duration,
-            ).filter(user_session_totals_with_ranks.c.user_id == user_id)
-
-            results = session.exec(this_user_total)
-            user_stats = results.one_or_none()
-
-            if not user_stats:
-                return UserStats(global_rank=0, total_duration=0, total_recordings=0, next_higher_duration=0)
-
-            return UserStats(
-                global_rank=user_stats.global_rank,
-                total_duration=user_stats.total_duration,
-                total_recordings=user_stats.total_recordings,
-                next_higher_duration=user_stats.next_higher_duration,
-            )
+            results = session.exec(_user_stats_query(user_id))
+            return _user_stats_from_row(results.one_or_none())
 
     @region.cache_on_arguments(namespace={"fixed_key": CacheKeys.leaderboard}, expiration_time=60 * 1)
     def leader_board(self, top: int = 10) -> list[UserLeaderBoard]:
         with self.session_factory() as session:
-
-            user_session_totals = (
-                select(
-                    RecitalSession.user_id,
-                    cast(func.sum(RecitalSession.duration).label("total_duration"), Numeric),
-                    func.count(RecitalSession.id).label("total_recordings"),
-                )
-                .filter(RecitalSession.status == SessionStatus.UPLOADED)
-                .group_by(RecitalSession.user_id)
-                .cte(name="user_session_totals")
-            )
-            leader_board_selectable = (
-                select(
-                    User.name,
-                    User.created_at,
-                    user_session_totals.c.total_duration,
-                    user_session_totals.c.total_recordings,
-                )
-                .join(User)
-                .order_by(user_session_totals.c.total_duration.desc())
-                .limit(top)
-            )
-
-            results = session.exec(leader_board_selectable)
-
+            results = session.exec(_leader_board_query(top))
             return results.all()
 
     @region.cache_on_arguments(namespace={"fixed_key": CacheKeys.totals}, expiration_time=60 * 10)
     def totals(self) -> TotalStats:
         with self.session_factory() as session:
+            results = session.exec(_totals_query())
+            return _total_stats_from_row(results.one_or_none())
+
+
+class AsyncStatsRA:
+    """Async version of StatsRA - shares the cache region (and its invalidation) with it."""
+
+    def __init__(
+        self,
+        session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]],
+    ) -> None:
+        self.session_factory = session_factory
+
+    @async_cache_on_arguments(namespace={"key_range": CacheKeys.user_stats}, expiration_time=60 * 1)
+    async def user_stats(self, user_id: str):
+        async with self.session_factory() as session:
+            results = await session.exec(_user_stats_query(user_id))
+            return _user_stats_from_row(results.one_or_none())
+
+    @async_cache_on_arguments(namespace={"fixed_key": CacheKeys.leaderboard}, expiration_time=60 * 1)
+    async def leader_board(self, top: int = 10) -> list[UserLeaderBoard]:
+        async with self.session_factory() as session:
+            results = await session.exec(_leader_board_query(top))
+            return results.all()
 
-            system_totals = select(
-                cast(func.sum(RecitalSession.duration).label("total_duration"), Numeric),
-                func.count(RecitalSession.id).label("total_recordings"),
-            ).filter(RecitalSession.status == SessionStatus.UPLOADED)
-
-            results = session.exec(system_totals)
-            totals = results.one_or_none()
-
-            if totals is not None:
-                return TotalStats(
-                    total_duration=totals.total_duration,
-                    total_recordings=totals.total_recordings,
-                )
-            else:
-                return TotalStats(total_duration=0, total_recordings=0)
+    @async_cache_on_arguments(namespace={"fixed_key": CacheKeys.totals}, expiration_time=60 * 10)
+    async def totals(self) -> TotalStats:
+        async with self.session_factory() as session:
+            results = await session.exec(_totals_query())
+            return _total_stats_from_row(results.one_or_none())
@@ -1,16 +1,19 @@
-from contextlib import AbstractContextManager
+from contextlib import AbstractAsyncContextManager, AbstractContextManager
 from typing import Callable, Iterator
 
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.user import User
 from models.user_metadata import UserMetadata, UserMetadataUpdate
+from utility.cache.users import UserCache
 
 
 class UsersRA:
 
-    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]]) -> None:
+    def __init__(self, session_factory: Callable[..., AbstractContextManager[Session]], user_cache: UserCache) -> None:
         self.session_factory = session_factory
+        self.user_cache = user_cache
 
     def get_all(self) -> Iterator[User]:
         with self.session_factory() as session:
@@ -30,6 +33,7 @@ class UsersRA:
         with self.session_factory() as session:
             session.merge(user)
             session.commit()
+            self.user_cache.invalidate_user(user.id, user.email)
             return user
 
     def get_profile_by_id(self, id: str) -> UserMetadata:
@@ -47,3 +51,39 @@ class UsersRA:
             session.merge(updated)
             session.commit()
             return updated
+
+
+class AsyncUsersRA:
+    """Async user lookups for authenticating requests - served from the user cache when possible."""
+
+    def __init__(
+        self, session_factory: Callable[..., AbstractAsyncContextManager[AsyncSession]], user_cache: UserCache
+    ) -> None:
+        self.session_factory = session_factory
+        self.user_cache = user_cache
+
+    async def get_by_id(self, id: str) -> User:
+        user = self.user_cache.get_by_id(id)
+        if user is not None:
+            return user
+
+        async with self.session_factory() as session:
+            results = await session.exec(select(User).filter(User.id == id))
+            user = results.first()
+
+        if user is not None:
+            self.user_cache.set_user(user)
+        return user
+
+    async def get_by_email(self, email: str) -> User:
+        user = self.user_cache.get_by_email(email)
+        if user is not None:
+            return user
+
+        async with self.session_factory() as session:
+            results = await session.exec(select(User).filter(User.email == email))
+            user = results.first()
+
+        if user is not None:
+            self.user_cache.set_user(user)
+        return user
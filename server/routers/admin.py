@@ -1,21 +1,27 @@
-from typing import Container
+from typing import Annotated, Callable, Container, Optional
 
 from anyio import Path
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, HTTPException, Path
+from fastapi import APIRouter, Depends, HTTPException, Path, Query
 from fastcrud import FilterConfig, crud_router
 from pydantic import BaseModel
 
 from containers import Container
+from engines.disk_pressure_engine import DiskPressureEngine
+from engines.session_duration_engine import SessionDurationEngine
+from errors import MissingSessionError
 from managers.recital_manager import RecitalManager
 from models.database import get_async_session
 from models.user import User, UserCreate, UserUpdate
 from resource_access.recitals_content_ra import RecitalsContentRA
 from resource_access.recitals_ra import RecitalsRA
+from utility.cache.presigned_urls import PresignedUrlCache
+from utility.cache.sessions import SessionAccessCache
+from utility.cache.users import UserCache
 
 from .dependencies.analytics import Tracker
-from .dependencies.users import get_admin_user
-from .types import SessionPreview
+from .dependencies.users import get_admin_user, invalidate_cached_user_after_update
+from .types import SessionPreview, max_session_previews_per_batch
 
 router = APIRouter(dependencies=[Depends(get_admin_user)], tags=["admin"])
 
@@ -36,11 +42,12 @@ user_router = crud_router(
     include_in_schema=True,
     create_schema=UserCreate,
     update_schema=UserUpdate,
-    updated_at_column=None,
+    updated_at_column="updated_at",
     path="/users",
     included_methods=["create", "read", "read_multi", "update"],
     filter_config=users_filer_config,
     endpoint_names=custom_endpoint_names,
+    update_deps=[invalidate_cached_user_after_update],
 )
 
 
@@ -49,6 +56,32 @@ user_router = crud_router(
 sessions_router = APIRouter(prefix="/sessions")
 
 
+@sessions_router.get("/previews", response_model=list[SessionPreview])
+@inject
+def get_session_previews(
+    track_event: Tracker,
+    ids: Annotated[
+        list[str], Query(title="Session ids to preview", min_length=1, max_length=max_session_previews_per_batch)
+    ],
+    recitals_ra: RecitalsRA = Depends(Provide[Container.recitals_ra]),
+    recitals_content_ra: RecitalsContentRA = Depends(Provide[Container.recitals_content_ra]),
+) -> list[SessionPreview]:
+    recital_sessions = recitals_ra.get_by_ids(ids)
+    previews = [
+        SessionPreview(
+            id=recital_session.id,
+            audio_url=recitals_content_ra.get_url_to_light_audio(recital_session.id),
+            transcript_url=recitals_content_ra.get_url_to_transcript(recital_session.id, recital_session.text_filename),
+            audio_duration=recital_session.audio_duration,
+        )
+        for session_id in dict.fromkeys(ids)
+        if (recital_session := recital_sessions.get(session_id))
+    ]
+
+    track_event("Session Previews Generated", {"sessions_count": len(previews)})
+    return previews
+
+
 @sessions_router.get("/{session_id}/preview", response_model=SessionPreview)
 @inject
 def get_session_preview(
@@ -65,50 +98,96 @@ def get_session_preview(
     return SessionPreview(
         id=recital_session.id,
         audio_url=recitals_content_ra.get_url_to_light_audio(recital_session.id),
-        transcript_url=recitals_content_ra.get_url_to_transcript(recital_session.id),
+        transcript_url=recitals_content_ra.get_url_to_transcript(recital_session.id, recital_session.text_filename),
+        audio_duration=recital_session.audio_duration,
     )
 
 
-@sessions_router.post("/aggregate")
+@sessions_router.post("/{session_id}/requeue")
+@inject
+def requeue_failed_session(
+    track_event: Tracker,
+    session_id: str = Path(...),
+    recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
+) -> None:
+    try:
+        requeued = recital_manager.requeue_failed_session(session_id)
+    except MissingSessionError:
+        raise HTTPException(status_code=404, detail="Recital session not found")
+
+    if not requeued:
+        raise HTTPException(status_code=409, detail="Recital session did not fail finalization")
+
+    track_event("Failed Session Requeued", {"session_id": session_id})
+
+
+def trigger_session_finalization(recital_manager: RecitalManager, step: Optional[Callable[[], None]] = None) -> None:
+    # Runs in the background - a finalization run may take longer than a request should
+    if not recital_manager.trigger_session_finalization(step):
+        raise HTTPException(status_code=409, detail="Session finalization does not run on this server")
+
+
+@sessions_router.post("/aggregate", status_code=202)
 @inject
 def aggregate_sessions(
     track_event: Tracker,
     recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
 ) -> None:
     track_event("Session Aggregation Invoked")
-    recital_manager.aggregate_ended_sessions()
+    trigger_session_finalization(recital_manager, recital_manager.aggregate_ended_sessions)
 
 
-@sessions_router.post("/upload")
+@sessions_router.post("/upload", status_code=202)
 @inject
 def upload_sessions(
     track_event: Tracker,
     recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
 ) -> None:
     track_event("Session Upload Invoked")
-    recital_manager.upload_aggregated_sessions()
+    trigger_session_finalization(recital_manager, recital_manager.upload_aggregated_sessions)
 
 
-@sessions_router.post("/discard")
+@sessions_router.post("/discard", status_code=202)
 @inject
 def discard_sessions(
     track_event: Tracker,
     recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
 ) -> None:
     track_event("Session Discard Invoked")
-    recital_manager.discard_disavowed_sessions()
+    trigger_session_finalization(recital_manager, recital_manager.discard_disavowed_sessions)
 
 
-@sessions_router.post("/finalize")
+@sessions_router.post("/finalize", status_code=202)
 @inject
 def aggregate_and_upload_sessions(
     track_event: Tracker,
     recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
 ) -> None:
     track_event("Session Finalization Triggered Invoked")
-    recital_manager.aggregate_ended_sessions()
-    recital_manager.upload_aggregated_sessions()
-    recital_manager.discard_disavowed_sessions()
+    trigger_session_finalization(recital_manager)
+
+
+## Metrics
+
+
+@router.get("/metrics")
+@inject
+def get_metrics(
+    user_cache: UserCache = Depends(Provide[Container.user_cache]),
+    session_access_cache: SessionAccessCache = Depends(Provide[Container.session_access_cache]),
+    presigned_url_cache: PresignedUrlCache = Depends(Provide[Container.presigned_url_cache]),
+    session_duration_engine: SessionDurationEngine = Depends(Provide[Container.session_duration_engine]),
+    disk_pressure_engine: DiskPressureEngine = Depends(Provide[Container.disk_pressure_engine]),
+):
+    return {
+        "caches": {
+            "users": user_cache.stats(),
+            "session_access": session_access_cache.stats(),
+            "presigned_urls": presigned_url_cache.stats(),
+        },
+        "session_durations": session_duration_engine.stats(),
+        "disk": disk_pressure_engine.stats(),
+    }
 
 
 router.include_router(user_router)
@@ -9,7 +9,7 @@ from posthog import Posthog
 from containers import Container
 from models.user import User
 
-from .users import get_valid_user
+from .users import get_valid_user, get_websocket_speaker_user
 
 
 @inject
@@ -30,6 +30,20 @@ def get_tracker(
     return track_event
 
 
+@inject
+def get_websocket_tracker(
+    speaker_user: Annotated[User, Depends(get_websocket_speaker_user)],
+    posthog: Posthog = Depends(Provide[Container.posthog]),
+):
+    capture_sig = signature(posthog.capture)
+
+    def track_event(event, *args, **kwargs):
+        capture_args = capture_sig.bind(speaker_user.id, event, *args, **kwargs)
+        posthog.capture(*capture_args.args, **capture_args.kwargs)
+
+    return track_event
+
+
 @inject
 def get_anon_tracker(posthog: Posthog = Depends(Provide[Container.posthog])):
     capture_sig = signature(posthog.capture)
@@ -47,4 +61,5 @@ def get_anon_tracker(posthog: Posthog = Depends(Provide[Container.posthog])):
 
 RawTracker = Annotated[Callable[[str, str, Optional[Dict[str, Any]]], None], Depends(get_raw_tracker)]
 Tracker = Annotated[Callable[[str, Optional[Dict[str, Any]]], None], Depends(get_tracker)]
+WebSocketTracker = Annotated[Callable[[str, Optional[Dict[str, Any]]], None], Depends(get_websocket_tracker)]
 AnonTracker = Annotated[Callable[[str, Optional[Dict[str, Any]]], None], Depends(get_anon_tracker)]
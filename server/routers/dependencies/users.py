@@ -2,7 +2,7 @@ from typing import Annotated
 from uuid import UUID
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import Cookie, Depends, HTTPException, Header, Response, status
+from fastapi import Cookie, Depends, HTTPException, Header, Response, WebSocket, WebSocketException, status
 from fastapi.security import APIKeyCookie, HTTPAuthorizationCredentials, HTTPBearer, APIKeyHeader
 from jwt.exceptions import InvalidTokenError
 from nanoid import generate
@@ -10,12 +10,13 @@ from pydantic import BaseModel
 
 from containers import Container
 from models.user import User, UserGroups
-from resource_access.users_ra import UsersRA
+from resource_access.users_ra import AsyncUsersRA
 from utility.authentication.invites import validate_invite_value
 from utility.authentication.users import (
     decode_access_token,
     get_access_token_expire_minutes,
 )
+from utility.cache.users import UserCache
 
 AUTH_COOKIE_NAME = "access_token"
 
@@ -95,16 +96,16 @@ async def get_valid_user(
     delegated_user_email: Annotated[str, Depends(get_delegated_user_email)],
     google_client_id: str = Depends(Provide[Container.config.auth.google.client_id]),
     dev_auto_login_user_email: str = Depends(Provide[Container.config.auth.dev_auto_login_user_email]),
-    users_ra: UsersRA = Depends(Provide[Container.users_ra]),
+    async_users_ra: AsyncUsersRA = Depends(Provide[Container.async_users_ra]),
 ):
     user: User = None
     if authenticated_user_id:
-        user = users_ra.get_by_id(authenticated_user_id)
+        user = await async_users_ra.get_by_id(authenticated_user_id)
     elif delegated_user_email:
-        user = users_ra.get_by_email(delegated_user_email)
+        user = await async_users_ra.get_by_email(delegated_user_email)
     elif dev_auto_login_user_email:
         print(f"WARNING: Using DEV_AUTO_LOGIN_USER_EMAIL for development - auto-logging in user: {dev_auto_login_user_email}")
-        user = users_ra.get_by_email(dev_auto_login_user_email)
+        user = await async_users_ra.get_by_email(dev_auto_login_user_email)
         if not user:
             print(f"ERROR: DEV_AUTO_LOGIN_USER_EMAIL not found in DB - auto-logging in user: {dev_auto_login_user_email}")
     else:  # Not authenticated
@@ -126,6 +127,17 @@ async def get_valid_user(
     return user
 
 
+@inject
+def get_user_cache(user_cache: UserCache = Depends(Provide[Container.user_cache])) -> UserCache:
+    return user_cache
+
+
+def invalidate_cached_user_after_update(id: UUID, user_cache: Annotated[UserCache, Depends(get_user_cache)]):
+    yield
+    # The update was committed by now - group changes should apply on the next request
+    user_cache.invalidate_user(id)
+
+
 def has_admin_permission(user: User):
     return user.group == UserGroups.ADMIN
 
@@ -154,6 +166,36 @@ async def get_speaker_user(user: Annotated[User, Depends(get_valid_user)]):
     return user
 
 
+@inject
+async def get_websocket_speaker_user(
+    websocket: WebSocket,
+    dev_auto_login_user_email: str = Depends(Provide[Container.config.auth.dev_auto_login_user_email]),
+    async_users_ra: AsyncUsersRA = Depends(Provide[Container.async_users_ra]),
+) -> User:
+    # Authenticated once during the handshake - browsers send the auth cookie, other clients may use a bearer token
+    credentials = websocket.cookies.get(AUTH_COOKIE_NAME)
+    scheme, _, bearer_credentials = websocket.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and bearer_credentials:
+        credentials = bearer_credentials
+
+    user: User = None
+    if credentials:
+        try:
+            authenticated_user_id = decode_access_token(credentials).get("sub")
+            if authenticated_user_id:
+                user = await async_users_ra.get_by_id(authenticated_user_id)
+        except InvalidTokenError:
+            pass
+    elif dev_auto_login_user_email:
+        user = await async_users_ra.get_by_email(dev_auto_login_user_email)
+
+    if not user:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Not authenticated")
+    if not has_speaker_permission(user):
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="User is not an authorized speaker")
+    return user
+
+
 async def get_admin_user(user: Annotated[User, Depends(get_valid_user)]):
     if not has_admin_permission(user):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="User is not an authorized admin")
@@ -1,21 +1,45 @@
-import pathlib
+import asyncio
+import json
 import re
-from mimetypes import guess_extension
-from typing import Annotated, Optional
+import struct
+from typing import Annotated, AsyncIterator, Optional
 from uuid import UUID
 
 from dependency_injector.wiring import Provide, inject
-from fastapi import APIRouter, Depends, File, Path, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    File,
+    Header,
+    Path,
+    Query,
+    Request,
+    UploadFile,
+    WebSocket,
+    WebSocketException,
+    status,
+)
 from fastapi.exceptions import HTTPException
 from fastcrud import FastCRUD, FilterConfig, JoinConfig
 from nanoid import generate
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 
 from containers import Container
-from errors import MissingSessionError
-from managers.recital_manager import RecitalManager, TextSegmentRequestBody
+from errors import (
+    AudioSegmentChecksumMismatchError,
+    AudioSegmentConflictError,
+    AudioSegmentTooLargeError,
+    MissingSessionError,
+    SessionNotActiveError,
+    StorageFullError,
+)
+from engines.disk_pressure_engine import DiskPressureEngine
+from managers.recital_manager import (
+    RecitalManager,
+    TextSegmentRequestBody,
+    TextSegmentsBatchRequestBody,
+)
 from models.database import get_async_session
-from models.recital_audio_segment import RecitalAudioSegment
 from models.recital_session import (
     RecitalSession,
     RecitalSessionRead,
@@ -24,16 +48,24 @@ from models.recital_session import (
 )
 from models.text_document import TextDocument
 from resource_access.recitals_content_ra import RecitalsContentRA
-from resource_access.recitals_ra import RecitalsRA
+from resource_access.recitals_ra import AsyncRecitalsRA, RecitalsRA
 
 from .crud.utils import create_dynamic_filters_dep, gen_get_multi, gen_get_single
-from .dependencies.analytics import Tracker
-from .dependencies.users import User, get_speaker_user
-from .types import SessionPreview
+from .dependencies.analytics import Tracker, WebSocketTracker
+from .dependencies.users import User, get_speaker_user, get_websocket_speaker_user
+from .types import SessionPreview, max_session_previews_per_batch
 
 router = APIRouter()
 
 
+def storage_full_http_exception(error: StorageFullError) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Server storage is full - try again later",
+        headers={"Retry-After": str(error.retry_after_sec)},
+    )
+
+
 class NewRecitalSessionRequestBody(BaseModel):
     document_id: Optional[UUID]
 
@@ -47,14 +79,21 @@ async def new_recital_session(
     track_event: Tracker,
     speaker_user: Annotated[User, Depends(get_speaker_user)],
     new_session_request: NewRecitalSessionRequestBody,
-    recitals_ra: RecitalsRA = Depends(Provide[Container.recitals_ra]),
+    async_recitals_ra: AsyncRecitalsRA = Depends(Provide[Container.async_recitals_ra]),
+    disk_pressure_engine: DiskPressureEngine = Depends(Provide[Container.disk_pressure_engine]),
 ):
+    # No new recordings while there is no room to store them
+    try:
+        disk_pressure_engine.ensure_capacity()
+    except StorageFullError as e:
+        raise storage_full_http_exception(e)
+
     recital_session = RecitalSession(
         id=generate(alphabet=recital_ids_alphabet),
         user_id=speaker_user.id,
         document_id=new_session_request.document_id,
     )
-    recitals_ra.upsert(recital_session)
+    await async_recitals_ra.upsert(recital_session)
 
     track_event(
         "Recital Session Created",
@@ -128,7 +167,7 @@ async def upload_text_segment(
     recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
 ):
     try:
-        recital_manager.add_text_segment(session_id, speaker_user, segment)
+        await recital_manager.add_text_segment(session_id, speaker_user, segment)
     except MissingSessionError:
         raise HTTPException(status_code=404, detail="Recital session not found")
 
@@ -143,6 +182,33 @@ async def upload_text_segment(
     return {"message": "Text segment uploaded successfully"}
 
 
+# Batched upload - lets clients flush queued segments in a single request
+@router.post("/{session_id}/upload-text-segments")
+@inject
+async def upload_text_segments(
+    track_event: Tracker,
+    session_id: Annotated[str, Path(title="Session id of the transcript")],
+    batch: TextSegmentsBatchRequestBody,
+    speaker_user: Annotated[User, Depends(get_speaker_user)],
+    recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
+):
+    try:
+        await recital_manager.add_text_segments(session_id, speaker_user, batch.segments)
+    except MissingSessionError:
+        raise HTTPException(status_code=404, detail="Recital session not found")
+
+    track_event(
+        "Text Segments Batch Uploaded",
+        {
+            "session_id": session_id,
+            "segments_count": len(batch.segments),
+            "seek_end": str(batch.segments[-1].seek_end),
+            "text_length": sum(len(segment.text) for segment in batch.segments),
+        },
+    )
+    return {"message": "Text segments uploaded successfully"}
+
+
 def parse_mime_type(mime_type: str):
     # Regular expression to extract key-value pairs from the mime type
     pattern = re.compile(r"(\w+)=([\w.]+)")
@@ -150,41 +216,60 @@ def parse_mime_type(mime_type: str):
     return params
 
 
-@router.post("/{session_id}/upload-audio-segment/{segment_id}")
-@inject
-async def upload_audio_segment(
-    track_event: Tracker,
-    session_id: Annotated[str, Path(title="Session id of the audio segment")],
-    segment_id: Annotated[str, Path(title="Id of the audio segment")],
-    speaker_user: Annotated[User, Depends(get_speaker_user)],
-    audio_data: UploadFile = File(...),
-    recitals_ra: RecitalsRA = Depends(Provide[Container.recitals_ra]),
-    recitals_content_ra: RecitalsContentRA = Depends(Provide[Container.recitals_content_ra]),
-):
-    recital_session = recitals_ra.get_by_id_and_user_id(session_id, speaker_user.id)
-    if not recital_session or recital_session.disavowed:
-        raise HTTPException(status_code=404, detail="Recital session not found")
+audio_segment_read_chunk_size = 64 * 1024
+
+audio_segment_errors = {
+    MissingSessionError: (404, "Recital session not found"),
+    AudioSegmentTooLargeError: (413, "Audio segment too large"),
+    AudioSegmentConflictError: (409, "Audio segment already uploaded with different content"),
+    AudioSegmentChecksumMismatchError: (400, "Audio segment content does not match its checksum"),
+    SessionNotActiveError: (409, "Recital session no longer accepts audio"),
+    StorageFullError: (503, "Server storage is full - try again later"),
+}
+
+
+def get_audio_segment_error(error: Exception) -> tuple[int, str]:
+    # Subclasses are answered like the error they specialize
+    for error_type in type(error).__mro__:
+        if error_type in audio_segment_errors:
+            return audio_segment_errors[error_type]
+    raise error
 
-    # Read the MIME type
-    mime_type = audio_data.content_type
 
-    # write the file to disk
-    file_extension = guess_extension(mime_type.split(";")[0]) or ".bin"
-    file_name = f"{session_id}{file_extension}.seg.{segment_id}"
-    with open(str(pathlib.Path(recitals_content_ra.get_data_folder(), file_name)), "wb") as buffer:
-        buffer.write(await audio_data.read())
+async def iter_upload_file_chunks(upload_file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await upload_file.read(audio_segment_read_chunk_size):
+        yield chunk
 
-    # Byte Size of the uploaded audio file
-    audio_data_length = audio_data.size
 
-    recitals_ra.add_audio_segment(
-        RecitalAudioSegment(
-            filename=file_name,
-            mime_type=mime_type,
-            recital_session=recital_session,
-            sequential=segment_id,
+async def store_audio_segment(
+    track_event: Tracker,
+    session_id: str,
+    segment_id: int,
+    speaker_user: User,
+    mime_type: str,
+    chunks: AsyncIterator[bytes],
+    max_segment_size_bytes: int,
+    recital_manager: RecitalManager,
+    declared_content_hash: Optional[str] = None,
+):
+    try:
+        result = await recital_manager.store_audio_segment(
+            session_id,
+            speaker_user,
+            segment_id,
+            mime_type,
+            chunks,
+            max_segment_size_bytes,
+            declared_content_hash=declared_content_hash,
         )
-    )
+    except StorageFullError as e:
+        raise storage_full_http_exception(e)
+    except tuple(audio_segment_errors) as e:
+        status_code, detail = get_audio_segment_error(e)
+        raise HTTPException(status_code=status_code, detail=detail)
+
+    if not result.stored:
+        return {"message": "Audio segment already uploaded"}
 
     track_event(
         "Audio Segment Uploaded",
@@ -192,12 +277,317 @@ async def upload_audio_segment(
             "session_id": session_id,
             "audio_segment_id": segment_id,
             "mime_type": mime_type,
-            "size_bytes": audio_data_length,
+            "size_bytes": result.byte_size,
         },
     )
     return {"message": "Audio uploaded successfully"}
 
 
+# Multipart form upload - kept for older clients
+@router.post("/{session_id}/upload-audio-segment/{segment_id}")
+@inject
+async def upload_audio_segment(
+    track_event: Tracker,
+    session_id: Annotated[str, Path(title="Session id of the audio segment")],
+    segment_id: Annotated[int, Path(title="Id of the audio segment")],
+    speaker_user: Annotated[User, Depends(get_speaker_user)],
+    audio_data: UploadFile = File(...),
+    max_segment_size_mb: int = Depends(Provide[Container.config.data.max_audio_segment_size_mb]),
+    recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
+):
+    return await store_audio_segment(
+        track_event,
+        session_id,
+        segment_id,
+        speaker_user,
+        audio_data.content_type,
+        iter_upload_file_chunks(audio_data),
+        max_segment_size_mb * 1024 * 1024,
+        recital_manager,
+    )
+
+
+# Raw body upload - the segment is streamed to disk as it arrives
+@router.put("/{session_id}/upload-audio-segment/{segment_id}")
+@inject
+async def upload_audio_segment_raw(
+    request: Request,
+    track_event: Tracker,
+    session_id: Annotated[str, Path(title="Session id of the audio segment")],
+    segment_id: Annotated[int, Path(title="Id of the audio segment")],
+    speaker_user: Annotated[User, Depends(get_speaker_user)],
+    content_type: Annotated[str, Header()] = "application/octet-stream",
+    content_length: Annotated[Optional[int], Header()] = None,
+    x_content_sha256: Annotated[Optional[str], Header()] = None,
+    max_segment_size_mb: int = Depends(Provide[Container.config.data.max_audio_segment_size_mb]),
+    recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
+):
+    max_segment_size_bytes = max_segment_size_mb * 1024 * 1024
+    # Reject early when the client declares the size upfront
+    if content_length is not None and content_length > max_segment_size_bytes:
+        raise HTTPException(status_code=413, detail="Audio segment too large")
+
+    return await store_audio_segment(
+        track_event,
+        session_id,
+        segment_id,
+        speaker_user,
+        content_type,
+        request.stream(),
+        max_segment_size_bytes,
+        recital_manager,
+        declared_content_hash=x_content_sha256,
+    )
+
+
+# Received stream messages waiting to be stored - the socket is not read while this is full
+stream_ingestion_queue_size = 8
+# Binary stream frames start with the audio segment id
+stream_audio_frame_header = struct.Struct(">I")
+
+
+class StreamTextSegmentMessage(TextSegmentRequestBody):
+    # Echoed back on the acknowledgement
+    ref: Optional[int] = None
+
+
+async def iter_single_chunk(chunk: bytes) -> AsyncIterator[bytes]:
+    yield chunk
+
+
+async def send_stream_message(websocket: WebSocket, message: dict) -> bool:
+    try:
+        await websocket.send_json(message)
+        return True
+    except Exception:
+        # Client went away - whatever was received is still stored
+        return False
+
+
+async def store_stream_message(
+    websocket: WebSocket,
+    track_event: WebSocketTracker,
+    item: tuple,
+    session_id: str,
+    speaker_user: User,
+    mime_type: str,
+    max_segment_size_bytes: int,
+    recital_manager: RecitalManager,
+) -> None:
+    kind, payload = item
+    if kind == "error":
+        await send_stream_message(websocket, {"type": "error", "detail": payload})
+    elif kind == "audio":
+        segment_id, audio_data = payload
+        try:
+            result = await recital_manager.store_audio_segment(
+                session_id,
+                speaker_user,
+                segment_id,
+                mime_type,
+                iter_single_chunk(audio_data),
+                max_segment_size_bytes,
+            )
+        except tuple(audio_segment_errors) as e:
+            if isinstance(e, MissingSessionError):
+                raise
+            status_code, detail = get_audio_segment_error(e)
+            await send_stream_message(
+                websocket,
+                {"type": "error", "kind": "audio", "segment_id": segment_id, "status": status_code, "detail": detail},
+            )
+            return
+
+        if result.stored:
+            track_event(
+                "Audio Segment Uploaded",
+                {
+                    "session_id": session_id,
+                    "audio_segment_id": segment_id,
+                    "mime_type": mime_type,
+                    "size_bytes": result.byte_size,
+                    "channel": "stream",
+                },
+            )
+        await send_stream_message(
+            websocket, {"type": "ack", "kind": "audio", "segment_id": segment_id, "stored": result.stored}
+        )
+    elif kind == "text":
+        segment: StreamTextSegmentMessage = payload
+        await recital_manager.add_text_segment(session_id, speaker_user, segment)
+
+        track_event(
+            "Text Segment Uploaded",
+            {
+                "session_id": session_id,
+                "seek_end": str(segment.seek_end),
+                "text_length": len(segment.text),
+                "channel": "stream",
+            },
+        )
+        await send_stream_message(websocket, {"type": "ack", "kind": "text", "ref": segment.ref})
+
+
+async def close_stream(websocket: WebSocket, code: int, reason: str) -> None:
+    try:
+        await websocket.close(code=code, reason=reason)
+    except Exception:
+        # Client already went away
+        pass
+
+
+async def receive_stream_messages(websocket: WebSocket, queue: asyncio.Queue) -> None:
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                frame = message["bytes"]
+                if len(frame) < stream_audio_frame_header.size:
+                    item = ("error", "Audio frame is missing its segment id")
+                else:
+                    (segment_id,) = stream_audio_frame_header.unpack_from(frame)
+                    item = ("audio", (segment_id, frame[stream_audio_frame_header.size :]))
+            else:
+                try:
+                    item = ("text", StreamTextSegmentMessage.model_validate(json.loads(message["text"])))
+                except (ValueError, ValidationError):
+                    item = ("error", "Invalid text segment message")
+
+            # Waits while the writer is behind - applies backpressure onto the client
+            await queue.put(item)
+    except Exception as e:
+        print(f"Error receiving stream: {e}")
+
+    # Whatever was received is still stored after the client goes away
+    await queue.put(None)
+
+
+async def store_stream_messages(
+    websocket: WebSocket,
+    queue: asyncio.Queue,
+    track_event: WebSocketTracker,
+    session_id: str,
+    speaker_user: User,
+    mime_type: str,
+    max_segment_size_bytes: int,
+    recital_manager: RecitalManager,
+) -> None:
+    """Stores the received messages in order until the reader is done.
+
+    Returns early - closing the stream - when the session goes missing or a message fails to store.
+    """
+    while (item := await queue.get()) is not None:
+        try:
+            await store_stream_message(
+                websocket,
+                track_event,
+                item,
+                session_id,
+                speaker_user,
+                mime_type,
+                max_segment_size_bytes,
+                recital_manager,
+            )
+        except MissingSessionError:
+            # Disavowed mid stream - nothing more is stored
+            await send_stream_message(
+                websocket, {"type": "error", "status": 404, "detail": "Recital session not found"}
+            )
+            await close_stream(websocket, status.WS_1008_POLICY_VIOLATION, "Recital session not found")
+            return
+        except Exception as e:
+            print(f"Error storing stream message for session {session_id}: {e}")
+            await send_stream_message(websocket, {"type": "error", "status": 500, "detail": "Failed storing message"})
+            await close_stream(websocket, status.WS_1011_INTERNAL_ERROR, "Failed storing message")
+            return
+
+
+@router.websocket("/{session_id}/stream")
+@inject
+async def stream_recital_session(
+    websocket: WebSocket,
+    track_event: WebSocketTracker,
+    session_id: Annotated[str, Path(title="Session id of the stream")],
+    speaker_user: Annotated[User, Depends(get_websocket_speaker_user)],
+    mime_type: Annotated[str, Query(title="Mime type of the streamed audio")] = "application/octet-stream",
+    max_segment_size_mb: int = Depends(Provide[Container.config.data.max_audio_segment_size_mb]),
+    async_recitals_ra: AsyncRecitalsRA = Depends(Provide[Container.async_recitals_ra]),
+    recital_manager: RecitalManager = Depends(Provide[Container.recital_manager]),
+):
+    """Streaming ingestion of a recital session over a single authenticated connection.
+
+    Binary frames carry an audio segment - a 4 byte big endian segment id followed by the audio data.
+    Text frames carry a JSON text segment - {"seek_end": float, "text": str, "ref": optional int}.
+    Each message is answered in order with a JSON message of type "ack" or "error".
+    The stream is closed with 1008 once the session goes missing and with 1011 when a message fails to store.
+    The REST upload endpoints remain available as a fallback.
+    """
+    session_access = await async_recitals_ra.get_session_access(session_id, speaker_user.id)
+    if not session_access or session_access.disavowed:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION, reason="Recital session not found")
+
+    await websocket.accept()
+
+    queue = asyncio.Queue(maxsize=stream_ingestion_queue_size)
+    reader = asyncio.create_task(receive_stream_messages(websocket, queue))
+    try:
+        await store_stream_messages(
+            websocket,
+            queue,
+            track_event,
+            session_id,
+            speaker_user,
+            mime_type,
+            max_segment_size_mb * 1024 * 1024,
+            recital_manager,
+        )
+    finally:
+        # Done when the reader is - unless the writer stopped first, leaving the reader blocked on the client
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+
+
+@router.get("/previews", response_model=list[SessionPreview])
+@inject
+def get_session_previews(
+    track_event: Tracker,
+    speaker_user: Annotated[User, Depends(get_speaker_user)],
+    ids: Annotated[
+        list[str], Query(title="Session ids to preview", min_length=1, max_length=max_session_previews_per_batch)
+    ],
+    recitals_ra: RecitalsRA = Depends(Provide[Container.recitals_ra]),
+    recitals_content_ra: RecitalsContentRA = Depends(Provide[Container.recitals_content_ra]),
+) -> list[SessionPreview]:
+    # A plain (non async) endpoint - the lookup and presigning a batch of URLs block, so they run in the threadpool
+    # Sessions which are missing, not owned by the user or discarded are left out
+    recital_sessions = recitals_ra.get_by_ids(ids)
+    previews = []
+    for session_id in dict.fromkeys(ids):
+        recital_session = recital_sessions.get(session_id)
+        if not recital_session or recital_session.user_id != speaker_user.id:
+            continue
+
+        if recital_session.status in [SessionStatus.ACTIVE, SessionStatus.ENDED, SessionStatus.AGGREGATED]:
+            previews.append(SessionPreview(id=recital_session.id, audio_url=None, transcript_url=None))
+        elif recital_session.status == SessionStatus.UPLOADED:
+            previews.append(
+                SessionPreview(
+                    id=recital_session.id,
+                    audio_url=recitals_content_ra.get_url_to_light_audio(recital_session.id),
+                    transcript_url=recitals_content_ra.get_url_to_transcript(
+                        recital_session.id, recital_session.text_filename
+                    ),
+                    audio_duration=recital_session.audio_duration,
+                )
+            )
+
+    track_event("Session Previews Generated", {"sessions_count": len(previews)})
+    return previews
+
+
 @router.get("/{session_id}/preview", response_model=SessionPreview)
 @inject
 async def get_session_preview(
@@ -222,7 +612,8 @@ async def get_session_preview(
     return SessionPreview(
         id=recital_session.id,
         audio_url=recitals_content_ra.get_url_to_light_audio(recital_session.id),
-        transcript_url=recitals_content_ra.get_url_to_transcript(recital_session.id),
+        transcript_url=recitals_content_ra.get_url_to_transcript(recital_session.id, recital_session.text_filename),
+        audio_duration=recital_session.audio_duration,
     )
 
 
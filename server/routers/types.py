@@ -1,7 +1,13 @@
+from typing import Optional
+
 from pydantic import BaseModel
 
+# Sessions previewed by a single batch request - a page of the sessions list
+max_session_previews_per_batch = 100
+
 
 class SessionPreview(BaseModel):
     id: str
-    audio_url: str
-    transcript_url: str
+    audio_url: Optional[str]
+    transcript_url: Optional[str]
+    audio_duration: Optional[float] = None
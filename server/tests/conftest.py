@@ -0,0 +1,4 @@
+import os
+
+# The models module builds its (lazily connecting) engines on import - tests never connect
+os.environ.setdefault("DB_CONNECTION_STR", "postgresql://localhost/recital_tests")
@@ -0,0 +1,39 @@
+import pytest
+
+from errors import (
+    AudioSegmentConflictError,
+    AudioSegmentTooLargeError,
+    MissingSessionError,
+    SessionNotActiveError,
+    StorageFullError,
+)
+from routers.sessions import get_audio_segment_error
+
+
+@pytest.mark.parametrize(
+    "error, status_code",
+    [
+        (MissingSessionError(), 404),
+        (AudioSegmentTooLargeError(), 413),
+        (AudioSegmentConflictError(), 409),
+        (SessionNotActiveError(), 409),
+        (StorageFullError(retry_after_sec=60), 503),
+    ],
+)
+def test_mapped_errors(error, status_code):
+    assert get_audio_segment_error(error)[0] == status_code
+
+
+def test_subclass_is_answered_like_its_base():
+    class SessionGoneError(MissingSessionError):
+        pass
+
+    assert get_audio_segment_error(SessionGoneError()) == get_audio_segment_error(MissingSessionError())
+
+
+def test_unmapped_error_is_raised():
+    error = ValueError("not an audio segment error")
+
+    with pytest.raises(ValueError) as e:
+        get_audio_segment_error(error)
+    assert e.value is error
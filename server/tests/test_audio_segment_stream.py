@@ -0,0 +1,93 @@
+import asyncio
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from errors import AudioSegmentTooLargeError
+from resource_access import recitals_content_ra
+from resource_access.recitals_content_ra import RecitalsContentRA
+
+
+async def iter_chunks(content: bytes, chunk_size: int):
+    for i in range(0, len(content), chunk_size):
+        yield content[i : i + chunk_size]
+
+
+@pytest.fixture
+def content_ra(tmp_path):
+    return RecitalsContentRA(str(tmp_path), "", None, None)
+
+
+def receive(content_ra: RecitalsContentRA, content: bytes, max_size_bytes: int, chunk_size: int = 10):
+    return asyncio.run(
+        content_ra.receive_audio_segment_stream("s1.webm.seg.0", iter_chunks(content, chunk_size), max_size_bytes)
+    )
+
+
+def test_receives_and_commits_segment(content_ra, tmp_path):
+    content = b"audio" * 1000
+
+    received = receive(content_ra, content, 10_000, chunk_size=333)
+    asyncio.run(content_ra.commit_received_audio_segment(received, "s1.webm.seg.0"))
+
+    assert received.byte_size == len(content)
+    assert received.content_hash == hashlib.sha256(content).hexdigest()
+    assert Path(tmp_path, "s1.webm.seg.0").read_bytes() == content
+    # Only the segment file is left behind
+    assert [path.name for path in tmp_path.iterdir()] == ["s1.webm.seg.0"]
+
+
+def test_discard_removes_the_received_segment(content_ra, tmp_path):
+    received = receive(content_ra, b"audio", 100)
+
+    asyncio.run(content_ra.discard_received_audio_segment(received))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_coalesces_chunks_into_buffered_writes(content_ra, tmp_path, monkeypatch):
+    monkeypatch.setattr(recitals_content_ra, "STREAM_WRITE_BUFFER_SIZE", 1000)
+    content = bytes(range(256)) * 20
+
+    received = receive(content_ra, content, 10_000, chunk_size=100)
+
+    assert Path(tmp_path, received.temp_filename).read_bytes() == content
+    assert received.content_hash == hashlib.sha256(content).hexdigest()
+
+
+def test_segment_at_the_size_limit(content_ra):
+    received = receive(content_ra, b"x" * 100, 100)
+
+    assert received.byte_size == 100
+
+
+def test_too_large_segment(content_ra, tmp_path):
+    with pytest.raises(AudioSegmentTooLargeError):
+        receive(content_ra, b"x" * 101, 100)
+
+    # The temporary file is not left behind
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_too_large_segment_keeps_the_existing_segment(content_ra, tmp_path):
+    Path(tmp_path, "s1.webm.seg.0").write_bytes(b"stored")
+
+    with pytest.raises(AudioSegmentTooLargeError):
+        receive(content_ra, b"x" * 101, 100)
+
+    assert Path(tmp_path, "s1.webm.seg.0").read_bytes() == b"stored"
+
+
+def test_hash_matches_the_received_segment(content_ra):
+    content = b"audio" * 100
+
+    received = receive(content_ra, content, 1000)
+    size, content_hash = asyncio.run(content_ra.hash_audio_segment_stream(iter_chunks(content, 7), 1000))
+
+    assert (size, content_hash) == (received.byte_size, received.content_hash)
+
+
+def test_hash_of_too_large_segment(content_ra):
+    with pytest.raises(AudioSegmentTooLargeError):
+        asyncio.run(content_ra.hash_audio_segment_stream(iter_chunks(b"x" * 101, 10), 100))
@@ -0,0 +1,230 @@
+import asyncio
+import hashlib
+from pathlib import Path
+
+import pytest
+
+from errors import AudioSegmentTooLargeError, SessionNotActiveError
+from resource_access.recitals_content_ra import AudioSpoolEntry, RecitalsContentRA
+
+session_id = "s1"
+
+
+def segment_filename(sequential: int) -> str:
+    return f"{session_id}.webm.seg.{sequential}"
+
+
+async def iter_chunks(content: bytes, chunk_size: int = 7):
+    for i in range(0, len(content), chunk_size):
+        yield content[i : i + chunk_size]
+
+
+@pytest.fixture
+def content_ra(tmp_path):
+    # The spool never reaches the content storage
+    return RecitalsContentRA(str(tmp_path), "", None, None)
+
+
+def append(content_ra: RecitalsContentRA, sequential: int, content: bytes) -> bool:
+    async def run() -> bool:
+        appender = await content_ra.open_audio_spool_appender(session_id, segment_filename(sequential), sequential)
+        if not appender:
+            return False
+        size, content_hash = await content_ra.receive_audio_segment_into_spool(appender, iter_chunks(content), 1024)
+        assert size == len(content)
+        assert content_hash == hashlib.sha256(content).hexdigest()
+        await content_ra.commit_audio_spool_appender(appender, size)
+        return True
+
+    return asyncio.run(run())
+
+
+def buffer_segment(content_ra: RecitalsContentRA, sequential: int, content: bytes) -> None:
+    Path(content_ra.data_folder, segment_filename(sequential)).write_bytes(content)
+
+
+def spool_content(content_ra: RecitalsContentRA) -> bytes:
+    return Path(content_ra.data_folder, f"{session_id}.webm.spool").read_bytes()
+
+
+def test_appends_in_sequence(content_ra):
+    assert append(content_ra, 0, b"first segment")
+    assert append(content_ra, 1, b"second")
+
+    assert spool_content(content_ra) == b"first segmentsecond"
+    assert content_ra.get_audio_spool(session_id) == (
+        f"{session_id}.webm.spool",
+        [AudioSpoolEntry(0, 0, 13), AudioSpoolEntry(1, 13, 6)],
+    )
+
+
+def test_no_spool(content_ra):
+    assert content_ra.get_audio_spool(session_id) == (None, [])
+    assert content_ra.finalize_audio_spool(session_id, []) is None
+
+
+def test_out_of_sequence_segments_are_buffered(content_ra):
+    assert not append(content_ra, 1, b"second")
+    assert content_ra.get_audio_spool(session_id) == (None, [])
+
+
+def test_buffered_segments_follow_their_predecessor(content_ra):
+    buffer_segment(content_ra, 1, b"second")
+    buffer_segment(content_ra, 2, b"third")
+    buffer_segment(content_ra, 4, b"after a gap")
+
+    assert append(content_ra, 0, b"first")
+
+    assert spool_content(content_ra) == b"firstsecondthird"
+    assert [entry.sequential for entry in content_ra.get_audio_spool(session_id)[1]] == [0, 1, 2]
+    assert not Path(content_ra.data_folder, segment_filename(1)).exists()
+    assert Path(content_ra.data_folder, segment_filename(4)).exists()
+
+
+def test_drain_fills_a_gap(content_ra):
+    assert append(content_ra, 0, b"first")
+    buffer_segment(content_ra, 2, b"third")
+
+    # Still waiting on the second segment
+    asyncio.run(content_ra.drain_audio_spool(session_id, segment_filename(2)))
+    assert spool_content(content_ra) == b"first"
+
+    buffer_segment(content_ra, 1, b"second")
+    asyncio.run(content_ra.drain_audio_spool(session_id, segment_filename(1)))
+    assert spool_content(content_ra) == b"firstsecondthird"
+
+
+def test_busy_spool(content_ra):
+    async def run():
+        appender = await content_ra.open_audio_spool_appender(session_id, segment_filename(0), 0)
+        try:
+            # Another upload never waits on the spool - it is buffered instead
+            assert await content_ra.open_audio_spool_appender(session_id, segment_filename(0), 0) is None
+            # Draining is left to the current appender
+            await content_ra.drain_audio_spool(session_id, segment_filename(0))
+        finally:
+            await content_ra.rollback_audio_spool_appender(appender)
+
+        assert await content_ra.open_audio_spool_appender(session_id, segment_filename(0), 0) is not None
+
+    asyncio.run(run())
+
+
+def test_rollback(content_ra):
+    assert append(content_ra, 0, b"first")
+
+    async def run():
+        appender = await content_ra.open_audio_spool_appender(session_id, segment_filename(1), 1)
+        with pytest.raises(AudioSegmentTooLargeError):
+            await content_ra.receive_audio_segment_into_spool(appender, iter_chunks(b"x" * 100), 50)
+        await content_ra.rollback_audio_spool_appender(appender)
+
+    asyncio.run(run())
+
+    assert spool_content(content_ra) == b"first"
+    assert append(content_ra, 1, b"second")
+    assert spool_content(content_ra) == b"firstsecond"
+
+
+def test_interrupted_append_is_dropped(content_ra):
+    assert append(content_ra, 0, b"first")
+
+    async def interrupted():
+        appender = await content_ra.open_audio_spool_appender(session_id, segment_filename(1), 1)
+        await content_ra.receive_audio_segment_into_spool(appender, iter_chunks(b"partial"), 1024)
+        # The process died before committing - only the lock is released
+        appender.spool_file.flush()
+        content_ra._close_audio_spool_appender(appender)
+
+    asyncio.run(interrupted())
+    assert spool_content(content_ra) == b"firstpartial"
+
+    assert append(content_ra, 1, b"second")
+    assert spool_content(content_ra) == b"firstsecond"
+
+
+def test_finalize(content_ra):
+    assert append(content_ra, 0, b"first")
+    assert append(content_ra, 1, b"second")
+    buffer_segment(content_ra, 3, b"after a gap")
+
+    concatenated_filename = content_ra.finalize_audio_spool(session_id, [segment_filename(3)])
+
+    assert concatenated_filename == f"{session_id}.webm"
+    assert Path(content_ra.data_folder, concatenated_filename).read_bytes() == b"firstsecondafter a gap"
+    assert not Path(content_ra.data_folder, f"{session_id}.webm.spool").exists()
+    # A retried finalization finds the concatenated file
+    assert content_ra.finalize_audio_spool(session_id, [segment_filename(3)]) == concatenated_filename
+
+
+def test_finalize_drops_uncommitted_bytes(content_ra):
+    assert append(content_ra, 0, b"first")
+    with open(Path(content_ra.data_folder, f"{session_id}.webm.spool"), "ab") as spool_file:
+        spool_file.write(b"never committed")
+    buffer_segment(content_ra, 2, b"after a gap")
+
+    concatenated_filename = content_ra.finalize_audio_spool(session_id, [segment_filename(2)])
+
+    assert Path(content_ra.data_folder, concatenated_filename).read_bytes() == b"firstafter a gap"
+
+
+def test_finalize_without_leftovers_drops_uncommitted_bytes(content_ra):
+    assert append(content_ra, 0, b"first")
+    with open(Path(content_ra.data_folder, f"{session_id}.webm.spool"), "ab") as spool_file:
+        spool_file.write(b"never committed")
+
+    concatenated_filename = content_ra.finalize_audio_spool(session_id, [])
+
+    assert Path(content_ra.data_folder, concatenated_filename).read_bytes() == b"first"
+
+
+def test_late_append_after_finalize(content_ra):
+    assert append(content_ra, 0, b"first")
+    concatenated_filename = content_ra.finalize_audio_spool(session_id, [])
+
+    with pytest.raises(SessionNotActiveError):
+        append(content_ra, 1, b"late")
+
+    # The finalized audio is left as is and the spool is never recreated
+    assert Path(content_ra.data_folder, concatenated_filename).read_bytes() == b"first"
+    assert not Path(content_ra.data_folder, f"{session_id}.webm.spool").exists()
+
+
+def test_drain_after_finalize(content_ra):
+    assert append(content_ra, 0, b"first")
+    content_ra.finalize_audio_spool(session_id, [])
+    buffer_segment(content_ra, 1, b"late")
+
+    asyncio.run(content_ra.drain_audio_spool(session_id, segment_filename(1)))
+
+    assert not Path(content_ra.data_folder, f"{session_id}.webm.spool").exists()
+
+
+def test_failed_index_write_rolls_back_the_append(content_ra, monkeypatch):
+    assert append(content_ra, 0, b"first")
+
+    def append_index(*args):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(RecitalsContentRA, "_append_audio_spool_index", staticmethod(append_index))
+    with pytest.raises(OSError):
+        append(content_ra, 1, b"second")
+    monkeypatch.undo()
+
+    assert spool_content(content_ra) == b"first"
+    # The spool is released and the segment can be stored again
+    assert append(content_ra, 1, b"second")
+    assert spool_content(content_ra) == b"firstsecond"
+
+
+def test_failed_drain_keeps_the_committed_segment(content_ra, monkeypatch):
+    def drain(*args):
+        raise OSError("Input/output error")
+
+    monkeypatch.setattr(content_ra, "_drain_buffered_audio_segments", drain)
+    buffer_segment(content_ra, 1, b"second")
+
+    assert append(content_ra, 0, b"first")
+
+    assert content_ra.get_audio_spool(session_id)[1] == [AudioSpoolEntry(0, 0, 5)]
+    assert Path(content_ra.data_folder, segment_filename(1)).exists()
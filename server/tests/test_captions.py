@@ -0,0 +1,84 @@
+import io
+import json
+
+import pytest
+
+from utility.captions import CaptionWriter, format_caption_timestamp, normalize_caption_text
+
+
+def test_format_caption_timestamp():
+    assert format_caption_timestamp(0) == "00:00:00.000"
+    assert format_caption_timestamp(3661.5) == "01:01:01.500"
+    assert format_caption_timestamp(59.9994) == "00:00:59.999"
+    assert format_caption_timestamp(59.9996) == "00:01:00.000"
+
+
+def test_format_caption_timestamp_srt_marker():
+    assert format_caption_timestamp(12.345, ",") == "00:00:12,345"
+
+
+def test_format_caption_timestamp_hours_past_a_day():
+    assert format_caption_timestamp(25 * 60 * 60) == "25:00:00.000"
+
+
+def test_format_caption_timestamp_clamps_negative():
+    assert format_caption_timestamp(-1.5) == "00:00:00.000"
+
+
+def test_normalize_caption_text():
+    assert normalize_caption_text("שלום\n  עולם\t!") == "שלום עולם !"
+
+
+def test_vtt():
+    captions = io.StringIO()
+    writer = CaptionWriter(captions)
+    writer.write_header("session: s1")
+    writer.write_caption("first\nline", 0, 1.5)
+    writer.write_caption("second", 1.5, 3)
+
+    assert captions.getvalue() == (
+        "WEBVTT\n"
+        "\nNOTE session: s1\n"
+        "\n00:00:00.000 --> 00:00:01.500\nfirst line\n"
+        "\n00:00:01.500 --> 00:00:03.000\nsecond\n"
+    )
+    assert writer.captions_count == 2
+
+
+def test_srt():
+    captions = io.StringIO()
+    writer = CaptionWriter(captions, "srt")
+    writer.write_header("ignored")
+    writer.write_caption("first", 0, 1.5)
+    writer.write_caption("second", 1.5, 3)
+
+    assert captions.getvalue() == (
+        "1\n00:00:00,000 --> 00:00:01,500\nfirst\n\n" "2\n00:00:01,500 --> 00:00:03,000\nsecond\n\n"
+    )
+
+
+def test_srt_appending_continues_numbering():
+    captions = io.StringIO()
+    writer = CaptionWriter(captions, "srt", captions_count=7)
+    writer.write_caption("eighth", 10, 11)
+
+    assert captions.getvalue().startswith("8\n")
+    assert writer.captions_count == 8
+
+
+def test_jsonl():
+    captions = io.StringIO()
+    writer = CaptionWriter(captions, "jsonl")
+    writer.write_header("ignored")
+    writer.write_caption("שלום  עולם", 0.5, 2)
+
+    lines = captions.getvalue().splitlines()
+    assert len(lines) == 1
+    # Hebrew is written as is - not escaped
+    assert "שלום עולם" in lines[0]
+    assert json.loads(lines[0]) == {"start": 0.5, "end": 2, "text": "שלום עולם"}
+
+
+def test_unsupported_format():
+    with pytest.raises(ValueError):
+        CaptionWriter(io.StringIO(), "ass")
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from resource_access.recitals_content_ra import RecitalsContentRA
+from utility.storage import ContentStorageClient
+
+bucket = "recital-content"
+
+
+def storage_client(max_pool_connections: int, max_concurrency: int) -> ContentStorageClient:
+    return ContentStorageClient(
+        max_pool_connections=max_pool_connections,
+        max_attempts=1,
+        retry_mode="standard",
+        multipart_threshold_mb=16,
+        multipart_chunk_size_mb=16,
+        max_concurrency=max_concurrency,
+    )
+
+
+@pytest.fixture(autouse=True)
+def aws(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        boto3.client("s3").create_bucket(Bucket=bucket)
+        yield
+
+
+@pytest.mark.parametrize(
+    "max_pool_connections, max_concurrency, transfers, transfer_concurrency",
+    [(32, 8, 4, 8), (32, 10, 3, 10), (8, 8, 1, 8), (4, 8, 1, 4)],
+)
+def test_transfers_fit_the_connection_pool(max_pool_connections, max_concurrency, transfers, transfer_concurrency):
+    client = storage_client(max_pool_connections, max_concurrency)
+
+    assert client.transfer_config.max_concurrency == transfer_concurrency
+    for _ in range(transfers):
+        assert client.transfer_slots.acquire(blocking=False)
+    assert not client.transfer_slots.acquire(blocking=False)
+
+
+def test_uploads_wait_for_a_transfer_slot(tmp_path, monkeypatch):
+    content_ra = RecitalsContentRA(str(tmp_path), bucket, storage_client(16, 8), None)
+    source_path = tmp_path / "s1.vtt"
+    source_path.write_text("WEBVTT\n")
+
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+    upload_file = content_ra.content_storage_client.client.upload_file
+
+    def counting_upload_file(*args, **kwargs):
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.05)
+        upload_file(*args, **kwargs)
+        with lock:
+            running -= 1
+
+    monkeypatch.setattr(content_ra.content_storage_client.client, "upload_file", counting_upload_file)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        uploaded = list(
+            executor.map(lambda i: content_ra.upload_to_storage(str(source_path), f"s{i}/transcript.vtt", {}), range(8))
+        )
+
+    assert all(uploaded)
+    assert max_running == 2
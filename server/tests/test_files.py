@@ -0,0 +1,113 @@
+import errno
+import os
+
+import pytest
+
+from utility import files
+from utility.files import append_files, concat_files
+
+
+@pytest.fixture
+def sources(tmp_path):
+    contents = [os.urandom(1000), b"", os.urandom(3 * 1024 * 1024 + 7)]
+    paths = []
+    for i, content in enumerate(contents):
+        path = tmp_path / f"source.{i}"
+        path.write_bytes(content)
+        paths.append(path)
+    return paths, b"".join(contents)
+
+
+def test_concat_files(tmp_path, sources):
+    source_paths, expected = sources
+    target_path = tmp_path / "target"
+
+    assert concat_files(target_path, source_paths) == len(expected)
+    assert target_path.read_bytes() == expected
+
+
+def test_append_files_at_current_position(tmp_path, sources):
+    source_paths, expected = sources
+    target_path = tmp_path / "target"
+    target_path.write_bytes(b"header" + b"stale tail")
+
+    with open(target_path, "r+b") as target_file:
+        target_file.seek(len(b"header"))
+        assert append_files(target_file, source_paths) == len(expected)
+        # The file object position follows the appended content
+        assert target_file.tell() == len(b"header") + len(expected)
+        target_file.write(b"!")
+
+    assert target_path.read_bytes() == b"header" + expected + b"!"
+
+
+def test_append_files_onto_buffered_writes(tmp_path, sources):
+    source_paths, expected = sources
+    target_path = tmp_path / "target"
+
+    with open(target_path, "wb") as target_file:
+        # Still in the file object buffer when appending starts
+        target_file.write(b"buffered")
+        append_files(target_file, source_paths)
+
+    assert target_path.read_bytes() == b"buffered" + expected
+
+
+def test_append_files_in_append_mode(tmp_path, sources):
+    source_paths, expected = sources
+    target_path = tmp_path / "target"
+    target_path.write_bytes(b"existing")
+
+    with open(target_path, "ab") as target_file:
+        append_files(target_file, source_paths)
+
+    assert target_path.read_bytes() == b"existing" + expected
+
+
+def test_append_no_files(tmp_path):
+    target_path = tmp_path / "target"
+    with open(target_path, "wb") as target_file:
+        assert append_files(target_file, []) == 0
+    assert target_path.read_bytes() == b""
+
+
+@pytest.mark.parametrize("copy_file_range_supported, sendfile_supported", [(False, True), (False, False)])
+def test_copy_fallbacks(tmp_path, sources, monkeypatch, copy_file_range_supported, sendfile_supported):
+    source_paths, expected = sources
+    monkeypatch.setattr(files, "_copy_file_range_supported", copy_file_range_supported)
+    monkeypatch.setattr(files, "_sendfile_supported", sendfile_supported)
+    target_path = tmp_path / "target"
+
+    assert concat_files(target_path, source_paths) == len(expected)
+    assert target_path.read_bytes() == expected
+
+
+def test_falls_back_when_the_kernel_copy_is_unsupported(tmp_path, sources, monkeypatch):
+    source_paths, expected = sources
+
+    def copy_file_range(*args):
+        raise OSError(errno.EXDEV, "Cross-device link")
+
+    monkeypatch.setattr(files, "_copy_file_range_supported", True)
+    monkeypatch.setattr(files, "_sendfile_supported", False)
+    monkeypatch.setattr(files.os, "copy_file_range", copy_file_range, raising=False)
+    target_path = tmp_path / "target"
+
+    assert concat_files(target_path, source_paths) == len(expected)
+    assert target_path.read_bytes() == expected
+    # Cross device copies may work for other file pairs - copy_file_range is still tried next time
+    assert files._copy_file_range_supported
+
+
+def test_copy_errors_are_raised(tmp_path, sources, monkeypatch):
+    source_paths, _ = sources
+
+    def copy_file_range(*args):
+        raise OSError(errno.ENOSPC, "No space left on device")
+
+    monkeypatch.setattr(files, "_copy_file_range_supported", True)
+    monkeypatch.setattr(files.os, "copy_file_range", copy_file_range, raising=False)
+
+    with pytest.raises(OSError) as e:
+        concat_files(tmp_path / "target", source_paths)
+    assert e.value.errno == errno.ENOSPC
@@ -0,0 +1,39 @@
+import pytest
+
+from utility.cache import ttl
+from utility.cache.presigned_urls import PresignedUrlCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_urls_expire_a_safety_margin_before_their_signature(clock):
+    cache = PresignedUrlCache(max_size=10, expires_in_sec=1200, safety_margin_sec=300)
+    cache.set_url("s1/main.mp3", "https://example.com/s1/main.mp3?signature")
+
+    clock[0] += 899
+    assert cache.get_url("s1/main.mp3") == "https://example.com/s1/main.mp3?signature"
+    clock[0] += 1
+    assert cache.get_url("s1/main.mp3") is None
+
+
+def test_safety_margin_must_be_shorter_than_the_expiry():
+    with pytest.raises(ValueError):
+        PresignedUrlCache(max_size=10, expires_in_sec=300, safety_margin_sec=300)
+
+
+def test_invalidate_prefix(clock):
+    cache = PresignedUrlCache(max_size=10, expires_in_sec=1200, safety_margin_sec=300)
+    cache.set_url("s1/main.mp3", "url-1")
+    cache.set_url("s1/transcript.vtt", "url-2")
+    cache.set_url("s10/main.mp3", "url-3")
+
+    cache.invalidate_prefix("s1/")
+
+    assert cache.get_url("s1/main.mp3") is None
+    assert cache.get_url("s1/transcript.vtt") is None
+    assert cache.get_url("s10/main.mp3") == "url-3"
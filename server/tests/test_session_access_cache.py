@@ -0,0 +1,66 @@
+from uuid import uuid4
+
+import pytest
+
+from utility.cache.sessions import SessionAccess, SessionAccessCache
+
+owner_id = uuid4()
+
+
+@pytest.fixture
+def cache():
+    return SessionAccessCache(max_size=10, ttl_sec=30)
+
+
+def session_access(session_id: str = "s1", **kwargs) -> SessionAccess:
+    return SessionAccess(id=session_id, user_id=owner_id, status="active", disavowed=False, **kwargs)
+
+
+def test_served_to_the_owner(cache):
+    cache.set_access(session_access())
+
+    assert cache.get_access("s1", owner_id) == session_access()
+    # The user id may come as a string (e.g. from a token)
+    assert cache.get_access("s1", str(owner_id)) == session_access()
+
+
+def test_never_served_to_others(cache):
+    cache.set_access(session_access())
+
+    assert cache.get_access("s1", uuid4()) is None
+
+
+def test_invalidate(cache):
+    cache.set_access(session_access())
+    invalidated = []
+    cache.add_invalidation_hook(invalidated.append)
+
+    cache.invalidate("s1")
+
+    assert cache.get_access("s1", owner_id) is None
+    assert invalidated == ["s1"]
+
+
+def test_invalidate_without_propagating(cache):
+    cache.set_access(session_access())
+    invalidated = []
+    cache.add_invalidation_hook(invalidated.append)
+
+    cache.invalidate("s1", propagate=False)
+
+    assert cache.get_access("s1", owner_id) is None
+    assert invalidated == []
+
+
+def test_failing_hook_does_not_stop_the_others(cache):
+    invalidated = []
+
+    def failing_hook(session_id: str) -> None:
+        raise RuntimeError("channel is down")
+
+    cache.add_invalidation_hook(failing_hook)
+    cache.add_invalidation_hook(invalidated.append)
+
+    cache.invalidate("s1")
+
+    assert invalidated == ["s1"]
@@ -0,0 +1,87 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from engines.aggregation_engine import AggregationEngine
+from managers.recital_manager import RecitalManager
+
+session_id = "s1"
+
+
+def text_segments(*seek_ends: float):
+    return [SimpleNamespace(text=f"text {i}", seek_end=seek_end) for i, seek_end in enumerate(seek_ends)]
+
+
+@pytest.fixture
+def aggregation_engine(tmp_path):
+    return AggregationEngine(None, str(tmp_path))
+
+
+def read_captions(aggregation_engine: AggregationEngine, captions_filename: str) -> list[dict]:
+    with open(f"{aggregation_engine.data_folder}/{captions_filename}", encoding="utf-8") as captions_file:
+        return [json.loads(line) for line in captions_file]
+
+
+def test_captions_cover_the_text(aggregation_engine):
+    captions_filename = aggregation_engine.aggregate_session_captions(session_id, text_segments(2, 5, 9), "jsonl")
+
+    assert [(c["start"], c["end"]) for c in read_captions(aggregation_engine, captions_filename)] == [
+        (0, 2),
+        (2, 5),
+        (5, 9),
+    ]
+
+
+def test_captions_until_the_end_of_the_audio(aggregation_engine):
+    captions_filename = aggregation_engine.aggregate_session_captions(
+        session_id, text_segments(2, 5, 9, 12), "jsonl", until=6
+    )
+
+    # The caption spanning the end is clipped and the later ones are dropped
+    assert [(c["start"], c["end"]) for c in read_captions(aggregation_engine, captions_filename)] == [
+        (0, 2),
+        (2, 5),
+        (5, 6),
+    ]
+
+
+def test_captions_until_a_caption_boundary(aggregation_engine):
+    captions_filename = aggregation_engine.aggregate_session_captions(
+        session_id, text_segments(2, 5, 9), "jsonl", until=5
+    )
+
+    assert [(c["start"], c["end"]) for c in read_captions(aggregation_engine, captions_filename)] == [(0, 2), (2, 5)]
+
+
+def test_partial_captions_are_completed_until_the_end_of_the_audio(aggregation_engine):
+    aggregation_engine.append_session_captions(session_id, text_segments(2, 5), "jsonl")
+    progress = aggregation_engine.get_session_captions_progress(session_id, "jsonl")
+
+    captions_filename = aggregation_engine.aggregate_session_captions(
+        session_id, text_segments(9, 12), "jsonl", progress=progress, until=7
+    )
+
+    assert [(c["start"], c["end"]) for c in read_captions(aggregation_engine, captions_filename)] == [
+        (0, 2),
+        (2, 5),
+        (5, 7),
+    ]
+
+
+def target_duration(last_seek_time: float, trailing_silence: float, audio_duration: float = None) -> float:
+    manager = SimpleNamespace(session_silence_trim_sec=10)
+    recital_session = SimpleNamespace(trailing_silence=trailing_silence, audio_duration=audio_duration)
+    return RecitalManager._get_session_target_duration(manager, recital_session, last_seek_time)
+
+
+def test_target_duration_covers_the_text():
+    assert target_duration(60, trailing_silence=None) == 60
+    assert target_duration(60, trailing_silence=10) == 60
+
+
+def test_target_duration_trims_trailing_silence():
+    # A short tail is kept after the last sound
+    assert target_duration(60, trailing_silence=30) == 31
+    # Silence is measured up to the end of the audio when it is shorter than the text
+    assert target_duration(60, trailing_silence=30, audio_duration=50) == 21
@@ -0,0 +1,29 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from managers.recital_manager import RecitalManager
+
+
+def retry_delay(attempts: int, backoff_sec: int = 60, backoff_max_sec: int = 3600) -> timedelta:
+    manager = SimpleNamespace(
+        session_finalization_retry_backoff_sec=backoff_sec,
+        session_finalization_retry_backoff_max_sec=backoff_max_sec,
+    )
+    return RecitalManager._get_session_finalization_retry_delay(manager, attempts)
+
+
+@pytest.mark.parametrize("attempts, expected_sec", [(1, 60), (2, 120), (3, 240), (6, 1920)])
+def test_delay_doubles_with_each_attempt(attempts, expected_sec):
+    assert retry_delay(attempts) == timedelta(seconds=expected_sec)
+
+
+def test_delay_is_capped():
+    assert retry_delay(7) == timedelta(seconds=3600)
+    assert retry_delay(20) == timedelta(seconds=3600)
+
+
+def test_delay_of_many_attempts():
+    # The exponent is bounded - never an overflow however many attempts were made
+    assert retry_delay(10_000, backoff_max_sec=10**12) == timedelta(seconds=60 * 2**32)
@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from managers.recital_manager import RecitalManager
+
+
+def manager(job_disabled: bool = False) -> SimpleNamespace:
+    return SimpleNamespace(
+        session_finalization_job_disabled=job_disabled,
+        session_finalization_job_id="session_finalization_job",
+        job_scheduler=Mock(),
+        run_session_finalization=Mock(__name__="run_session_finalization"),
+        upload_aggregated_sessions=Mock(__name__="upload_aggregated_sessions"),
+    )
+
+
+def test_triggers_a_whole_run():
+    recital_manager = manager()
+
+    assert RecitalManager.trigger_session_finalization(recital_manager)
+
+    recital_manager.job_scheduler.add_job.assert_called_once_with(
+        recital_manager.run_session_finalization, id="session_finalization_job_triggered", replace_existing=True
+    )
+
+
+def test_triggers_a_single_step():
+    recital_manager = manager()
+
+    assert RecitalManager.trigger_session_finalization(recital_manager, recital_manager.upload_aggregated_sessions)
+
+    recital_manager.job_scheduler.add_job.assert_called_once_with(
+        recital_manager.upload_aggregated_sessions,
+        id="session_finalization_job_triggered_upload_aggregated_sessions",
+        replace_existing=True,
+    )
+
+
+def test_not_triggered_when_finalization_does_not_run_here():
+    recital_manager = manager(job_disabled=True)
+
+    assert not RecitalManager.trigger_session_finalization(recital_manager, recital_manager.upload_aggregated_sessions)
+
+    recital_manager.job_scheduler.add_job.assert_not_called()
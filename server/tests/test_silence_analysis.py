@@ -0,0 +1,85 @@
+import shutil
+import wave
+
+import numpy as np
+import pytest
+
+from engines.silence_analysis import ANALYSIS_SAMPLE_RATE, analyze_silence
+
+pytestmark = pytest.mark.skipif(not shutil.which("ffmpeg"), reason="ffmpeg is not available")
+
+
+def write_wav(path, *parts: tuple[float, bool]) -> None:
+    """Writes a 16 kHz mono wav of (duration, sounding) parts - a 440 Hz tone or digital silence."""
+    samples = []
+    for duration, sounding in parts:
+        t = np.arange(int(duration * ANALYSIS_SAMPLE_RATE)) / ANALYSIS_SAMPLE_RATE
+        samples.append(np.sin(2 * np.pi * 440 * t) * 16000 if sounding else np.zeros_like(t))
+    with wave.open(str(path), "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(ANALYSIS_SAMPLE_RATE)
+        wav_file.writeframes(np.concatenate(samples).astype("<i2").tobytes())
+
+
+def test_silence_measures(tmp_path):
+    # Longer than a single analysis block - silence spans block boundaries
+    audio_path = tmp_path / "audio.wav"
+    write_wav(audio_path, (12, False), (2, True), (6, False))
+
+    analysis = analyze_silence(audio_path, silence_threshold_db=-50)
+
+    assert analysis.duration == pytest.approx(20, abs=0.02)
+    assert analysis.silence_ratio == pytest.approx(18 / 20, abs=0.01)
+    assert analysis.trailing_silence == pytest.approx(6, abs=0.04)
+
+
+def test_sound_to_the_end(tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    write_wav(audio_path, (1, False), (3, True))
+
+    analysis = analyze_silence(audio_path, silence_threshold_db=-50)
+
+    assert analysis.silence_ratio == pytest.approx(0.25, abs=0.01)
+    assert analysis.trailing_silence == 0
+
+
+def test_all_silent(tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    write_wav(audio_path, (3, False))
+
+    analysis = analyze_silence(audio_path, silence_threshold_db=-50)
+
+    assert analysis.silence_ratio == 1
+    assert analysis.trailing_silence == pytest.approx(3, abs=0.02)
+
+
+def test_threshold(tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    write_wav(audio_path, (2, True), (2, False))
+
+    # The tone peaks around -6 dBFS - quieter than a 0 dBFS threshold
+    analysis = analyze_silence(audio_path, silence_threshold_db=0)
+
+    assert analysis.silence_ratio == 1
+
+
+def test_analyzed_duration_is_limited(tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    write_wav(audio_path, (2, True), (4, False))
+
+    analysis = analyze_silence(audio_path, silence_threshold_db=-50, duration=3)
+
+    assert analysis.duration == pytest.approx(3, abs=0.02)
+    assert analysis.trailing_silence == pytest.approx(1, abs=0.04)
+
+
+def test_undecodable_audio(tmp_path):
+    audio_path = tmp_path / "audio.wav"
+    audio_path.write_bytes(b"not audio at all")
+
+    assert analyze_silence(audio_path, silence_threshold_db=-50) is None
+
+
+def test_missing_audio(tmp_path):
+    assert analyze_silence(tmp_path / "missing.wav", silence_threshold_db=-50) is None
@@ -0,0 +1,82 @@
+import pytest
+
+from utility.cache import ttl
+from utility.cache.ttl import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(ttl.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_get_and_set(clock):
+    cache = TTLCache(max_size=10, ttl_sec=30)
+    assert cache.get("a") is None
+
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.stats() == {"size": 1, "max_size": 10, "hits": 1, "misses": 1}
+
+
+def test_expiry(clock):
+    cache = TTLCache(max_size=10, ttl_sec=30)
+    cache.set("a", 1)
+
+    clock[0] += 29.9
+    assert cache.get("a") == 1
+    clock[0] += 0.1
+    assert cache.get("a") is None
+    # Expired entries are dropped when found
+    assert cache.stats()["size"] == 0
+
+
+def test_entry_ttl_override(clock):
+    cache = TTLCache(max_size=10, ttl_sec=30)
+    cache.set("short", 1, ttl_sec=5)
+    cache.set("default", 2)
+
+    clock[0] += 10
+    assert cache.get("short") is None
+    assert cache.get("default") == 2
+
+
+def test_evicts_least_recently_used(clock):
+    cache = TTLCache(max_size=2, ttl_sec=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    # Reading "a" makes "b" the least recently used
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["size"] == 2
+
+
+def test_set_refreshes_existing_entry(clock):
+    cache = TTLCache(max_size=2, ttl_sec=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.set("a", 10)
+    cache.set("c", 3)
+
+    assert cache.get("a") == 10
+    assert cache.get("b") is None
+
+
+def test_delete_and_clear(clock):
+    cache = TTLCache(max_size=10, ttl_sec=30)
+    cache.set("a", 1)
+    cache.set("b", 2)
+
+    cache.delete("a")
+    cache.delete("missing")
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+
+    cache.clear()
+    assert cache.get("b") is None
+    assert cache.stats()["size"] == 0
@@ -0,0 +1,71 @@
+from uuid import uuid4
+
+import pytest
+
+from models.user import User
+from utility.cache.users import UserCache
+
+
+@pytest.fixture
+def cache():
+    return UserCache(max_size=10, ttl_sec=30)
+
+
+def new_user(email: str = "speaker@example.com") -> User:
+    return User(id=uuid4(), email=email, name="Speaker", picture=None)
+
+
+def test_get_by_id_and_email(cache):
+    user = new_user()
+    cache.set_user(user)
+
+    assert cache.get_by_id(user.id) == user
+    assert cache.get_by_id(str(user.id)) == user
+    assert cache.get_by_email(user.email) == user
+    assert cache.get_by_email("other@example.com") is None
+
+
+def test_invalidate_user(cache):
+    user = new_user()
+    cache.set_user(user)
+
+    cache.invalidate_user(user.id)
+
+    assert cache.get_by_id(user.id) is None
+    # The email entry is found through the cached user
+    assert cache.get_by_email(user.email) is None
+
+
+def test_invalidate_user_with_a_changed_email(cache):
+    user = new_user()
+    cache.set_user(user)
+    cache.invalidate_user(user.id)
+    cache.set(("email", "old@example.com"), user)
+
+    cache.invalidate_user(user.id, email="old@example.com")
+
+    assert cache.get_by_email("old@example.com") is None
+
+
+def test_invalidate_does_not_count_as_a_lookup(cache):
+    user = new_user()
+    cache.set_user(user)
+
+    cache.invalidate_user(user.id)
+
+    assert cache.stats()["hits"] == 0
+    assert cache.stats()["misses"] == 0
+
+
+def test_users_are_served_as_copies(cache):
+    user = new_user()
+    cache.set_user(user)
+
+    served_user = cache.get_by_id(user.id)
+    served_user.agreement_signed_version = "v2"
+    user.name = "Renamed"
+
+    cached_user = cache.get_by_email(user.email)
+    assert cached_user is not served_user
+    assert cached_user.agreement_signed_version is None
+    assert cached_user.name == "Speaker"
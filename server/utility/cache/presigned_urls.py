@@ -0,0 +1,27 @@
+from .ttl import TTLCache
+
+
+class PresignedUrlCache(TTLCache):
+    """Caches presigned content storage URLs by their object key.
+
+    URLs are signed to expire after expires_in_sec and are served from the cache until
+    safety_margin_sec before that - a client is always left the margin to start fetching.
+    """
+
+    def __init__(self, max_size: int, expires_in_sec: int, safety_margin_sec: int) -> None:
+        if safety_margin_sec >= expires_in_sec:
+            raise ValueError("The presigned URL safety margin must be shorter than the URL expiry")
+
+        super().__init__(max_size, expires_in_sec - safety_margin_sec)
+        self.expires_in_sec = expires_in_sec
+
+    def get_url(self, key: str) -> str | None:
+        return self.get(key)
+
+    def set_url(self, key: str, url: str) -> None:
+        self.set(key, url)
+
+    def invalidate_prefix(self, prefix: str) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
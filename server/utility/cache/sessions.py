@@ -0,0 +1,53 @@
+from typing import Callable, Optional
+from uuid import UUID
+
+from pydantic import BaseModel
+
+from .ttl import TTLCache
+
+
+class SessionAccess(BaseModel):
+    id: str
+    user_id: UUID
+    status: str
+    disavowed: bool
+
+
+InvalidationHook = Callable[[str], None]
+
+
+class SessionAccessCache(TTLCache):
+    """Caches the ownership and status of recital sessions for per-segment authorization.
+
+    Entries are keyed by the session id. Writes to a session row invalidate its entry
+    in-process. Invalidation hooks let other workers know about the change
+    (e.g. by publishing on a message channel) - their subscriber should call
+    invalidate with propagate=False to avoid echoing the change back.
+    """
+
+    def __init__(self, max_size: int, ttl_sec: float) -> None:
+        super().__init__(max_size, ttl_sec)
+        self._invalidation_hooks: list[InvalidationHook] = []
+
+    def add_invalidation_hook(self, hook: InvalidationHook) -> None:
+        self._invalidation_hooks.append(hook)
+
+    def get_access(self, session_id: str, user_id: UUID) -> Optional[SessionAccess]:
+        session_access: SessionAccess = self.get(session_id)
+        if session_access is not None and str(session_access.user_id) != str(user_id):
+            # Not the owner - never served from the cache
+            return None
+        return session_access
+
+    def set_access(self, session_access: SessionAccess) -> None:
+        self.set(session_access.id, session_access)
+
+    def invalidate(self, session_id: str, propagate: bool = True) -> None:
+        self.delete(session_id)
+        if propagate:
+            for hook in self._invalidation_hooks:
+                try:
+                    hook(session_id)
+                except Exception as e:
+                    print(f"Error propagating session access invalidation for session {session_id}")
+                    print(e)
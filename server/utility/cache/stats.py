@@ -1,8 +1,10 @@
+import functools
 import inspect
 from enum import StrEnum
 from typing import Union
 
 from dogpile.cache import make_region
+from dogpile.cache.api import NO_VALUE
 
 
 class CacheKeys(StrEnum):
@@ -46,6 +48,30 @@ region = make_region(function_key_generator=stats_key_gen).configure(
 )
 
 
+def async_cache_on_arguments(namespace: Union[str, dict], expiration_time: int):
+    """Caches results of a coroutine function on the stats region.
+
+    The dogpile decorator only supports sync functions - This one uses the same
+    key generation so async and sync callers share entries and invalidation.
+    """
+
+    def decorator(fn):
+        generate_key = stats_key_gen(namespace, fn)
+
+        @functools.wraps(fn)
+        async def wrapper(*arg):
+            key = generate_key(*arg)
+            value = region.get(key, expiration_time=expiration_time)
+            if value is NO_VALUE:
+                value = await fn(*arg)
+                region.set(key, value)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
 def invalidate_stats_by_user_id(user_id):
     for key in user_stats_keys:
         region.delete(key % user_id)
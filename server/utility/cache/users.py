@@ -0,0 +1,40 @@
+from typing import Optional
+from uuid import UUID
+
+from models.user import User
+
+from .ttl import TTLCache
+
+
+def _copy_user(user: Optional[User]) -> Optional[User]:
+    # A separate instance - model_copy() would still share the ORM state of the original
+    return User(**user.model_dump()) if user is not None else None
+
+
+class UserCache(TTLCache):
+    """Caches authenticated users by their id and by their (delegated identity) email.
+
+    Users are stored and served as copies - a request changing its user never changes the cached one.
+    """
+
+    def get_by_id(self, user_id: UUID | str) -> Optional[User]:
+        return _copy_user(self.get(("id", str(user_id))))
+
+    def get_by_email(self, email: str) -> Optional[User]:
+        return _copy_user(self.get(("email", email)))
+
+    def set_user(self, user: User) -> None:
+        cached_user = _copy_user(user)
+        self.set(("id", str(user.id)), cached_user)
+        self.set(("email", user.email), cached_user)
+
+    def invalidate_user(self, user_id: UUID | str, email: Optional[str] = None) -> None:
+        id_key = ("id", str(user_id))
+        # Peek without touching the hit/miss counters to find the email the user was cached under
+        with self._lock:
+            cached_entry = self._entries.get(id_key)
+        if cached_entry is not None:
+            self.delete(("email", cached_entry[1].email))
+        if email:
+            self.delete(("email", email))
+        self.delete(id_key)
@@ -0,0 +1,52 @@
+import json
+import re
+from typing import TextIO
+
+CAPTION_FORMATS = ("vtt", "srt", "jsonl")
+
+
+def normalize_caption_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text)
+
+
+def format_caption_timestamp(seconds: float, decimal_marker: str = ".") -> str:
+    """Formats seconds to hh:mm:ss.zzz - hours keep counting past a day."""
+    total_ms = max(round(seconds * 1000), 0)
+    hours, total_ms = divmod(total_ms, 60 * 60 * 1000)
+    minutes, total_ms = divmod(total_ms, 60 * 1000)
+    secs, ms = divmod(total_ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{ms:03d}"
+
+
+class CaptionWriter:
+    """Writes captions onto an open text file one caption at a time - nothing is kept in memory.
+
+    Supported formats are "vtt" (WebVTT), "srt" (SubRip) and "jsonl" (a JSON object per caption).
+    A writer appending onto captions written earlier is given the count of those captions.
+    """
+
+    def __init__(self, file: TextIO, format: str = "vtt", captions_count: int = 0) -> None:
+        if format not in CAPTION_FORMATS:
+            raise ValueError(f"Unsupported captions format `{format}` - supported: {', '.join(CAPTION_FORMATS)}")
+
+        self.file = file
+        self.format = format
+        self.captions_count = captions_count
+
+    def write_header(self, *comments: str) -> None:
+        # SRT and JSONL have no header
+        if self.format == "vtt":
+            self.file.write("WEBVTT\n")
+            for comment in comments:
+                self.file.write(f"\nNOTE {comment}\n")
+
+    def write_caption(self, text: str, start: float, end: float) -> None:
+        text = normalize_caption_text(text)
+        self.captions_count += 1
+        if self.format == "vtt":
+            self.file.write(f"\n{format_caption_timestamp(start)} --> {format_caption_timestamp(end)}\n{text}\n")
+        elif self.format == "srt":
+            start_time, end_time = format_caption_timestamp(start, ","), format_caption_timestamp(end, ",")
+            self.file.write(f"{self.captions_count}\n{start_time} --> {end_time}\n{text}\n\n")
+        else:
+            self.file.write(json.dumps({"start": start, "end": end, "text": text}, ensure_ascii=False) + "\n")
@@ -0,0 +1,141 @@
+import errno
+import fcntl
+import os
+from pathlib import Path
+from typing import IO, Iterable, Union
+
+# Buffer size of the user space copy used when the kernel cannot copy between the files
+BUFFERED_COPY_SIZE = 8 * 1024 * 1024
+# Upper bound of a single kernel copy call - calls are repeated until the source is exhausted
+KERNEL_COPY_SIZE = 1024 * 1024 * 1024
+
+# Errors which mean a kernel copy method is not usable for these files (filesystem / kernel support)
+_UNSUPPORTED_COPY_ERRNOS = {errno.ENOSYS, errno.EXDEV, errno.EINVAL, errno.EOPNOTSUPP, errno.ENOTSUP, errno.EBADF}
+
+_copy_file_range_supported = hasattr(os, "copy_file_range")
+_sendfile_supported = hasattr(os, "sendfile")
+
+
+def _copy_with_copy_file_range(source_fd: int, target_fd: int, size: int) -> int:
+    copied = 0
+    while copied < size:
+        sent = os.copy_file_range(source_fd, target_fd, min(size - copied, KERNEL_COPY_SIZE))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def _copy_with_sendfile(source_fd: int, target_fd: int, size: int) -> int:
+    copied = 0
+    while copied < size:
+        # A None offset reads from (and advances) the source file position
+        sent = os.sendfile(target_fd, source_fd, None, min(size - copied, KERNEL_COPY_SIZE))
+        if sent == 0:
+            break
+        copied += sent
+    return copied
+
+
+def _copy_fd(source_fd: int, target_fd: int, size: int) -> int:
+    """Copies the source file from its start onto the current position of the target file.
+
+    Uses the fastest method the kernel supports for the file pair - copy_file_range (in kernel,
+    may share extents on reflink capable filesystems), sendfile (in kernel) and finally a large buffer
+    copy through user space. A method reported as unsupported is not attempted again.
+    """
+    global _copy_file_range_supported, _sendfile_supported
+
+    target_start = os.lseek(target_fd, 0, os.SEEK_CUR)
+    if _copy_file_range_supported:
+        try:
+            return _copy_with_copy_file_range(source_fd, target_fd, size)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+            if e.errno in (errno.ENOSYS, errno.EOPNOTSUPP, errno.ENOTSUP):
+                _copy_file_range_supported = False
+            # Nothing was copied by the failed call - restart from the beginning of the source
+            os.lseek(source_fd, 0, os.SEEK_SET)
+            os.lseek(target_fd, target_start, os.SEEK_SET)
+
+    if _sendfile_supported:
+        try:
+            return _copy_with_sendfile(source_fd, target_fd, size)
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED_COPY_ERRNOS:
+                raise
+            if e.errno == errno.ENOSYS:
+                _sendfile_supported = False
+            os.lseek(source_fd, 0, os.SEEK_SET)
+            os.lseek(target_fd, target_start, os.SEEK_SET)
+
+    copied = 0
+    while chunk := os.read(source_fd, BUFFERED_COPY_SIZE):
+        view = memoryview(chunk)
+        while view:
+            written = os.write(target_fd, view)
+            view = view[written:]
+        copied += len(chunk)
+    return copied
+
+
+def _preallocate(target_fd: int, offset: int, size: int) -> None:
+    if size <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    if fcntl.fcntl(target_fd, fcntl.F_GETFL) & os.O_APPEND:
+        # Appending writes land after the preallocated space rather than into it
+        return
+    try:
+        os.posix_fallocate(target_fd, offset, size)
+    except OSError:
+        # Preallocation is an optimization only - not all filesystems support it
+        pass
+
+
+def append_files(target_file: IO[bytes], source_paths: Iterable[Union[str, Path]]) -> int:
+    """Appends the content of the source files at the current position of an open binary file.
+
+    The copy is done by the kernel where possible. The target space is preallocated upfront
+    so the filesystem can lay it out contiguously. Data is not synced to disk.
+
+    Returns:
+        int: Number of bytes appended
+    """
+    source_paths = list(source_paths)
+    target_file.flush()
+    target_fd = target_file.fileno()
+    start_offset = target_file.tell()
+    os.lseek(target_fd, start_offset, os.SEEK_SET)
+
+    _preallocate(target_fd, start_offset, sum(os.stat(source_path).st_size for source_path in source_paths))
+
+    copied = 0
+    for source_path in source_paths:
+        source_fd = os.open(source_path, os.O_RDONLY)
+        try:
+            copied += _copy_fd(source_fd, target_fd, os.fstat(source_fd).st_size)
+        finally:
+            os.close(source_fd)
+
+    end_offset = start_offset + copied
+    # Drop preallocated space which was not used (a source shrank while copying)
+    if os.fstat(target_fd).st_size > end_offset:
+        os.ftruncate(target_fd, end_offset)
+    # Resync the file object position with the copies done on its descriptor
+    target_file.seek(end_offset)
+    return copied
+
+
+def concat_files(target_path: Union[str, Path], source_paths: Iterable[Union[str, Path]]) -> int:
+    """Writes the concatenated content of the source files into a new target file.
+
+    The target is synced to disk once, after all sources were copied.
+
+    Returns:
+        int: Size of the target file
+    """
+    with open(target_path, "wb") as target_file:
+        size = append_files(target_file, source_paths)
+        os.fsync(target_file.fileno())
+    return size
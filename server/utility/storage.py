@@ -0,0 +1,44 @@
+import threading
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+MB = 1024 * 1024
+
+
+class ContentStorageClient:
+    """The S3 client shared by everything in this process which reaches the content storage.
+
+    Built once - credentials resolution and endpoint setup are not repeated per call, and the HTTP
+    connections are pooled across calls. Botocore clients are thread-safe (unlike sessions and resources),
+    so one client serves the request handlers and the finalization threads alike.
+    """
+
+    def __init__(
+        self,
+        max_pool_connections: int,
+        max_attempts: int,
+        retry_mode: str,
+        multipart_threshold_mb: int,
+        multipart_chunk_size_mb: int,
+        max_concurrency: int,
+    ) -> None:
+        # A private session - the default boto3 session is not safe to share across threads
+        self.client = boto3.session.Session().client(
+            "s3",
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": max_attempts, "mode": retry_mode},
+            ),
+        )
+        # A single transfer never needs more connections than the pool holds
+        max_concurrency = min(max_concurrency, max_pool_connections)
+        self.transfer_config = TransferConfig(
+            multipart_threshold=multipart_threshold_mb * MB,
+            multipart_chunksize=multipart_chunk_size_mb * MB,
+            max_concurrency=max_concurrency,
+        )
+        # Each transfer sends up to max_concurrency parts at once - only as many transfers run together
+        # as the pool has connections for, however many threads (sessions x artifacts) start one
+        self.transfer_slots = threading.BoundedSemaphore(max_pool_connections // max_concurrency)
@@ -110,19 +110,17 @@ class SegmentedAudioDataUploader extends EventTarget {
     mimeType: string,
   ) {
     console.log(`<Uploader> Uploading segment ${segmentId}`);
-    const formData = new FormData();
-
-    const audioBlob = new Blob([audioDataBlob], {
-      type: mimeType,
-    });
-    formData.append("audio_data", audioBlob);
 
     try {
+      // Raw body upload - streamed to disk by the server as it arrives
       const response = await fetch(
         `${alterSessionBaseUrl}/${this.sessionId}/upload-audio-segment/${segmentId}`,
         {
-          method: "POST",
-          body: formData,
+          method: "PUT",
+          headers: {
+            "Content-Type": mimeType,
+          },
+          body: audioDataBlob,
         },
       );
 
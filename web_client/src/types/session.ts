@@ -6,6 +6,7 @@ enum RecitalSessionStatus {
   Aggregated = "aggregated",
   Uploaded = "uploaded",
   Discarded = "discarded",
+  Failed = "failed",
 }
 
 type RecitalSessionType = {